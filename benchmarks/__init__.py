@@ -0,0 +1,90 @@
+"""
+Performance benchmarks. Not a part of the test suite, run them as modules, e.g.::
+
+    python -m benchmarks.bench_linkedin_transport --help
+"""
+from configparser import ConfigParser
+from typing import Dict, List, Optional
+import atexit
+import os
+import tempfile
+
+PACKAGED_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "newstler_site", "config.ini")
+
+
+def _remove_at_exit(*paths: str) -> None:
+    """Remove temporary files when this process exits, forked children leave them to it"""
+    owner = os.getpid()
+
+    def remove() -> None:
+        if os.getpid() != owner:
+            return
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    atexit.register(remove)
+
+
+def setup_django(config_overrides: Optional[Dict[str, Dict[str, str]]]=None) -> None:
+    """
+    Configure django with project settings, as ``manage.py`` does.
+    ``config_overrides`` replace options of packaged ``config.ini``, e.g. ``{"linkedin": {"disabled": "true"}}``.
+    Must be called before any project module is imported.
+    """
+    if config_overrides:
+        options = ConfigParser()
+        options.read(PACKAGED_CONFIG)
+        options.read_dict(config_overrides)
+        handle, path = tempfile.mkstemp(prefix="newstler-bench-", suffix=".ini")
+        with os.fdopen(handle, "w") as config_file:
+            options.write(config_file)
+        # config is read on first use, so the file is kept until exit
+        _remove_at_exit(path)
+        os.environ["NEWSTLER_CONFIG"] = path
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "newstler_site.django_facade.settings")
+    import django
+    from django.conf import settings
+    settings.DEBUG = False
+    # benchmarks do not run collectstatic
+    settings.STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
+    django.setup()
+
+
+def create_test_database() -> None:
+    """
+    Empty database with applied migrations.
+    SQLite database is a temporary file: in-memory one fails concurrent writes with "table is locked".
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    if connection.vendor == "sqlite":
+        handle, path = tempfile.mkstemp(prefix="newstler-bench-", suffix=".sqlite3")
+        os.close(handle)
+        _remove_at_exit(path, path + "-wal", path + "-shm", path + "-journal")
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = path
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def seed_news(rows: int, tags: int=50, batch_size: int=10000) -> List[str]:
+    """
+    Synthetic ``NewsItem`` rows spread over ``tags`` tags, first two are "python" and "javascript".
+    :return: tag names
+    """
+    from django.db import transaction
+    from django_app.models import NewsItem, NewsTag
+
+    names = ["python", "javascript"] + ["tag{}".format(i) for i in range(2, tags)]
+    NewsTag.objects.bulk_create([NewsTag(name=name) for name in names])
+    tag_ids = list(NewsTag.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, rows, batch_size):
+        with transaction.atomic():
+            NewsItem.objects.bulk_create([
+                NewsItem(title="News #{}".format(i), link="http://news.test/{}".format(i),
+                         tag_id=tag_ids[i % len(tag_ids)])
+                for i in range(start, min(rows, start + batch_size))
+            ])
+    return names
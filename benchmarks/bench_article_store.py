@@ -0,0 +1,98 @@
+"""
+``CompactArticleStore`` vs. list of ``NewsArticle`` tuples: memory held and latency of one serialized feed page,
+rendered by ``news_items.html`` template, dumped by ``json`` or copied from pre-encoded articles::
+
+    python -m benchmarks.bench_article_store --articles 1000000 --repeat 2000
+"""
+from typing import Callable, List
+import argparse
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+
+def _rows(count: int, tags: int):
+    rnd = random.Random(3)
+    for article_id in range(count, 0, -1):
+        yield (article_id, "News #{} about {}".format(article_id, rnd.choice(["python", "django", "asyncio"])),
+               "http://news.test/{}/{}".format(article_id % 97, article_id), "tag{}".format(article_id % tags))
+
+
+def _held(build: Callable[[], object]):
+    """Built object and bytes allocated for it"""
+    gc.collect()
+    tracemalloc.start()
+    built = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return built, size
+
+
+def _latency(serialize: Callable[[int], object], starts: List[int]) -> str:
+    times = []
+    for start in starts:
+        started = time.perf_counter()
+        serialize(start)
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return "p50 {:7.1f}us, p99 {:7.1f}us".format(statistics.median(times) * 1e6, times[int(len(times) * 0.99)] * 1e6)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=1000000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=50, help="articles per page")
+    parser.add_argument("--repeat", type=int, default=2000, help="pages serialized per method")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.template.loader import render_to_string
+    from newstler_site.external_services.article_store import CompactArticleStore
+    from newstler_site.external_services.news_storage import NewsArticle, article_json
+
+    started = time.perf_counter()
+    store, store_size = _held(lambda: CompactArticleStore(_rows(args.articles, args.tags)))
+    store_build = time.perf_counter() - started
+    started = time.perf_counter()
+    articles, list_size = _held(lambda: [NewsArticle(id=article_id, title=title, link=link)
+                                         for article_id, title, link, _ in _rows(args.articles, args.tags)])
+    list_build = time.perf_counter() - started
+    print("{} articles".format(args.articles))
+    print("  NewsArticle list     {:7.1f} MiB, built in {:5.2f}s".format(list_size / 2 ** 20, list_build))
+    print("  CompactArticleStore  {:7.1f} MiB, built in {:5.2f}s".format(store_size / 2 ** 20, store_build))
+
+    rnd = random.Random(5)
+    starts = [rnd.randrange(args.articles - args.limit) for _ in range(args.repeat)]
+    tags = ["tag1", "tag2", "tag3"]
+    limit = args.limit
+
+    def template(start: int) -> bytes:
+        return render_to_string("news_items.html", {"news": articles[start:start + limit]}).encode("utf-8")
+
+    def dumps(start: int) -> bytes:
+        return json.dumps([article._asdict() for article in articles[start:start + limit]]).encode("utf-8")
+
+    def pre_encoded(start: int) -> bytes:
+        return b"[" + b",".join(article_json(article) for article in articles[start:start + limit]) + b"]"
+
+    def compact(start: int) -> bytes:
+        return store.json_array(store.positions(None, before_id=store.article_id(start), limit=limit))
+
+    def compact_tags(start: int) -> bytes:
+        return store.json_array(store.positions(tags, before_id=store.article_id(start), limit=limit))
+
+    print("page of {} articles".format(limit))
+    for name, serialize in [("template", template), ("json.dumps", dumps), ("article_json join", pre_encoded),
+                            ("compact, all tags", compact), ("compact, 3 tags", compact_tags)]:
+        print("  {:<18} {}".format(name, _latency(serialize, starts)))
+
+
+if __name__ == "__main__":
+    main()
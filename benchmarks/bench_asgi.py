@@ -0,0 +1,112 @@
+"""
+News page throughput while LinkedIn is slow: WSGI application in a pool of ``--threads`` threads, as a threaded
+WSGI worker serves it, vs. ASGI application of one event loop with ``--concurrency`` requests in flight::
+
+    python -m benchmarks.bench_asgi --delay 0.2 --requests 1000 --threads 16 --concurrency 500
+
+LinkedIn is a local fake HTTP server answering after ``--delay`` seconds, profile and fragment caches are off,
+so every page waits for LinkedIn. Requests are issued in-process at once, without an HTTP server in front;
+latency counts from the start of the run, i.e. includes time spent queued.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks import create_test_database, seed_news, setup_django
+from benchmarks.fake_linkedin import running_fake_linkedin
+
+
+def _report(name: str, latencies: List[float], elapsed: float, statuses: List[int]) -> None:
+    latencies.sort()
+    print("{:<6} {:7.1f} pages/s, latency p50 {:6.3f}s p99 {:6.3f}s, statuses {}".format(
+        name, len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99)],
+        sorted(set(statuses))))
+
+
+def run_wsgi(requests: int, threads: int, cookies: Dict[str, str]) -> None:
+    from django.test import Client
+
+    started = time.perf_counter()
+
+    def request(_) -> tuple:
+        client = Client()
+        for name, value in cookies.items():
+            client.cookies[name] = value
+        status = client.get("/news/").status_code
+        return time.perf_counter() - started, status
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(request, range(requests)))
+    _report("wsgi", [latency for latency, _ in results], time.perf_counter() - started,
+            [status for _, status in results])
+
+
+def run_asgi(requests: int, concurrency: int, threads: int, cookies: Dict[str, str]) -> None:
+    from newstler_site.django_facade.async_handlers import ASGIApplication, AsyncNewsHandler
+    from newstler_site.django_facade.wsgi import application as wsgi_application
+    from newstler_site.external_services.service_registry import ServiceRegistry
+
+    application = ASGIApplication(wsgi_application, executor=ThreadPoolExecutor(max_workers=threads), routes={
+        "news_page": lambda run: AsyncNewsHandler(template_name="news.html", run=run),
+    })
+    cookie = "; ".join("{}={}".format(name, value) for name, value in cookies.items()).encode("latin-1")
+    scope = {"type": "http", "method": "GET", "path": "/news/", "query_string": b"",
+             "headers": [(b"host", b"localhost"), (b"cookie", cookie)]}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request() -> tuple:
+        statuses = []  # type: List[int]
+
+        async def receive() -> dict:
+            return {"type": "http.request"}
+
+        async def send(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        async with semaphore:
+            await application(scope, receive, send)
+            return time.perf_counter() - started, statuses[0]
+
+    loop = asyncio.get_event_loop()
+    started = time.perf_counter()
+    results = loop.run_until_complete(asyncio.gather(*[request() for _ in range(requests)]))
+    elapsed = time.perf_counter() - started
+    loop.run_until_complete(ServiceRegistry.get().async_linkedin().close())
+    _report("asgi", [latency for latency, _ in results], elapsed, [status for _, status in results])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.2, help="fake LinkedIn response delay, seconds")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16, help="WSGI threads and ASGI thread pool size")
+    parser.add_argument("--concurrency", type=int, default=500, help="ASGI requests in flight")
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    with running_fake_linkedin(delay=args.delay) as base_url:
+        setup_django({"linkedin": {"url": base_url, "api-url": base_url + "/v1",
+                                   "async-pool-size": str(args.concurrency)},
+                      "profile-cache": {"disabled": "true"}, "fragment-cache": {"disabled": "true"}})
+        create_test_database()
+        seed_news(args.rows)
+        from django.contrib.auth.models import User
+        from django.test import Client
+        from django_app.models import UserMetaInformationModel
+        user = User.objects.create_user("bench@newstler.test", "bench@newstler.test", "bench-password-1")
+        UserMetaInformationModel.objects.create(user=user, access_token="bench-token")
+        client = Client()
+        client.force_login(user)
+        cookies = {name: morsel.value for name, morsel in client.cookies.items()}
+
+        print("LinkedIn delay {}s, {} requests, {} threads".format(args.delay, args.requests, args.threads))
+        run_wsgi(args.requests, args.threads, cookies)
+        run_asgi(args.requests, args.concurrency, args.threads, cookies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Bulk profile refresh throughput: blocking client one by one vs. ``AsyncLinkedInClient.bulk_get_user_data``
+against a local fake LinkedIn answering after ``--delay`` seconds::
+
+    python -m benchmarks.bench_async_linkedin --users 500 --delay 0.05 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks import setup_django
+from benchmarks.fake_linkedin import running_fake_linkedin
+
+
+def _client_options(base_url: str) -> dict:
+    return dict(base_url=base_url, client_id="id", client_secret="secret", redirect_uri="http://local",
+                auth_path="/oauth/v2/authorization", token_path="/oauth/v2/accessToken", api_url=base_url + "/v1")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.05, help="fake LinkedIn response delay, seconds")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sync-users", type=int, default=50, help="users fetched by blocking client")
+    args = parser.parse_args()
+    setup_django()
+    from newstler_site.external_services.async_linkedin_client import RestAsyncLinkedInClient
+    from newstler_site.external_services.linkedin_client import RestLinkedInClient
+
+    tokens = ["token-{}".format(i) for i in range(args.users)]
+    with running_fake_linkedin(delay=args.delay) as base_url:
+        client = RestLinkedInClient(**_client_options(base_url))
+        started = time.perf_counter()
+        for token in tokens[:args.sync_users]:
+            with client.session(access_token=token) as user_session:
+                user_session.get_user_data()
+        sync_rate = args.sync_users / (time.perf_counter() - started)
+
+        async_client = RestAsyncLinkedInClient(pool_size=args.concurrency, bulk_concurrency=args.concurrency,
+                                               **_client_options(base_url))
+        loop = asyncio.get_event_loop()
+        started = time.perf_counter()
+        results = loop.run_until_complete(async_client.bulk_get_user_data(tokens))
+        async_rate = args.users / (time.perf_counter() - started)
+        loop.run_until_complete(async_client.close())
+
+    failed = sum(1 for result in results if result.error)
+    print("blocking       {:8.1f} profiles/s".format(sync_rate))
+    print("async bulk     {:8.1f} profiles/s  (concurrency {}, {} failed)".format(
+        async_rate, args.concurrency, failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Concurrent news reads and profile writes on SQLite file database: rollback journal compared with write-ahead log,
+a connection per request compared with persistent connections, and news reads routed to a replica::
+
+    python -m benchmarks.bench_database --readers 8 --writers 2 --seconds 10
+    python -m benchmarks.bench_database --rows 1000000
+
+Every reader and writer is a thread making requests one after another: a reader queries a page of news of
+a random tag, a writer updates a random user profile. At the end of a request database connections older than
+``CONN_MAX_AGE`` are closed, as django does. The replica is the same database file opened by other connections,
+which isolates the cost of routing from replication.
+"""
+from typing import Dict, List
+import argparse
+import random
+import threading
+import time
+
+from benchmarks import create_test_database, seed_news, setup_django
+
+MODES = [
+    # name, journal mode, CONN_MAX_AGE, replicas
+    ("rollback journal, per request", "delete", 0, []),
+    ("rollback journal, persistent", "delete", 600, []),
+    ("wal, per request", "wal", 0, []),
+    ("wal, persistent", "wal", 600, []),
+    ("wal, persistent, replica", "wal", 600, ["replica0"]),
+]
+
+
+def _seed_users(users: int) -> List[int]:
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from django_app.models import UserMetaInformationModel
+
+    with transaction.atomic():
+        User.objects.bulk_create([User(username="user{}".format(i), email="user{}@newstler.test".format(i),
+                                       password="!") for i in range(users)])
+        UserMetaInformationModel.objects.bulk_create([UserMetaInformationModel(user_id=user_id, access_token="token")
+                                                      for user_id in User.objects.values_list("pk", flat=True)])
+    return list(UserMetaInformationModel.objects.values_list("pk", flat=True))
+
+
+def _configure(journal_mode: str, conn_max_age: int, replicas: List[str]) -> None:
+    from django.conf import settings
+    from django.db import connections, router
+
+    connections.close_all()
+    settings.SQLITE_PRAGMAS = dict(settings.SQLITE_PRAGMAS, journal_mode=journal_mode)
+    settings.DATABASE_REPLICAS = replicas
+    for alias in ["default"] + replicas:
+        connections.databases[alias] = dict(connections.databases["default"], CONN_MAX_AGE=conn_max_age)
+    # routers are created on first query
+    router.__dict__.pop("routers", None)
+
+
+def _worker(request, deadline: float, latencies: List[float], errors: List[int]) -> None:
+    from django.db import DatabaseError, close_old_connections, connections
+    from newstler_site.django_facade import database
+
+    rng = random.Random(threading.get_ident())
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            database.start_request()
+            try:
+                request(rng)
+            except DatabaseError:
+                errors.append(1)
+            finally:
+                close_old_connections()
+            latencies.append(time.perf_counter() - started)
+    finally:
+        connections.close_all()
+
+
+def _run(readers: int, writers: int, seconds: float, tag_ids: List[int], meta_ids: List[int]) -> Dict[str, tuple]:
+    from django_app.models import NewsItem, UserMetaInformationModel
+
+    def read(rng: random.Random) -> None:
+        list(NewsItem.objects.filter(tag_id=rng.choice(tag_ids)).order_by("-id").values_list("title", "link")[:50])
+
+    def write(rng: random.Random) -> None:
+        UserMetaInformationModel.objects.filter(pk=rng.choice(meta_ids)).update(access_token=str(rng.random()))
+
+    results = {"read": ([], []), "write": ([], [])}  # type: Dict[str, tuple]
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=_worker, args=(request, deadline) + results[kind])
+               for kind, request, count in (("read", read, readers), ("write", write, writers))
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _percentile(latencies: List[float], share: float) -> float:
+    return sorted(latencies)[int(share * (len(latencies) - 1))] if latencies else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    setup_django()
+    create_test_database()
+    from django.db import connection
+    from django_app.models import NewsTag
+
+    if connection.vendor != "sqlite":
+        raise SystemExit("benchmark needs SQLite database")
+    seed_news(args.rows)
+    meta_ids = _seed_users(args.users)
+    tag_ids = list(NewsTag.objects.values_list("pk", flat=True))
+    print("{:<32} {:>9} {:>12} {:>12} {:>9} {:>12} {:>7}".format(
+        "mode", "reads/s", "read p50 ms", "read p99 ms", "writes/s", "write p99 ms", "errors"))
+    for name, journal_mode, conn_max_age, replicas in MODES:
+        _configure(journal_mode, conn_max_age, replicas)
+        results = _run(args.readers, args.writers, args.seconds, tag_ids, meta_ids)
+        (reads, read_errors), (writes, write_errors) = results["read"], results["write"]
+        print("{:<32} {:>9.0f} {:>12.2f} {:>12.2f} {:>9.0f} {:>12.2f} {:>7}".format(
+            name, len(reads) / args.seconds, _percentile(reads, 0.5) * 1000, _percentile(reads, 0.99) * 1000,
+            len(writes) / args.seconds, _percentile(writes, 0.99) * 1000, len(read_errors) + len(write_errors)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Throughput, latency and queries per request of facade handlers driven through django test client
+on synthetic news datasets::
+
+    python -m benchmarks.bench_handlers --rows 1000 100000 1000000 --output results.json
+    python -m benchmarks.bench_handlers --rows 1000 --baseline results.json --max-regression 0.2
+
+LinkedIn is served by ``FakeLinkedInClient`` (``--linkedin fake``) or a local fake HTTP server
+(``--linkedin http``). Exit code is 1 if a scenario regressed against ``--baseline`` results.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks import create_test_database, seed_news, setup_django
+from benchmarks.fake_linkedin import running_fake_linkedin
+
+PASSWORD = "bench-password-1"
+_emails = itertools.count()
+
+
+class Scenario:
+    """
+    Request issued by a logged in (``login=True``) or anonymous client.
+    Requests logging the client in (``logs_in=True``) are followed by logout, so every one of them does the work
+    rather than redirecting a logged in client; each of them creates ``creates_users`` users.
+    """
+    def __init__(self, name: str, login: bool, make_request: Callable, expected_status: int=200,
+                 requests_limit: Optional[int]=None, logs_in: bool=False, creates_users: int=0) -> None:
+        self.name = name
+        self.login = login
+        self.make_request = make_request
+        self.expected_status = expected_status
+        self.requests_limit = requests_limit
+        self.logs_in = logs_in
+        self.creates_users = creates_users
+
+
+def _new_email() -> str:
+    return "bench-{}-{}@newstler.test".format(time.time(), next(_emails))
+
+
+def _scenarios(auth_requests: int) -> List[Scenario]:
+    return [
+        Scenario("index", True, lambda client: client.get("/"), expected_status=302),
+        Scenario("news_page", True, lambda client: client.get("/news/")),
+        Scenario("login_page", False, lambda client: client.get("/login/")),
+        Scenario("login_submit", False, lambda client: client.post(
+            "/login/", {"email": "bench@newstler.test", "password": PASSWORD}), expected_status=302,
+            requests_limit=auth_requests, logs_in=True),
+        Scenario("register_page", False, lambda client: client.get("/signup/")),
+        Scenario("register_submit", False, lambda client: client.post(
+            "/signup/", {"email": _new_email(), "password1": PASSWORD, "password2": PASSWORD}),
+            expected_status=302, requests_limit=auth_requests, logs_in=True, creates_users=1),
+    ]
+
+
+def _percentile(latencies: List[float], share: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * share))]
+
+
+def _run_scenario(scenario: Scenario, requests: int, threads: int) -> Dict[str, float]:
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    user = User.objects.get(email="bench@newstler.test")
+    per_thread = max(1, requests // threads)
+    lock = threading.Lock()
+    latencies = []  # type: List[float]
+    queries = []  # type: List[int]
+
+    def worker(_) -> None:
+        client = Client()
+        if scenario.login:
+            client.force_login(user)
+        scenario.make_request(client)  # warm up caches and indexes
+        if scenario.logs_in:
+            client.logout()
+        local_latencies, local_queries = [], []
+        for _ in range(per_thread):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = scenario.make_request(client)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                local_latencies.append(time.perf_counter() - started)
+            if response.status_code != scenario.expected_status:
+                raise AssertionError("{} answered {}".format(scenario.name, response.status_code))
+            local_queries.append(len(captured))
+            if scenario.logs_in:
+                client.logout()
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            queries.extend(local_queries)
+
+    users_before = User.objects.count()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    elapsed = time.perf_counter() - started
+    # warm-up and timed requests of every thread
+    created = User.objects.count() - users_before
+    if created != scenario.creates_users * threads * (per_thread + 1):
+        raise AssertionError("{} created {} users in {} requests".format(
+            scenario.name, created, threads * (per_thread + 1)))
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "queries_per_request": sum(queries) / len(queries),
+    }
+
+
+def _reset_news() -> None:
+    from django_app.models import NewsItem, NewsTag
+    from newstler_site.external_services.service_registry import ServiceRegistry
+    NewsItem.objects.all()._raw_delete(NewsItem.objects.db)
+    NewsTag.objects.all()._raw_delete(NewsTag.objects.db)
+    index = getattr(ServiceRegistry.get().news_storage(), "index", None)
+    if index is not None:
+        index.invalidate()
+
+
+def _create_user() -> None:
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from django_app.models import UserMetaInformationModel
+    import datetime
+    user = User.objects.create_user("bench@newstler.test", "bench@newstler.test", PASSWORD)
+    UserMetaInformationModel.objects.create(user=user, access_token="bench-token",
+                                            expiration=timezone.now() + datetime.timedelta(days=30))
+
+
+def _regressions(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    found = []
+    for rows, scenarios in results["results"].items():
+        for name, current in scenarios.items():
+            previous = baseline.get("results", {}).get(rows, {}).get(name)
+            if previous is None:
+                continue
+            if current["rps"] < previous["rps"] * (1 - max_regression):
+                found.append("{} @ {} rows: {:.0f} req/s, was {:.0f}".format(
+                    name, rows, current["rps"], previous["rps"]))
+            if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+                found.append("{} @ {} rows: p95 {:.2f} ms, was {:.2f}".format(
+                    name, rows, current["p95_ms"], previous["p95_ms"]))
+    return found
+
+
+@contextmanager
+def _linkedin(mode: str) -> Iterator[Dict[str, Dict[str, str]]]:
+    if mode == "fake":
+        yield {"linkedin": {"disabled": "true"}}
+        return
+    with running_fake_linkedin() as base_url:
+        yield {"linkedin": {"disabled": "false", "url": base_url}}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--auth-requests", type=int, default=20, help="requests of password hashing scenarios")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--linkedin", choices=("fake", "http"), default="fake")
+    parser.add_argument("--no-profile-cache", action="store_true", help="call LinkedIn on every news page")
+    parser.add_argument("--no-fragment-cache", action="store_true", help="render news on every news page")
+    parser.add_argument("--session-engine", help="e.g. django.contrib.sessions.backends.cached_db")
+    parser.add_argument("--output", help="store results as json")
+    parser.add_argument("--baseline", help="results json to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    with _linkedin(args.linkedin) as overrides:
+        overrides["news-storage"] = {"index-max-age": "3600"}
+        overrides["profile-cache"] = {"disabled": "true" if args.no_profile_cache else "false"}
+        overrides["fragment-cache"] = {"disabled": "true" if args.no_fragment_cache else "false"}
+        if args.session_engine:
+            os.environ["NEWSTLER_SESSION_ENGINE"] = args.session_engine
+        setup_django(overrides)
+        create_test_database()
+        _create_user()
+        results = {"revision": _git_revision(), "python": platform.python_version(), "linkedin": args.linkedin,
+                   "threads": args.threads, "results": {}}  # type: dict
+        for rows in args.rows:
+            _reset_news()
+            started = time.perf_counter()
+            seed_news(rows)
+            print("{} rows seeded in {:.1f}s".format(rows, time.perf_counter() - started))
+            results["results"][str(rows)] = scenario_results = {}
+            for scenario in _scenarios(args.auth_requests):
+                requests = min(args.requests, scenario.requests_limit or args.requests)
+                result = scenario_results[scenario.name] = _run_scenario(scenario, requests, args.threads)
+                print("  {:<16} {rps:8.1f} req/s  p50 {p50_ms:7.2f}  p95 {p95_ms:7.2f}  p99 {p99_ms:7.2f} ms  "
+                      "{queries_per_request:5.1f} queries".format(scenario.name, **result))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = _regressions(results, json.load(baseline_file), args.max_regression)
+        for regression in regressions:
+            print("REGRESSION: " + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Throughput and memory of ``NewsImporter`` loading a generated JSONL file::
+
+    python -m benchmarks.bench_import_news --rows 1000000 --batch-size 5000
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks import create_test_database, setup_django
+
+
+def _write_jsonl(path: str, rows: int, tags: int, duplicates: float) -> None:
+    unique = int(rows * (1 - duplicates))
+    with open(path, "w", encoding="utf-8") as output:
+        for i in range(rows):
+            number = i if i < unique else i % max(1, unique)
+            output.write(json.dumps({"title": "News #{}".format(number), "link": "http://news.test/{}".format(number),
+                                     "tag": "tag{}".format(number % tags)}))
+            output.write("\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--tags", type=int, default=100)
+    parser.add_argument("--duplicates", type=float, default=0.05, help="share of records with already seen links")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1000, 5000, 20000])
+    args = parser.parse_args()
+
+    setup_django()
+    create_test_database()
+    from django_app.models import NewsItem, NewsTag
+    from newstler_site.external_services.news_import import NewsImporter, read_files
+
+    handle, path = tempfile.mkstemp(prefix="newstler-bench-", suffix=".jsonl")
+    os.close(handle)
+    try:
+        _write_jsonl(path, args.rows, args.tags, args.duplicates)
+        print("{} records, {:.1f} MB file".format(args.rows, os.path.getsize(path) / 2 ** 20))
+        for batch_size in args.batch_size:
+            NewsItem.objects.all()._raw_delete(NewsItem.objects.db)
+            NewsTag.objects.all()._raw_delete(NewsTag.objects.db)
+            started = time.perf_counter()
+            stats = NewsImporter(batch_size=batch_size).run(read_files([path]))
+            elapsed = time.perf_counter() - started
+            print("  batch {:>6}: {:8.0f} rows/s  created {} duplicates {}  {:.1f}s  max RSS {:.0f} MB".format(
+                batch_size, stats.read / elapsed, stats.created, stats.duplicates, elapsed,
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
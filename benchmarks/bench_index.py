@@ -0,0 +1,62 @@
+"""
+Home page throughput, queries and database writes per request for a user with connected LinkedIn, who is redirected
+to the news page, and for a user who is shown the LinkedIn connect button::
+
+    python -m benchmarks.bench_index --requests 2000
+    python -m benchmarks.bench_index --session-engine django.contrib.sessions.backends.cached_db
+"""
+from typing import Dict
+import argparse
+import os
+import time
+
+from benchmarks import create_test_database, setup_django
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+def _run(user, requests: int, expected_status: int) -> Dict[str, float]:
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    client.force_login(user)
+    client.get("/")  # warm up
+    queries = writes = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            status = client.get("/").status_code
+        if status != expected_status:
+            raise AssertionError("home page answered {}".format(status))
+        queries += len(captured)
+        writes += sum(1 for query in captured if query["sql"].lstrip().upper().startswith(WRITE_STATEMENTS))
+    elapsed = time.perf_counter() - started
+    return {"rps": requests / elapsed, "queries": queries / requests, "writes": writes / requests}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--session-engine", help="e.g. django.contrib.sessions.backends.cached_db")
+    args = parser.parse_args()
+    if args.session_engine:
+        os.environ["NEWSTLER_SESSION_ENGINE"] = args.session_engine
+    setup_django({"linkedin": {"disabled": "true"}})
+    create_test_database()
+    from django.contrib.auth.models import User
+    from django_app.models import UserMetaInformationModel
+
+    connected = User.objects.create_user("connected@newstler.test", "connected@newstler.test", "bench-password-1")
+    UserMetaInformationModel.objects.create(user=connected, access_token="bench-token")
+    not_connected = User.objects.create_user("new@newstler.test", "new@newstler.test", "bench-password-1")
+    for name, user, status in [("connected, redirected", connected, 302),
+                               ("not connected, button", not_connected, 200)]:
+        result = _run(user, args.requests, status)
+        print("{:<22} {:8.1f} req/s, {:4.2f} queries and {:4.2f} writes per request".format(
+            name, result["rps"], result["queries"], result["writes"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Pooled keep-alive transport vs. connection per request for ``RestLinkedInClient.get_user_data``::
+
+    python -m benchmarks.bench_linkedin_transport --requests 2000 --threads 8
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+import time
+
+from benchmarks import setup_django
+from benchmarks.fake_linkedin import running_fake_linkedin
+
+
+class _UnpooledTransport:
+    """Mimics former behaviour: module-level ``requests`` calls, new connection each time"""
+    def request(self, method, url, **kwargs):
+        import requests
+        return requests.request(method, url, **kwargs)
+
+
+def _client(base_url: str, transport):
+    from newstler_site.external_services.linkedin_client import RestLinkedInClient
+    return RestLinkedInClient(base_url=base_url, client_id="id", client_secret="secret", redirect_uri="http://local",
+                              auth_path="/oauth/v2/authorization", token_path="/oauth/v2/accessToken",
+                              api_url=base_url + "/v1", transport=transport)
+
+
+def _run(client, total: int, threads: int) -> dict:
+    def call(_):
+        started = time.perf_counter()
+        with client.session(access_token="token") as user_session:
+            user_session.get_user_data()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(executor.map(call, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "rps": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    setup_django()
+    from newstler_site.external_services.http_transport import HttpTransport
+
+    with running_fake_linkedin() as base_url:
+        for name, transport in (("unpooled", _UnpooledTransport()), ("pooled", HttpTransport(pool_size=args.threads))):
+            result = _run(_client(base_url, transport), args.requests, args.threads)
+            print("{:<9} {rps:8.0f} req/s  p50 {p50_ms:6.2f} ms  p99 {p99_ms:6.2f} ms  mean {mean_ms:6.2f} ms".format(
+                name, **result))
+
+
+if __name__ == "__main__":
+    main()
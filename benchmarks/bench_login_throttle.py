@@ -0,0 +1,116 @@
+"""
+Legitimate login throughput and latency while attackers hammer the login form with wrong passwords::
+
+    python -m benchmarks.bench_login_throttle --matrix
+    python -m benchmarks.bench_login_throttle --throttle on --iterations 36000 --attackers 8 --duration 10
+
+Attackers come from ``--attacker-ips`` addresses, guessing passwords of existing users.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks import create_test_database, setup_django
+
+PASSWORD = "bench-password-1"
+
+
+def _attacker(number: int, ips: int, users: int, rate: float, stop: threading.Event) -> List[float]:
+    """Sends ``rate`` attempts per second whatever answers take, as bots do"""
+    from django.test import Client
+    client = Client(REMOTE_ADDR="10.0.{}.{}".format(number % ips // 256, number % ips % 256 + 1))
+    latencies = []
+    attempt = 0
+    next_at = time.perf_counter()
+    while not stop.is_set():
+        attempt += 1
+        next_at += 1 / rate
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+        started = time.perf_counter()
+        client.post("/login/", {"email": "user{}@newstler.test".format(attempt % users), "password": "guess"})
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _users(stop: threading.Event, users: int) -> Tuple[List[float], int]:
+    """
+    Legitimate users logging in one after another, each from own address.
+    :return: latencies of successful logins and number of throttled ones
+    """
+    from django.test import Client
+    latencies = []
+    throttled = 0
+    number = 0
+    while not stop.is_set():
+        number = (number + 1) % users
+        client = Client(REMOTE_ADDR="192.168.{}.{}".format(number // 256, number % 256))
+        started = time.perf_counter()
+        response = client.post("/login/", {"email": "user{}@newstler.test".format(number), "password": PASSWORD})
+        if response.status_code == 429:
+            throttled += 1
+        elif response.status_code == 302:
+            latencies.append(time.perf_counter() - started)
+        else:
+            raise AssertionError("legitimate login answered {}".format(response.status_code))
+        time.sleep(0.05)
+    return latencies, throttled
+
+
+def _run(args) -> None:
+    os.environ["NEWSTLER_PASSWORD_HASH_ITERATIONS"] = str(args.iterations)
+    setup_django({"login-throttle": {"disabled": "false" if args.throttle == "on" else "true", "ip-burst": "20",
+                                     "ip-rate": "0.5", "email-burst": "5", "email-rate": "0.05"}})
+    create_test_database()
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([User(username="user{}@newstler.test".format(i), email="user{}@newstler.test".format(i),
+                                   password=password) for i in range(args.users)])
+
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=args.attackers + 1) as executor:
+        attacks = [executor.submit(_attacker, number, args.attacker_ips, args.users,
+                                   args.attack_rate / args.attackers, stop)
+                   for number in range(args.attackers)]
+        user = executor.submit(_users, stop, args.users)
+        time.sleep(args.duration)
+        stop.set()
+        attack_latencies = [latency for future in attacks for latency in future.result()]
+        user_latencies, user_throttled = user.result()
+    user_latencies.sort()
+    print("throttle {:<3} iterations {:>6}: attack {:5.0f} req/s, user {:4.1f} logins/s, "
+          "p50 {:6.1f} ms, p95 {:6.1f} ms, {} throttled".format(
+              args.throttle, args.iterations, len(attack_latencies) / args.duration,
+              len(user_latencies) / args.duration, user_latencies[len(user_latencies) // 2] * 1000,
+              user_latencies[int(len(user_latencies) * 0.95)] * 1000, user_throttled))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--throttle", choices=("on", "off"), default="on")
+    parser.add_argument("--iterations", type=int, default=36000, help="PBKDF2 rounds of password hashes")
+    parser.add_argument("--attackers", type=int, default=8, help="attacking threads")
+    parser.add_argument("--attacker-ips", type=int, default=4)
+    parser.add_argument("--attack-rate", type=float, default=100, help="attempts per second of all attackers")
+    parser.add_argument("--users", type=int, default=1000, help="legitimate users")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--matrix", action="store_true", help="compare throttling and hashing profiles")
+    args = parser.parse_args()
+    if not args.matrix:
+        _run(args)
+        return
+    for throttle, iterations in (("off", 36000), ("on", 36000), ("off", 10000), ("on", 10000)):
+        subprocess.check_call([sys.executable, "-W", "ignore", "-m", "benchmarks.bench_login_throttle",
+                               "--throttle", throttle, "--iterations", str(iterations),
+                               "--attackers", str(args.attackers), "--attacker-ips", str(args.attacker_ips),
+                               "--users", str(args.users), "--attack-rate", str(args.attack_rate),
+                               "--duration", str(args.duration)])
+
+
+if __name__ == "__main__":
+    main()
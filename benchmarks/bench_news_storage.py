@@ -0,0 +1,107 @@
+"""
+News storage backends of ``[news-storage] backend`` compared: build time, memory held and page throughput.
+Memory is measured by tracemalloc, which does not see allocations of SQLite::
+
+    python -m benchmarks.bench_news_storage --rows 10000 100000 --pages 2000
+"""
+from typing import Callable, List
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from benchmarks import create_test_database, seed_news, setup_django
+
+POSITIONS = ["Senior Python developer", "Python and JavaScript engineer", "Tag7 lead with tag12", "Manager"]
+
+
+def _build(factory: Callable[[], object]):
+    """Storage, seconds to build it and bytes it holds"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    storage = factory()
+    # index of django-orm backend is built on first use
+    storage.get_news_page(_user(POSITIONS[0]), limit=1)
+    duration = time.perf_counter() - started
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return storage, duration, size
+
+
+def _user(position: str):
+    from newstler_site.external_services.linkedin_client import UserData
+    return UserData(name="John", position=position)
+
+
+def _pages(storage, cursors: List, count: int, limit: int) -> float:
+    """Pages per second, first pages and random following ones"""
+    rnd = random.Random(7)
+    started = time.perf_counter()
+    for _ in range(count):
+        position, cursor = rnd.choice(cursors)
+        storage.get_news_page(_user(position), cursor=cursor, limit=limit)
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=2000, help="pages fetched per backend")
+    parser.add_argument("--limit", type=int, default=50, help="articles per page")
+    parser.add_argument("--depth", type=int, default=20, help="pages followed by cursor from the first one")
+    args = parser.parse_args()
+
+    setup_django()
+    create_test_database()
+    from django_app.models import NewsItem
+    from newstler_site.external_services.fts_storage import SQLiteFTSNewsStorage
+    from newstler_site.external_services.memory_storage import MemoryNewsStorage
+    from newstler_site.external_services.news_storage import DjangoORMBasedStorage
+
+    backends = [
+        ("django-orm", lambda: DjangoORMBasedStorage(index_max_age=3600)),
+        ("memory", MemoryNewsStorage),
+        ("sqlite-fts", SQLiteFTSNewsStorage),
+    ]
+    seed_news(0, tags=args.tags)
+    seeded = 0
+    for rows in sorted(args.rows):
+        _append(NewsItem, seeded, rows)
+        seeded = rows
+        print("{} articles".format(rows))
+        for name, factory in backends:
+            storage, duration, size = _build(factory)
+            cursors = []
+            for position in POSITIONS:
+                cursor = None
+                for _ in range(args.depth):
+                    cursors.append((position, cursor))
+                    cursor = storage.get_news_page(_user(position), cursor=cursor, limit=args.limit).next_cursor
+                    if cursor is None:
+                        break
+            rate = _pages(storage, cursors, args.pages, args.limit)
+            print("  {:<10} built in {:6.2f}s, holds {:7.1f} MiB, {:8.0f} pages/s".format(
+                name, duration, size / 2 ** 20, rate))
+            del storage
+
+
+def _append(model, start: int, rows: int) -> None:
+    """Articles ``start``..``rows`` spread over existing tags"""
+    from django.db import transaction
+    from django_app.models import NewsTag
+    tag_ids = list(NewsTag.objects.order_by("pk").values_list("pk", flat=True))
+    for offset in range(start, rows, 10000):
+        with transaction.atomic():
+            model.objects.bulk_create([
+                model(title="News #{}".format(i), link="http://news.test/{}".format(i),
+                      tag_id=tag_ids[i % len(tag_ids)])
+                for i in range(offset, min(rows, offset + 10000))
+            ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Time to first response of preforked workers, with and without ``warm_up`` in the master process::
+
+    python -m benchmarks.bench_startup --workers 4 --rows 100000 --backend django-orm memory
+
+Every mode runs in a fresh interpreter that prepares a database and a logged in session, optionally warms up
+and forks workers at once, as gunicorn does. Each worker requests ``--path`` once and reports seconds from fork
+to response and its private memory (Linux only), i.e. memory not shared with the master.
+"""
+from typing import Dict, List
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import create_test_database, seed_news, setup_django
+
+
+def _private_memory() -> int:
+    """Bytes of private pages of this process, 0 where /proc is not available"""
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            fields = dict(line.split(":", 1) for line in smaps if ":" in line)
+    except OSError:
+        return 0
+    return sum(int(fields.get(name, "0 kB").split()[0]) * 1024 for name in ("Private_Clean", "Private_Dirty"))
+
+
+def _worker(write_fd: int, path: str, cookies: Dict[str, str]) -> None:
+    from django.test import Client
+    from newstler_site.django_facade.warmup import after_fork
+    started = time.perf_counter()
+    after_fork()
+    client = Client()
+    for name, value in cookies.items():
+        client.cookies[name] = value
+    status = client.get(path).status_code
+    result = {"seconds": time.perf_counter() - started, "status": status, "private": _private_memory()}
+    os.write(write_fd, (json.dumps(result) + "\n").encode("ascii"))
+
+
+def run_mode(args: argparse.Namespace) -> None:
+    """Master process of one mode, prints results of workers as json"""
+    setup_django({"linkedin": {"disabled": "true"}, "news-storage": {"backend": args.backend},
+                  "fragment-cache": {"disabled": "true"}})
+    create_test_database()
+    seed_news(args.rows)
+    from django.contrib.auth.models import User
+    from django.db import connections
+    from django.test import Client
+    from django_app.models import UserMetaInformationModel
+    user = User.objects.create_user("bench@newstler.test", "bench@newstler.test", "bench-password-1")
+    UserMetaInformationModel.objects.create(user=user, access_token="bench-token")
+    client = Client()
+    client.force_login(user)
+    cookies = {name: morsel.value for name, morsel in client.cookies.items()}
+
+    warm_up_seconds = 0.0
+    if args.mode == "warm":
+        from newstler_site.django_facade.warmup import warm_up
+        warm_up_seconds = sum(warm_up().values())
+    connections.close_all()
+
+    read_fd, write_fd = os.pipe()
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                _worker(write_fd, args.path, cookies)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as results:
+        workers = [json.loads(line) for line in results]
+    for pid in children:
+        os.waitpid(pid, 0)
+    print(json.dumps({"warm_up": warm_up_seconds, "workers": workers}))
+
+
+def _summary(mode: str, backend: str, result: dict) -> str:
+    seconds = [worker["seconds"] for worker in result["workers"]]
+    private = [worker["private"] for worker in result["workers"]]
+    statuses = sorted({worker["status"] for worker in result["workers"]})
+    return "{:<10} {:<5} master warm-up {:6.3f}s, first response mean {:6.3f}s max {:6.3f}s, " \
+           "private memory per worker {:6.1f} MiB, statuses {}".format(
+               backend, mode, result["warm_up"], statistics.mean(seconds), max(seconds),
+               statistics.mean(private) / 2 ** 20, statuses)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--path", default="/api/news/")
+    parser.add_argument("--backend", nargs="+", default=["django-orm", "memory"], help="[news-storage] backend")
+    parser.add_argument("--mode", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode is not None:
+        args.backend = args.backend[0]
+        run_mode(args)
+        return
+
+    for backend in args.backend:
+        for mode in ("cold", "warm"):
+            output = subprocess.check_output(
+                [sys.executable, "-m", "benchmarks.bench_startup", "--mode", mode, "--backend", backend,
+                 "--workers", str(args.workers), "--rows", str(args.rows), "--path", args.path])
+            result = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+            print(_summary(mode, backend, result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+``collectstatic`` wall time and bytes transferred for the stylesheet of every page, previous WhiteNoise gzip storage
+compared with the pruned, Brotli and gzip compressing one::
+
+    python -m benchmarks.bench_static
+    python -m benchmarks.bench_static --copies 20 --workers 1 4
+
+``--copies`` adds copies of the project static files under prefixes, as a stand-in for a bigger asset tree.
+"""
+from typing import Dict, List, Optional
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import setup_django
+
+STYLESHEET = "bootstrap/css/bootstrap.min.css"
+STORAGES = [
+    ("whitenoise gzip", "whitenoise.django.GzipManifestStaticFilesStorage", None),
+    ("pruned br+gzip", "newstler_site.django_facade.static_storage.PrunedCompressedManifestStorage", None),
+]
+
+
+def _static_copies(source: str, copies: int) -> List[str]:
+    """Directories of STATICFILES_DIRS with ``copies`` prefixed copies of ``source``"""
+    directories = [source]
+    for i in range(copies):
+        directory = tempfile.mkdtemp(prefix="newstler-bench-static-")
+        shutil.copytree(source, os.path.join(directory, "copy{}".format(i)))
+        directories.append(directory)
+    return directories
+
+
+def _transferred(url: str) -> Dict[str, int]:
+    """Response bytes of ``url`` served by WhiteNoise per accepted encoding"""
+    from whitenoise.django import DjangoWhiteNoise
+
+    application = DjangoWhiteNoise(lambda environ, start_response: [])
+    sizes = {}
+    for accept_encoding in ("identity", "gzip", "gzip, deflate, br"):
+        body = application({"REQUEST_METHOD": "GET", "PATH_INFO": url, "HTTP_ACCEPT_ENCODING": accept_encoding},
+                           lambda status, headers: None)
+        sizes[accept_encoding] = len(b"".join(body))
+    return sizes
+
+
+def _collect(storage: str, workers: Optional[int]) -> Dict[str, object]:
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    from django.core.management import call_command
+    from django.test import override_settings
+
+    static_root = tempfile.mkdtemp(prefix="newstler-bench-collected-")
+    try:
+        with override_settings(STATIC_ROOT=static_root, STATICFILES_STORAGE=storage,
+                               STATICFILES_COMPRESS_WORKERS=workers):
+            staticfiles_storage._setup()
+            started = time.perf_counter()
+            call_command("collectstatic", interactive=False, verbosity=0)
+            duration = time.perf_counter() - started
+            staticfiles_storage._setup()
+            return {"duration": duration, "sizes": _transferred(staticfiles_storage.url(STYLESHEET))}
+    finally:
+        shutil.rmtree(static_root)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0], help="compressing processes, 0 - CPU cores")
+    args = parser.parse_args()
+    setup_django()
+    from django.conf import settings
+    from whitenoise.compress import brotli_installed
+
+    directories = _static_copies(settings.STATICFILES_DIRS[0], args.copies)
+    settings.STATICFILES_DIRS = directories
+    if not brotli_installed:
+        print("Brotli is not installed, br column shows gzip")
+    print("{:<26} {:>10} {:>10} {:>10} {:>10}".format("storage", "collect s", "identity", "gzip", "br"))
+    try:
+        runs = [STORAGES[0]] + [(STORAGES[1][0] + ", {} workers".format(workers or os.cpu_count()), STORAGES[1][1],
+                                 workers or None) for workers in args.workers]
+        for name, storage, workers in runs:
+            result = _collect(storage, workers)
+            sizes = result["sizes"]
+            print("{:<26} {:>10.2f} {:>10} {:>10} {:>10}".format(
+                name, result["duration"], sizes["identity"], sizes["gzip"], sizes["gzip, deflate, br"]))
+    finally:
+        for directory in directories[1:]:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
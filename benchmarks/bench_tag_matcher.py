@@ -0,0 +1,70 @@
+"""
+``TagMatcher`` vs. former substring check of every tag against user position::
+
+    python -m benchmarks.bench_tag_matcher --tags 1000 10000 50000 --positions 2000
+"""
+from typing import Callable, Dict, List
+import argparse
+import random
+import string
+import time
+
+from benchmarks import setup_django
+
+
+def _words(rnd: random.Random, count: int) -> List[str]:
+    return ["".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(3, 10))) for _ in range(count)]
+
+
+def _positions(rnd: random.Random, tags: List[str], count: int, words: int) -> List[str]:
+    vocabulary = _words(rnd, 500) + ["senior", "developer", "engineer", "lead", "and", "with"]
+    positions = []
+    for _ in range(count):
+        position = [rnd.choice(vocabulary) for _ in range(words)]
+        for _ in range(3):
+            position.insert(rnd.randrange(len(position) + 1), rnd.choice(tags).title())
+        positions.append(" ".join(position))
+    return positions
+
+
+def _substring_scan(weights: Dict[str, float]) -> Callable[[str], Dict[str, float]]:
+    def match(position: str) -> Dict[str, float]:
+        position = position.lower()
+        return {name: weight for name, weight in weights.items() if name in position}
+    return match
+
+
+def _measure(match: Callable[[str], Dict[str, float]], positions: List[str]) -> float:
+    started = time.perf_counter()
+    for position in positions:
+        match(position)
+    return len(positions) / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tags", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--positions", type=int, default=2000)
+    parser.add_argument("--words", type=int, nargs="+", default=[5, 50], help="words per position title")
+    args = parser.parse_args()
+
+    setup_django()
+    from newstler_site.external_services.tag_matcher import TagMatcher
+
+    rnd = random.Random(42)
+    for tag_count in args.tags:
+        names = _words(rnd, tag_count) + [" ".join(pair) for pair in zip(_words(rnd, 100), _words(rnd, 100))]
+        weights = {name: rnd.uniform(0.5, 3.0) for name in names}
+        started = time.perf_counter()
+        matcher = TagMatcher(weights)
+        print("{} tags, automaton built in {:.3f}s".format(len(weights), time.perf_counter() - started))
+        for words in args.words:
+            positions = _positions(rnd, names, args.positions, words)
+            automaton = _measure(matcher.match, positions)
+            scan = _measure(_substring_scan(weights), positions[:max(1, args.positions // 10)])
+            print("  {:>3} words: automaton {:9.0f} positions/s, substring scan {:7.0f} positions/s".format(
+                words, automaton, scan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Materialized feeds of ``manage.py refresh_feeds``: time to match users and build feeds, fan-out rate of news
+added afterwards and page throughput of the materialized news storage compared with the django-orm one
+and with pages queried from news table, which the materialized storage falls back to::
+
+    python -m benchmarks.bench_user_feeds --users 100000 --articles 1000000
+    python -m benchmarks.bench_user_feeds --users 10000 --articles 100000 --max-items 200
+"""
+from typing import List
+import argparse
+import math
+import random
+import time
+
+from benchmarks import create_test_database, seed_news, setup_django
+
+
+def _seed_users(users: int, tag_names: List[str], batch_size: int=10000) -> List[str]:
+    """Users subscribed to positions naming one or two tags, every tenth user to all news; returns positions"""
+    from django.contrib.auth.models import User
+    from django.db import transaction
+    from django_app.models import UserFeed
+
+    rng = random.Random(42)
+    positions = []
+    for _ in range(users):
+        if rng.random() < 0.1:
+            positions.append("Manager")
+        else:
+            positions.append(" and ".join(rng.sample(tag_names, rng.choice((1, 2)))) + " developer")
+    last_pk = 0
+    for start in range(0, users, batch_size):
+        with transaction.atomic():
+            User.objects.bulk_create([User(username="user{}".format(i), email="user{}@newstler.test".format(i),
+                                           password="!") for i in range(start, min(users, start + batch_size))])
+            user_ids = list(User.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True))
+            UserFeed.objects.bulk_create([UserFeed(user_id=user_id, position=position)
+                                          for user_id, position in zip(user_ids, positions[start:])])
+            last_pk = user_ids[-1]
+    return positions
+
+
+def _add_news(count: int, tag_names: List[str], batch_size: int=10000) -> None:
+    from django.db import transaction
+    from django_app.models import NewsItem, NewsTag
+
+    tag_ids = list(NewsTag.objects.filter(name__in=tag_names).order_by("pk").values_list("pk", flat=True))
+    for start in range(0, count, batch_size):
+        with transaction.atomic():
+            NewsItem.objects.bulk_create([
+                NewsItem(title="Fresh news #{}".format(i), link="http://fresh.news.test/{}".format(i),
+                         tag_id=tag_ids[i % len(tag_ids)])
+                for i in range(start, min(count, start + batch_size))
+            ])
+
+
+def _pages(storage, positions: List[str], pages: int, limit: int, depth: int) -> float:
+    """Pages per second of random users, each page ``depth`` pages into the feed"""
+    from newstler_site.external_services.linkedin_client import UserData
+
+    rng = random.Random(7)
+    # index of django-orm backend is built on first use
+    storage.get_news_page(UserData(name="John", position=positions[0]), limit=limit)
+    cursors = {}
+    for position in set(positions):
+        cursor = None
+        user_data = UserData(name="John", position=position)
+        for _ in range(depth):
+            cursor = storage.get_news_page(user_data, cursor=cursor, limit=limit).next_cursor
+        cursors[position] = cursor
+    sample = [rng.choice(positions) for _ in range(pages)]
+    started = time.perf_counter()
+    for position in sample:
+        storage.get_news_page(UserData(name="John", position=position), cursor=cursors[position], limit=limit)
+    return pages / (time.perf_counter() - started)
+
+
+def _explain_page_query() -> None:
+    from django.db import connection
+    from django_app.models import FeedEntry, MaterializedFeed
+
+    feed = MaterializedFeed.objects.exclude(entries=None).first()
+    query = FeedEntry.objects.filter(feed__key_hash=feed.key_hash, score__lte=1.0).exclude(
+        score=1.0, news_id__gte=10 ** 9).order_by("-score", "-news_id").values_list(
+        "score", "news_id", "news__title", "news__link", "feed__cutoff_id")[:51]
+    if connection.vendor != "sqlite":
+        return
+    sql, params = query.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        print("page query plan:")
+        for row in cursor.fetchall():
+            print("   ", row[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--articles", type=int, default=1000000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--new-articles", type=int, default=20000, help="news fanned out after feeds are built")
+    parser.add_argument("--max-items", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    setup_django()
+    create_test_database()
+    from django_app.models import FeedEntry, MaterializedFeed
+    from newstler_site.external_services.materialized_feed import FeedMaterializer, MaterializedFeedStorage
+    from newstler_site.external_services.news_storage import DjangoORMBasedStorage, NewsTagMatcher
+
+    started = time.perf_counter()
+    tag_names = seed_news(args.articles, tags=args.tags)
+    positions = _seed_users(args.users, tag_names)
+    print("seeded {} news and {} users in {:.1f}s".format(args.articles, args.users, time.perf_counter() - started))
+
+    fallback = MaterializedFeedStorage(matcher_max_age=math.inf)
+    fallback_rates = [_pages(fallback, positions, args.pages, args.limit, depth) for depth in (0, 3)]
+
+    materializer = FeedMaterializer(matcher=NewsTagMatcher(max_age=math.inf), max_items=args.max_items,
+                                    batch_size=args.batch_size)
+    stats = materializer.run_once()
+    print("matched {0.matched} users, built {0.built} feeds of {0.entries} entries in {0.duration:.1f}s".format(stats))
+    _add_news(args.new_articles, tag_names)
+    stats = materializer.run_once()
+    print("fanned out {0.fanned_out} news as {0.entries} entries in {0.duration:.1f}s, {1:.0f} news/s".format(
+        stats, stats.fanned_out / stats.duration))
+    print("{} feeds, {} entries".format(MaterializedFeed.objects.count(), FeedEntry.objects.count()))
+    _explain_page_query()
+
+    materialized = MaterializedFeedStorage(matcher_max_age=math.inf)
+    django_orm = DjangoORMBasedStorage(index_max_age=math.inf)
+    print("{:<30} {:>12} {:>12}".format("pages/s", "first page", "4th page"))
+    for name, rates in [("materialized", [_pages(materialized, positions, args.pages, args.limit, depth)
+                                          for depth in (0, 3)]),
+                        ("news table (fallback)", fallback_rates),
+                        ("django-orm (in-memory index)", [_pages(django_orm, positions, args.pages, args.limit, depth)
+                                                          for depth in (0, 3)])]:
+        print("{:<30} {:>12.0f} {:>12.0f}".format(name, *rates))
+
+
+if __name__ == "__main__":
+    main()
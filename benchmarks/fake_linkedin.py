@@ -0,0 +1,62 @@
+"""Local fake of LinkedIn OAuth and people API used by benchmarks"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Iterator
+from uuid import uuid4
+import json
+import threading
+import time
+
+REVOKED_TOKEN = "revoked"
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _FakeLinkedInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    delay = 0.0
+    position = "Senior Python Developer"
+
+    def _reply(self, status: int, payload: dict) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if not self.path.startswith("/v1/people/"):
+            self._reply(404, {"error": "not found"})
+        elif self.headers.get("Authorization") == "Bearer {}".format(REVOKED_TOKEN):
+            self._reply(401, {"error": "invalid token"})
+        else:
+            self._reply(200, {"firstName": "Fake", "positions": {"values": [{"title": self.position}]}})
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply(200, {"access_token": uuid4().hex, "expires_in": 5184000})
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+@contextmanager
+def running_fake_linkedin(delay: float=0.0, position: str=_FakeLinkedInHandler.position) -> Iterator[str]:
+    """Serve fake LinkedIn on a random local port, yields its base url"""
+    handler = type("FakeLinkedInHandler", (_FakeLinkedInHandler,), {"delay": delay, "position": position})
+    server = _ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}".format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
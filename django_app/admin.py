@@ -1,8 +1,202 @@
-from django.contrib import admin
-from django_app.models import UserMetaInformationModel, NewsItem, NewsTag
+"""
+Admin of news and LinkedIn connections, usable with millions of news rows: changelists neither count whole tables
+nor query related rows per line, search uses indexes and bulk actions run in batches of short transactions.
+"""
+from typing import Dict, Iterator, List, Optional
+import sys
 
-# Register your models here.
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Max, QuerySet
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
 
-admin.site.register(UserMetaInformationModel)
-admin.site.register(NewsItem)
-admin.site.register(NewsTag)
+from django_app.links import link_hash
+from django_app.models import FeedEntry, UserMetaInformationModel, NewsItem, NewsTag
+from django_app.signals import news_items_bulk_changed
+from newstler_site.external_services.materialized_feed import refresh_news_entries
+
+ACTION_BATCH_SIZE = 1000
+
+
+def estimated_count(queryset: QuerySet) -> Optional[int]:
+    """Row count of the table of ``queryset`` as estimated by database statistics, None if not available"""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute("SELECT table_rows FROM information_schema.tables "
+                           "WHERE table_schema = DATABASE() AND table_name = %s", [table])
+        else:
+            # ids are not reused after deletes, so the last one is an upper bound found by primary key index
+            return queryset.model._base_manager.using(queryset.db).aggregate(last=Max("pk"))["last"] or 0
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 or 0 for tables never analyzed
+    return int(row[0]) if row is not None and row[0] is not None and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator not counting big tables: unfiltered changelists take the table size estimated by database,
+    filtered ones count at most ``max_count`` matching rows. Counts below ``max_count`` are exact.
+    """
+    max_count = 10000
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate > self.max_count:
+                return estimate
+        return queryset[:self.max_count].count()
+
+
+def prefix_filter(field: str, prefix: str) -> Dict[str, str]:
+    """
+    Lookups of values of ``field`` starting with ``prefix`` as a range, which any database serves from an index
+    on the field. ``startswith`` compiles to ``LIKE ... ESCAPE``, which SQLite answers by a full scan.
+    The range is case sensitive and follows the binary order of SQLite and "C" collation of PostgreSQL.
+    """
+    last = ord(prefix[-1])
+    if last == sys.maxunicode:
+        return {field + "__gte": prefix}
+    return {field + "__gte": prefix, field + "__lt": prefix[:-1] + chr(last + 1)}
+
+
+def pk_batches(queryset: QuerySet, batch_size: int=ACTION_BATCH_SIZE) -> Iterator[List[int]]:
+    """Primary keys of ``queryset`` in ascending batches, each read by one query after the previous is used"""
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    last_pk = None
+    while True:
+        batch = list((pks if last_pk is None else pks.filter(pk__gt=last_pk))[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1]
+
+
+class RetagForm(forms.Form):
+    tag = forms.ModelChoiceField(
+        queryset=NewsTag.objects.all(),
+        # pk input with lookup popup, a select of all tags would be huge
+        widget=ForeignKeyRawIdWidget(NewsItem._meta.get_field("tag").remote_field, admin.site),
+    )
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # "N total" link of filtered changelists counts the whole table
+    show_full_result_count = False
+    ordering = ("-pk",)
+
+    def confirm_action(self, request, queryset: QuerySet, action: str, title: str,
+                       form: Optional[forms.Form]=None) -> TemplateResponse:
+        """Intermediate page of ``action`` posting selection back with ``post`` set"""
+        return TemplateResponse(request, "admin/django_app/confirm_action.html", dict(
+            self.admin_site.each_context(request),
+            title=title,
+            opts=self.model._meta,
+            action=action,
+            form=form,
+            media=self.media + (form.media if form is not None else forms.Media()),
+            selected=request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            select_across=request.POST.get("select_across", "0"),
+            count=EstimatedCountPaginator(queryset, 1).count,
+        ))
+
+
+@admin.register(NewsItem)
+class NewsItemAdmin(ScalableModelAdmin):
+    list_display = ("id", "title", "link", "tag")
+    list_select_related = ("tag",)
+    raw_id_fields = ("tag",)
+    # search box; terms are looked up by get_search_results
+    search_fields = ("title", "link")
+    actions = ["retag_selected", "delete_selected_in_batches"]
+
+    def get_actions(self, request):
+        actions = super(NewsItemAdmin, self).get_actions(request)
+        # loads and lists every selected row on its confirmation page
+        actions.pop("delete_selected", None)
+        return actions
+
+    def get_search_results(self, request, queryset: QuerySet, search_term: str):
+        """Links are found by canonical link hash, titles by indexed prefix"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if "://" in term:
+            return queryset.filter(link_hash=link_hash(term)), False
+        return queryset.filter(**prefix_filter("title", term)), False
+
+    def save_model(self, request, obj: NewsItem, form, change: bool) -> None:
+        super(NewsItemAdmin, self).save_model(request, obj, form, change)
+        if change and "tag" in form.changed_data:
+            refresh_news_entries([obj.pk])
+
+    def retag_selected(self, request, queryset: QuerySet) -> Optional[TemplateResponse]:
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        form = RetagForm(request.POST if "post" in request.POST else None)
+        if not form.is_valid():
+            return self.confirm_action(request, queryset, "retag_selected", "Move news to another tag", form)
+        tag = form.cleaned_data["tag"]
+        updated = 0
+        for batch in pk_batches(queryset):
+            updated += NewsItem.objects.filter(pk__in=batch).update(tag=tag)
+            refresh_news_entries(batch)
+        news_items_bulk_changed.send(sender=NewsItem, count=updated)
+        self.message_user(request, "{} news moved to tag {}".format(updated, tag), messages.SUCCESS)
+        return None
+    retag_selected.short_description = "Move selected news to another tag"
+
+    def delete_selected_in_batches(self, request, queryset: QuerySet) -> Optional[TemplateResponse]:
+        if not self.has_delete_permission(request):
+            raise PermissionDenied
+        if "post" not in request.POST:
+            return self.confirm_action(request, queryset, "delete_selected_in_batches", "Delete news")
+        deleted = 0
+        for batch in pk_batches(queryset):
+            # only materialized feed entries reference news, so there is nothing else to collect
+            # and no per-row signals are needed
+            with transaction.atomic(using=queryset.db):
+                FeedEntry.objects.filter(news_id__in=batch)._raw_delete(queryset.db)
+                deleted += NewsItem.objects.filter(pk__in=batch)._raw_delete(queryset.db)
+        news_items_bulk_changed.send(sender=NewsItem, count=deleted)
+        self.message_user(request, "{} news deleted".format(deleted), messages.SUCCESS)
+        return None
+    delete_selected_in_batches.short_description = "Delete selected news"
+
+
+@admin.register(NewsTag)
+class NewsTagAdmin(ScalableModelAdmin):
+    list_display = ("id", "name", "weight")
+    search_fields = ("name",)
+    ordering = ("name",)
+
+    def get_search_results(self, request, queryset: QuerySet, search_term: str):
+        """Tags are found by indexed name prefix"""
+        term = search_term.strip()
+        return (queryset.filter(**prefix_filter("name", term)) if term else queryset), False
+
+
+@admin.register(UserMetaInformationModel)
+class UserMetaInformationAdmin(ScalableModelAdmin):
+    list_display = ("user", "expiration", "refresh_required")
+    list_select_related = ("user",)
+    list_filter = ("refresh_required",)
+    raw_id_fields = ("user",)
+    search_fields = ("user__email",)
+
+    def get_search_results(self, request, queryset: QuerySet, search_term: str):
+        """Users are found by exact, indexed email"""
+        term = search_term.strip()
+        return (queryset.filter(user__email=term) if term else queryset), False
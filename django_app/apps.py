@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class DjangoAppConfig(AppConfig):
     name = 'django_app'
+
+    def ready(self):
+        from newstler_site.django_facade.database import apply_sqlite_pragmas
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid="apply_sqlite_pragmas")
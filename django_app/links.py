@@ -0,0 +1,93 @@
+"""Canonical form of news links, so one article reached by different URLs is stored once"""
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode
+import hashlib
+
+from django.db import transaction
+from yarl import URL
+
+TRACKING_PARAMS = frozenset((
+    "fbclid", "gclid", "dclid", "yclid", "msclkid", "mc_cid", "mc_eid", "igshid", "_ga", "_hsenc", "_hsmi", "ref_src",
+))
+TRACKING_PREFIXES = ("utm_",)
+
+DedupeStats = namedtuple("DedupeStats", ("scanned", "hashed", "deleted"))
+
+
+def _is_tracking(param: str) -> bool:
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+
+def canonical_link(link: str) -> str:
+    """
+    Link with lowercased scheme and host, without default port, fragment and tracking parameters,
+    with query parameters sorted. Relative links are only stripped.
+    """
+    url = URL(link.strip())
+    if not url.is_absolute():
+        return link.strip()
+    host = (url.host or "").lower()
+    netloc = host if url.port is None or url.is_default_port() else "{}:{}".format(host, url.port)
+    query = sorted((key, value) for key, value in url.query.items() if not _is_tracking(key))
+    return "{}://{}{}{}".format(url.scheme.lower(), netloc, url.raw_path or "/",
+                                "?" + urlencode(query) if query else "")
+
+
+def link_hash(link: str) -> str:
+    """Hex digest of canonical link, stored in ``NewsItem.link_hash``"""
+    return hashlib.sha1(canonical_link(link).encode("utf-8")).hexdigest()
+
+
+def dedupe_news_items(model, batch_size: int=500,
+                      progress: Optional[Callable[[DedupeStats], None]]=None) -> DedupeStats:
+    """
+    Recompute ``link_hash`` of all news items batch by batch in primary key order and delete later duplicates,
+    so the oldest item of every canonical link survives. Every batch is a transaction.
+    ``model`` is ``NewsItem`` or its historical version in migrations.
+    """
+    scanned = hashed = deleted = 0
+    last_pk = 0
+    while True:
+        rows = list(model.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "link", "link_hash")
+                    [:batch_size])
+        if not rows:
+            return DedupeStats(scanned=scanned, hashed=hashed, deleted=deleted)
+        last_pk = rows[-1][0]
+        scanned += len(rows)
+        hashes = {}  # type: Dict[str, int]
+        duplicates = []  # type: List[int]
+        changed = {}  # type: Dict[int, str]
+        for pk, link, current in rows:
+            new = link_hash(link)
+            if new in hashes:
+                duplicates.append(pk)
+                continue
+            hashes[new] = pk
+            if new != current:
+                changed[pk] = new
+        # items of this batch give up their old hashes, so only other items may hold new ones
+        releasing = set(changed) | set(duplicates)
+        with transaction.atomic():
+            holders = model.objects.filter(link_hash__in=list(hashes)).values_list("pk", "link_hash")
+            for holder_pk, holder_hash in holders:
+                pk = hashes[holder_hash]
+                if holder_pk in releasing:
+                    continue
+                if holder_pk < pk:
+                    duplicates.append(pk)
+                    changed.pop(pk, None)
+                elif holder_pk > pk:
+                    # hash left by a later item with another link before rules changed, recomputed when reached
+                    model.objects.filter(pk=holder_pk).update(link_hash=None)
+            if duplicates:
+                model.objects.filter(pk__in=duplicates).delete()
+                deleted += len(duplicates)
+            if changed:
+                model.objects.filter(pk__in=list(changed)).update(link_hash=None)
+            for pk, new in changed.items():
+                model.objects.filter(pk=pk).update(link_hash=new)
+        hashed += len(changed)
+        if progress is not None:
+            progress(DedupeStats(scanned=scanned, hashed=hashed, deleted=deleted))
@@ -0,0 +1,20 @@
+"""One-off removal of news duplicated by canonical link"""
+from django.core.management.base import BaseCommand
+
+from django_app.links import DedupeStats, dedupe_news_items
+from django_app.models import NewsItem
+
+
+class Command(BaseCommand):
+    help = "Fill missing link hashes of news, e.g. of bulk inserted rows, and delete later news with the same " \
+           "canonical link. Run it after canonicalization rules change."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **kwargs):
+        def progress(stats: DedupeStats) -> None:
+            self.stdout.write("scanned={0.scanned} hashed={0.hashed} deleted={0.deleted}".format(stats))
+
+        stats = dedupe_news_items(NewsItem, batch_size=kwargs["batch_size"], progress=progress)
+        self.stdout.write("done: scanned={0.scanned} hashed={0.hashed} deleted={0.deleted}".format(stats))
@@ -0,0 +1,33 @@
+"""Streaming bulk import of news from files"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from newstler_site.config import get_options
+from newstler_site.external_services.news_import import NewsImporter, read_files
+
+
+class Command(BaseCommand):
+    help = "Import news from JSONL, CSV or RSS/Atom files and directories of such files, skipping known links"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Files or directories")
+        parser.add_argument("--format", choices=("jsonl", "csv", "rss"),
+                            help="Format of all files, guessed by file extension by default")
+        parser.add_argument("--tag", help="Tag of records without one, e.g. of RSS items without category")
+        parser.add_argument("--batch-size", type=int, default=get_options().getint("news-import", "batch-size"))
+
+    def handle(self, *args, **kwargs):
+        importer = NewsImporter(batch_size=kwargs["batch_size"], default_tag=kwargs["tag"])
+        started = time.perf_counter()
+
+        def progress(created: int) -> None:
+            self.stdout.write("created={} rate={:.0f} rows/s".format(created, created / (time.perf_counter() - started)))
+
+        try:
+            stats = importer.run(read_files(kwargs["paths"], kwargs["format"]), progress=progress)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        self.stdout.write("read={0.read} created={0.created} duplicates={0.duplicates} skipped={0.skipped} "
+                          "tags_created={0.tags_created} duration={0.duration:.2f}s rate={1:.0f} rows/s".format(
+                              stats, stats.read / stats.duration if stats.duration else 0.0))
@@ -0,0 +1,46 @@
+"""Background LinkedIn token check and profile prefetch"""
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from newstler_site.config import get_options
+from newstler_site.external_services.profile_prefetch import ProfilePrefetcher
+from newstler_site.external_services.service_registry import ServiceRegistry
+
+
+class Command(BaseCommand):
+    help = "Mark LinkedIn tokens that expire soon and prefetch profiles of active users into profile cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Run as a worker, scanning every --interval seconds")
+        parser.add_argument("--interval", type=float, default=get_options().getfloat("profile-prefetch", "interval"))
+
+    def handle(self, *args, **kwargs):
+        registry = ServiceRegistry.get()
+        options = get_options()
+        profile_cache = registry.profile_cache()
+        if not profile_cache.shared:
+            raise CommandError("Profile cache is not shared with web workers, they would never see prefetched "
+                               "profiles: set [profile-cache] backend=django-cache with cache-alias of a cache "
+                               "shared by all processes, e.g. memcached")
+        # only materialized feeds track their readers, other storages may load all news at creation
+        materialized = options.get("news-storage", "backend") == "materialized" and \
+            not options.getboolean("news-storage", "disabled")
+        prefetcher = ProfilePrefetcher(
+            linkedin=registry.async_linkedin(),
+            profile_cache=profile_cache,
+            news_storage=registry.news_storage() if materialized else None,
+            batch_size=options.getint("profile-prefetch", "batch-size"),
+            concurrency=options.getint("profile-prefetch", "concurrency"),
+            rate_limit=options.getfloat("profile-prefetch", "rate-limit"),
+            expiry_margin=datetime.timedelta(seconds=options.getint("profile-prefetch", "expiry-margin")),
+            active_period=datetime.timedelta(days=options.getint("profile-prefetch", "active-days")),
+        )
+        while True:
+            stats = prefetcher.run_once()
+            self.stdout.write("scanned={0.scanned} expiring={0.expiring} refreshed={0.refreshed} "
+                              "revoked={0.revoked} failed={0.failed} duration={0.duration:.2f}s".format(stats))
+            if not kwargs["loop"]:
+                return
+            time.sleep(max(0.0, kwargs["interval"] - stats.duration))
@@ -0,0 +1,39 @@
+"""Background fan-out of news to materialized feeds"""
+import math
+import time
+
+from django.core.management.base import BaseCommand
+
+from newstler_site.config import get_options
+from newstler_site.external_services.materialized_feed import FeedMaterializer
+from newstler_site.external_services.news_storage import NewsTagMatcher
+
+
+class Command(BaseCommand):
+    help = "Match positions of users to tags, build feeds of new tag scores and fan news added since the last run " \
+           "out to feeds of materialized news storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Run as a worker, refreshing every --interval seconds")
+        parser.add_argument("--interval", type=float, default=get_options().getfloat("user-feeds", "interval"))
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Build all feeds from scratch first, e.g. after tags were renamed")
+
+    def handle(self, *args, **kwargs):
+        options = get_options()
+        materializer = FeedMaterializer(
+            # rebuilt at the start of every refresh
+            matcher=NewsTagMatcher(max_age=math.inf),
+            max_items=options.getint("user-feeds", "max-items"),
+            batch_size=options.getint("user-feeds", "batch-size"),
+            rescan_ids=options.getint("user-feeds", "rescan-ids"),
+        )
+        if kwargs["rebuild"]:
+            materializer.rebuild_all()
+        while True:
+            stats = materializer.run_once()
+            self.stdout.write("matched={0.matched} built={0.built} dropped={0.dropped} fanned_out={0.fanned_out} "
+                              "entries={0.entries} duration={0.duration:.2f}s".format(stats))
+            if not kwargs["loop"]:
+                return
+            time.sleep(max(0.0, kwargs["interval"] - stats.duration))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 11:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0004_news_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermetainformationmodel',
+            name='refresh_required',
+            field=models.BooleanField(default=False, verbose_name='Token expires soon'),
+        ),
+        migrations.AlterField(
+            model_name='usermetainformationmodel',
+            name='expiration',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Token expiration'),
+        ),
+    ]
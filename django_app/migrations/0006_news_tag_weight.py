@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0005_token_refresh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newstag',
+            name='weight',
+            field=models.FloatField(default=1.0, verbose_name='Relevance weight'),
+        ),
+    ]
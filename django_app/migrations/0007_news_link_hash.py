@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 13:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from django_app.links import dedupe_news_items
+
+
+def fill_link_hashes(apps, schema_editor):
+    dedupe_news_items(apps.get_model("django_app", "NewsItem"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_app', '0006_news_tag_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsitem',
+            name='link_hash',
+            field=models.CharField(editable=False, max_length=40, null=True, verbose_name='Canonical link hash'),
+        ),
+        # existing duplicates are removed before unique index is created
+        migrations.RunPython(fill_link_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='newsitem',
+            name='link_hash',
+            field=models.CharField(editable=False, max_length=40, null=True, unique=True,
+                                   verbose_name='Canonical link hash'),
+        ),
+    ]
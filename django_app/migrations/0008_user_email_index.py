@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 14:00
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index for login by email, auth_user table belongs to django.contrib.auth and has none"""
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('django_app', '0007_news_link_hash'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            ["CREATE INDEX django_app_auth_user_email_idx ON auth_user (email)"],
+            ["DROP INDEX django_app_auth_user_email_idx"],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 16:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Index for prefix search of news by title in admin"""
+
+    dependencies = [
+        ('django_app', '0008_user_email_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newsitem',
+            name='title',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
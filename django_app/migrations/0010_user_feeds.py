@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 18:00
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """Materialized feeds shared by users with equal tag scores"""
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('django_app', '0009_news_title_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MaterializedFeed',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_hash', models.CharField(max_length=40, unique=True)),
+                ('scores', models.TextField()),
+                ('fanned_out_through', models.IntegerField(blank=True, null=True)),
+                ('cutoff_score', models.FloatField(blank=True, null=True)),
+                ('cutoff_id', models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserFeed',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.CharField(db_index=True, max_length=255)),
+                ('feed', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='django_app.MaterializedFeed')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='feed',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='django_app.MaterializedFeed'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='news',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='django_app.NewsItem'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['feed', 'score', 'news'], name='django_app_feed_rank_idx'),
+        ),
+    ]
@@ -1,27 +1,96 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 
+from django_app.links import link_hash
+
 
 class UserMetaInformationModel(models.Model):
     user = models.OneToOneField(to=User, on_delete=models.CASCADE, related_name="meta")
     access_token = models.TextField(verbose_name="linkedIn access token", null=True, blank=True)
-    expiration = models.DateTimeField(verbose_name="Token expiration", null=True, blank=True)
+    expiration = models.DateTimeField(verbose_name="Token expiration", null=True, blank=True, db_index=True)
+    refresh_required = models.BooleanField(verbose_name="Token expires soon", default=False)
 
     def __str__(self):
         return self.user.username
 
 
 class NewsTag(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
+    weight = models.FloatField(verbose_name="Relevance weight", default=1.0)
 
     def __str__(self):
         return self.name
 
 
 class NewsItem(models.Model):
-    title = models.CharField(max_length=255)
+    # indexed for prefix search in admin
+    title = models.CharField(max_length=255, db_index=True)
     link = models.URLField(max_length=100)
+    # sha1 of canonical link, empty for rows bulk inserted without it until "manage.py dedupe_news"
+    link_hash = models.CharField(verbose_name="Canonical link hash", max_length=40, unique=True, null=True,
+                                 editable=False)
     tag = models.ForeignKey(to=NewsTag, related_name="news")
 
+    class Meta:
+        indexes = [
+            # per-tag feed ordered by id
+            models.Index(fields=["tag", "id"], name="django_app_news_tag_id_idx"),
+        ]
+
+    def clean(self):
+        if not self.link:
+            return
+        self.link_hash = link_hash(self.link)
+        if NewsItem.objects.filter(link_hash=self.link_hash).exclude(pk=self.pk).exists():
+            raise ValidationError({"link": "News with the same link already exists"})
+
+    def save(self, *args, **kwargs):
+        self.link_hash = link_hash(self.link)
+        super(NewsItem, self).save(*args, **kwargs)
+
     def __str__(self):
         return self.title
+
+
+class MaterializedFeed(models.Model):
+    """
+    Head of a ranked feed precomputed by "manage.py refresh_feeds", shared by users with equal tag scores.
+    Entries rank after ``cutoff`` are trimmed, feeds without cutoff hold all their articles.
+    """
+    # sha1 of normalized tag scores
+    key_hash = models.CharField(max_length=40, unique=True)
+    # json list of [tag name, score] pairs, null for feeds of all news
+    scores = models.TextField()
+    # id of the last news put into entries, null until feed is built
+    fanned_out_through = models.IntegerField(null=True, blank=True)
+    cutoff_score = models.FloatField(null=True, blank=True)
+    cutoff_id = models.IntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return self.scores
+
+
+class FeedEntry(models.Model):
+    # leading column of the rank index
+    feed = models.ForeignKey(to=MaterializedFeed, on_delete=models.CASCADE, related_name="entries", db_index=False)
+    score = models.FloatField()
+    news = models.ForeignKey(to=NewsItem, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        indexes = [
+            # feed pages are read in descending order of this index
+            models.Index(fields=["feed", "score", "news"], name="django_app_feed_rank_idx"),
+        ]
+
+
+class UserFeed(models.Model):
+    """Feed a user reads, recorded whenever the user's LinkedIn profile is loaded"""
+    user = models.OneToOneField(to=User, on_delete=models.CASCADE, related_name="feed")
+    position = models.CharField(max_length=255, db_index=True)
+    # null until "manage.py refresh_feeds" matches position to tags
+    feed = models.ForeignKey(to=MaterializedFeed, on_delete=models.SET_NULL, related_name="users", null=True,
+                             blank=True)
+
+    def __str__(self):
+        return self.user.username
@@ -0,0 +1,8 @@
+"""Signals of django_app models that django does not send itself"""
+from django.dispatch import Signal
+
+# Sent with sender=NewsItem after NewsItem.objects.bulk_create(), which bypasses post_save.
+news_items_bulk_created = Signal(providing_args=["count"])
+
+# Sent with sender=NewsItem after queryset updates or deletes of NewsItem rows, which bypass post_save and post_delete.
+news_items_bulk_changed = Signal(providing_args=["count"])
@@ -0,0 +1,17 @@
+"""
+gunicorn settings, used as ``gunicorn -c gunicorn_config.py newstler_site.django_facade.wsgi``.
+Workers count and bind address come from gunicorn defaults and WEB_CONCURRENCY and PORT environment variables.
+"""
+
+# application is loaded and warmed up once in master process, workers share its memory copy-on-write
+preload_app = True
+
+
+def on_starting(server):
+    from newstler_site.django_facade.warmup import warm_up
+    warm_up()
+
+
+def post_fork(server, worker):
+    from newstler_site.django_facade.warmup import after_fork
+    after_fork()
@@ -2,7 +2,9 @@
 Defines supported options for all service parameters.
 """
 from configparser import ConfigParser
+from typing import Optional
 import os
+import threading
 
 import logging
 
@@ -11,10 +13,22 @@ from django.conf import settings
 LOG = logging.getLogger('testlogger')
 
 
+_options = None  # type: Optional[ConfigParser]
+_options_lock = threading.Lock()
+
+
 def define_options() -> ConfigParser:
+    """Options freshly read from config file, given by NEWSTLER_CONFIG environment variable or packaged one"""
     options = ConfigParser()
-    config_file = os.path.join(settings.BASE_DIR, "config.ini")
+    config_file = os.environ.get("NEWSTLER_CONFIG", os.path.join(settings.BASE_DIR, "config.ini"))
     options.read(config_file)
     return options
 
-options = define_options()
+
+def get_options() -> ConfigParser:
+    """Options of the process, read on first use"""
+    global _options
+    with _options_lock:
+        if _options is None:
+            _options = define_options()
+        return _options
@@ -0,0 +1,21 @@
+"""
+ASGI config for newstler_site project.
+
+It exposes the ASGI 3 callable as a module-level variable named ``application``, run it by an ASGI server, e.g.::
+
+    uvicorn newstler_site.django_facade.asgi:application
+
+News page is served by ``AsyncNewsHandler``, other requests by the WSGI application of ``wsgi.py``.
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "newstler_site.django_facade.settings")
+
+from newstler_site.django_facade.wsgi import application as wsgi_application  # noqa: E402 sets django up
+from newstler_site.django_facade.async_handlers import ASGIApplication, AsyncNewsHandler  # noqa: E402
+from newstler_site.django_facade.handlers import PageName  # noqa: E402
+
+application = ASGIApplication(wsgi_application, routes={
+    PageName.NEWS.value: lambda run: AsyncNewsHandler(template_name="news.html", run=run),
+})
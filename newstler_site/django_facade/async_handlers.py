@@ -0,0 +1,272 @@
+"""
+ASGI request handling of django based facade.
+Django 1.11 has no async views, so the news page, which mostly waits for LinkedIn, is served by a coroutine and
+every other request goes to the WSGI application in a thread pool.
+"""
+from concurrent.futures import Executor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import sys
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+from newstler_site.django_facade import database
+from newstler_site.django_facade.handlers import NewstlerHandler, PageName, linkedin_connected, stale_user_data
+from newstler_site.external_services.linkedin_client import RESTError, UserData
+from newstler_site.external_services.service_registry import ServiceRegistry
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+WSGIApp = Callable[[dict, Callable], Any]
+
+
+def wsgi_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    """WSGI environ of ASGI http ``scope``"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        # WSGI passes path as latin-1 decoded bytes
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/{}".format(scope.get("http_version", "1.1")),
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        value = raw_value.decode("latin-1")
+        environ[name] = environ[name] + "," + value if name in environ else value
+    return environ
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks = []  # type: List[bytes]
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _encoded_headers(headers: List[Tuple[str, str]]) -> List[Tuple[bytes, bytes]]:
+    return [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+
+class ThreadRunner:
+    """
+    Runs blocking code, i.e. database access and template rendering, in a thread pool.
+    Like django request handling, database connections which are broken or older than ``CONN_MAX_AGE`` are closed
+    after every call. The next call of a request may run in another thread, so reads pinned to primary database
+    are released after every call too, and calls given ``request`` carry the pinning on it from call to call.
+    """
+    def __init__(self, executor: Optional[Executor]=None) -> None:
+        self.executor = executor or ThreadPoolExecutor(max_workers=settings.ASGI_THREADS)
+
+    @staticmethod
+    def _call(func: Callable, args: tuple, request: Optional[HttpRequest]) -> Any:
+        if request is not None:
+            database.resume_request(request)
+        try:
+            return func(*args)
+        finally:
+            if request is not None:
+                database.suspend_request(request)
+            close_old_connections()
+            database.start_request()
+
+    async def __call__(self, func: Callable, *args, request: Optional[HttpRequest]=None) -> Any:
+        return await asyncio.get_event_loop().run_in_executor(self.executor, self._call, func, args, request)
+
+
+async def send_response(response: HttpResponse, send: Send, run: ThreadRunner,
+                        request: Optional[HttpRequest]=None) -> None:
+    """Send django response, streaming content of ``request`` is iterated in thread pool"""
+    headers = list(response.items())
+    headers.extend(("Set-Cookie", cookie.output(header="")) for cookie in response.cookies.values())
+    await send({"type": "http.response.start", "status": response.status_code,
+                "headers": _encoded_headers(headers)})
+    try:
+        if not response.streaming:
+            await send({"type": "http.response.body", "body": response.content})
+            return
+        chunks = iter(response)
+        while True:
+            chunk = await run(next, chunks, None, request=request)
+            if chunk is None:
+                break
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body"})
+    finally:
+        # sends request_finished signal
+        await run(response.close, request=request)
+
+
+class WSGIAdapter:
+    """ASGI application serving http requests by WSGI application in thread pool"""
+    def __init__(self, wsgi_application: WSGIApp, run: ThreadRunner) -> None:
+        self.wsgi_application = wsgi_application
+        self.run = run
+
+    def _call_wsgi(self, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        started = []  # type: List[Tuple[str, List[Tuple[str, str]]]]
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None) -> Callable[[bytes], None]:
+            started[:] = [(status, headers)]
+            return lambda data: None
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            body = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        status, headers = started[0]
+        return int(status.split(" ", 1)[0]), headers, body
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = await read_body(receive)
+        status, headers, content = await self.run(self._call_wsgi, wsgi_environ(scope, body))
+        await send({"type": "http.response.start", "status": status, "headers": _encoded_headers(headers)})
+        await send({"type": "http.response.body", "body": content})
+
+
+class AsyncNewsHandler:
+    """
+    ``NewstlerHandler.news_page`` which awaits LinkedIn profile without holding a thread, so one process serves
+    as many pages at a time as LinkedIn answers, not as many as it has threads.
+    Session and authentication, page query and rendering run in thread pool.
+    Old style middleware of ``settings.MIDDLEWARE`` is applied, except ``process_view``, which news page does not
+    need; new style ones, e.g. ``InstrumentationMiddleware``, are skipped.
+    """
+    def __init__(self, template_name: str, run: ThreadRunner) -> None:
+        self.template_name = template_name
+        self.run = run
+        self.handler = NewstlerHandler()
+        self.middleware = [middleware() for middleware in map(import_string, settings.MIDDLEWARE)
+                           if issubclass(middleware, MiddlewareMixin)]
+
+    def _process_request(self, request: HttpRequest) -> Tuple[Optional[HttpResponse], Optional[UserData]]:
+        """Early response or, for user with connected LinkedIn, cached profile"""
+        for middleware in self.middleware:
+            if hasattr(middleware, "process_request"):
+                response = middleware.process_request(request)
+                if response is not None:
+                    return response, None
+        if not request.user.is_authenticated():
+            return redirect_to_login(request.get_full_path()), None
+        if not linkedin_connected(request.user):
+            return redirect(reverse(PageName.HOME_PAGE.value)), None
+        return None, ServiceRegistry.get().profile_cache().lookup(request.user.id)
+
+    def _process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        for middleware in reversed(self.middleware):
+            if hasattr(middleware, "process_response"):
+                response = middleware.process_response(request, response)
+        return response
+
+    def _render(self, request: HttpRequest, user_data: Optional[UserData], loaded: bool) -> HttpResponse:
+        """:param loaded: ``user_data`` is just loaded from LinkedIn rather than taken from cache"""
+        if not user_data:
+            self.handler.disconnect_linkedin(request.user)
+            return redirect(reverse(PageName.HOME_PAGE.value))
+        if loaded:
+            ServiceRegistry.get().profile_cache().store(request.user.id, user_data, request.user.meta.expiration)
+            ServiceRegistry.get().news_storage().subscribe(request.user.id, user_data)
+        return self.handler.render_news_page(request, self.template_name, user_data)
+
+    async def _load_user_data(self, access_token: str) -> Optional[UserData]:
+        async with ServiceRegistry.get().async_linkedin().session(access_token) as user_session:
+            return await user_session.get_user_data()
+
+    async def _respond(self, request: HttpRequest) -> HttpResponse:
+        response, user_data = await self.run(self._process_request, request, request=request)
+        if response is not None:
+            return response
+        loaded = user_data is None
+        if loaded:
+            try:
+                user_data = await self._load_user_data(request.user.meta.access_token)
+            except RESTError as e:
+                try:
+                    user_data = await self.run(stale_user_data, request.user.id, e, request=request)
+                except RESTError:
+                    return HttpResponse("<h1>Failed to get access token: {}".format(e.error))
+                loaded = False
+        return await self.run(self._render, request, user_data, loaded, request=request)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = WSGIRequest(wsgi_environ(scope, await read_body(receive)))
+        try:
+            response = await self._respond(request)
+        except Exception as e:
+            # logged by django like failures of WSGI requests
+            response = await self.run(response_for_exception, request, e, request=request)
+        response = await self.run(self._process_response, request, response, request=request)
+        await send_response(response, send, self.run, request)
+
+
+class ASGIApplication:
+    """
+    ASGI 3 application: GET requests of ``routes`` paths are served by their async handlers,
+    other http requests by ``wsgi_application``
+    """
+    def __init__(self, wsgi_application: WSGIApp, routes: Dict[str, Callable[[ThreadRunner], ASGIApp]],
+                 executor: Optional[Executor]=None) -> None:
+        """:param routes: url name to factory of its handler"""
+        self.run = ThreadRunner(executor)
+        self.wsgi = WSGIAdapter(wsgi_application, self.run)
+        self.routes = routes
+        self._handlers = None  # type: Optional[Dict[str, ASGIApp]]
+
+    @property
+    def handlers(self) -> Dict[str, ASGIApp]:
+        """Async handlers by path, urls are resolved on first request since URLconf may not be loaded yet"""
+        if self._handlers is None:
+            self._handlers = {reverse(name): factory(self.run) for name, factory in self.routes.items()}
+        return self._handlers
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await ServiceRegistry.get().async_linkedin().close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError("Unsupported ASGI scope type: {}".format(scope["type"]))
+        handler = self.handlers.get(scope["path"]) if scope["method"] in ("GET", "HEAD") else None
+        await (handler or self.wsgi)(scope, receive, send)
@@ -1,12 +1,27 @@
 """Customizing of django authenticate"""
+from typing import Optional
+
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
 from django.http.request import HttpRequest
 
 
-class EmailBackend(ModelBackend):
+class UserWithMetaMixin:
+    """
+    Loads user together with LinkedIn meta information, it is needed by almost every page.
+    ``AuthenticationMiddleware`` gets request user via ``get_user`` of the backend user logged in with.
     """
-    Authenticate against email addresses.
+    def get_user(self, user_id: int) -> Optional[User]:
+        try:
+            user = User.objects.select_related("meta").get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+class EmailBackend(UserWithMetaMixin, ModelBackend):
+    """
+    Authenticate against email addresses, looked up by django_app_auth_user_email_idx index.
     """
     def authenticate(self, request: HttpRequest, email: str=None, password: str=None, **kwargs):
         try:
@@ -16,3 +31,9 @@ class EmailBackend(ModelBackend):
         else:
             if user.check_password(password):
                 return user
+
+
+class UsernameBackend(UserWithMetaMixin, ModelBackend):
+    """
+    django ``ModelBackend``, e.g. for admin login by username.
+    """
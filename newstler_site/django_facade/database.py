@@ -0,0 +1,85 @@
+"""
+Database tuning of django based facade: pragmas of SQLite connections and routing of reads to replicas.
+Reads stick to primary database for the rest of a request once it writes, see ``ReplicaPinningMiddleware``.
+"""
+from typing import Optional
+import logging
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.http import HttpRequest
+
+LOG = logging.getLogger('consolelogger')
+
+_local = threading.local()
+
+
+def apply_sqlite_pragmas(sender, connection: BaseDatabaseWrapper, **kwargs) -> None:
+    """``connection_created`` receiver, sets ``SQLITE_PRAGMAS`` on every new SQLite connection"""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute("PRAGMA {} = {}".format(name, value))
+            if name == "journal_mode":
+                # in-memory databases keep "memory" journal
+                mode = cursor.fetchone()[0]
+                if mode.lower() != str(value).lower() and mode != "memory":
+                    LOG.warning("SQLite journal mode of %s is %s, not %s", connection.alias, mode, value)
+
+
+def start_request(pinned: bool=False) -> None:
+    """Reset state of current thread before a request: reads go to replicas unless ``pinned`` to primary"""
+    _local.pinned = pinned
+    _local.written = False
+
+
+def written() -> bool:
+    """Current thread wrote to primary database since ``start_request``"""
+    return getattr(_local, "written", False)
+
+
+def suspend_request(request: HttpRequest) -> None:
+    """Keep state of current thread on ``request``, whose handling goes on in another thread"""
+    request._database_routing = (getattr(_local, "pinned", False), written())
+
+
+def resume_request(request: HttpRequest) -> None:
+    """Restore state kept on ``request`` by ``suspend_request`` in current thread, ``start_request`` if none"""
+    _local.pinned, _local.written = getattr(request, "_database_routing", (False, False))
+
+
+class ReplicaRouter:
+    """
+    Reads of ``DATABASE_REPLICATED_MODELS`` go to a random database of ``DATABASE_REPLICAS``, all writes go
+    to primary one. Reads go to primary after a write of the current request, inside transactions, which run
+    on primary, and in requests pinned by ``ReplicaPinningMiddleware``, so a user reads own writes
+    despite replication lag.
+    """
+    def __init__(self) -> None:
+        self.replicas = list(settings.DATABASE_REPLICAS)
+        self.models = {label.lower() for label in settings.DATABASE_REPLICATED_MODELS}
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        if not self.replicas or model._meta.label_lower not in self.models:
+            return None
+        if getattr(_local, "pinned", False) or written() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints) -> str:
+        _local.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        databases = [DEFAULT_DB_ALIAS] + self.replicas
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str]=None, **hints) -> Optional[bool]:
+        # replicas copy schema of primary
+        return False if db in self.replicas else None
@@ -2,23 +2,71 @@
 from enum import Enum, unique
 
 from django.utils.decorators import method_decorator
+from collections import namedtuple
 from functools import wraps
-from typing import Callable, Optional
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 import datetime
+import hashlib
+import json
+import logging
+import math
 
+from newstler_site import instrumentation
 from newstler_site.django_facade.forms import SimpleLoginForm, RegistrationForm
-from newstler_site.external_services.linkedin_client import RESTError
+from newstler_site.django_facade.oauth_state import make_state, state_is_valid
+from newstler_site.external_services.linkedin_client import RESTError, UserData
+from newstler_site.external_services.news_storage import ContentVersion, InvalidCursor, NewsStorage
 from newstler_site.external_services.service_registry import ServiceRegistry
 from django_app.models import UserMetaInformationModel
 
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
-from django.http import HttpRequest, HttpResponse
+from django.contrib.auth.models import User
+from django.http import (
+    HttpRequest, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+)
 from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.core.exceptions import ObjectDoesNotExist
 
-STATE_SESSION_NAME = "state"
+NEWS_ITEMS_TEMPLATE = "news_items.html"
+NEWS_STREAM_MARKER = "<!-- news stream -->"
+JSON_CONTENT_TYPE = "application/json"
+
+LOG = logging.getLogger('consolelogger')
+
+NewsFragment = namedtuple("NewsFragment", ("html", "next_cursor"))
+
+PROFILE_CACHE_LOOKUPS = instrumentation.REGISTRY.counter(
+    "newstler_profile_cache_lookups_total", "LinkedIn profile cache lookups", ("result",))
+LOGIN_THROTTLED = instrumentation.REGISTRY.counter(
+    "newstler_login_throttled_total", "Login attempts rejected by throttling")
+FRAGMENT_CACHE_LOOKUPS = instrumentation.REGISTRY.counter(
+    "newstler_fragment_cache_lookups_total", "Rendered news cache lookups", ("result",))
+STALE_PROFILES = instrumentation.REGISTRY.counter(
+    "newstler_stale_profiles_total", "Pages served with a stale LinkedIn profile since LinkedIn failed")
+
+
+def _collect_cache_stats() -> None:
+    for result, value in ServiceRegistry.get().profile_cache().stats().items():
+        PROFILE_CACHE_LOOKUPS.update(value, result=result)
+    for result, value in ServiceRegistry.get().fragment_cache().stats().items():
+        FRAGMENT_CACHE_LOOKUPS.update(value, result=result)
+
+
+instrumentation.REGISTRY.add_collector(_collect_cache_stats)
+
+
+class _ContentChanged(Exception):
+    """News storage content changed while a fragment was rendered, so it is not of the version in its key"""
+    def __init__(self, fragment) -> None:
+        super(_ContentChanged, self).__init__()
+        self.fragment = fragment
 
 
 @unique
@@ -40,12 +88,73 @@ def anonymous_required(func: Callable) -> Callable:
     return decorator
 
 
+def timed_render(request: HttpRequest, template_name: str, context: Optional[dict]=None) -> HttpResponse:
+    """django ``render`` accounted as "render" phase of request trace"""
+    with instrumentation.timed("render"):
+        return render(request, template_name, context)
+
+
+def json_error(message: str, status: int) -> HttpResponse:
+    return HttpResponse(json.dumps({"error": message}), status=status, content_type=JSON_CONTENT_TYPE)
+
+
+def with_headers(response: HttpResponse, headers: Dict[str, str]) -> HttpResponse:
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def stale_user_data(user_id: int, error: RESTError) -> UserData:
+    """
+    Last known profile of user to serve instead of failing when LinkedIn is unavailable
+
+    :raise RESTError: ``error`` if there is no profile within the staleness limit
+    """
+    user_data = ServiceRegistry.get().profile_cache().get_stale(user_id)
+    if user_data is None:
+        raise error
+    LOG.warning("Serving stale LinkedIn profile of user %s: %s", user_id, error.error)
+    STALE_PROFILES.inc()
+    return user_data
+
+
+def linkedin_connected(user: User) -> bool:
+    """User has LinkedIn access token which is not expired yet"""
+    meta = getattr(user, "meta", None)  # type: Optional[UserMetaInformationModel]
+    if meta is None or not meta.access_token:
+        return False
+    return meta.expiration is None or meta.expiration > timezone.now()
+
+
+def client_ip(request: HttpRequest) -> str:
+    """
+    Address of client, appended to ``CLIENT_IP_HEADER`` by the farthest of ``CLIENT_IP_PROXY_HOPS`` trusted proxies.
+    Addresses left of it are sent by the client and may be forged.
+    """
+    hops = settings.CLIENT_IP_PROXY_HOPS
+    forwarded = [address.strip() for address in request.META.get(settings.CLIENT_IP_HEADER, "").split(",")]
+    forwarded = [address for address in forwarded if address]
+    if hops <= 0 or not forwarded:
+        return request.META.get("REMOTE_ADDR", "")
+    # fewer addresses than proxies: request passed only some of them
+    return forwarded[max(0, len(forwarded) - hops)]
+
+
 class AuthRequestHandler:
     @method_decorator(anonymous_required)
     def login_page(self, request: HttpRequest, template_name: str) -> HttpResponse:
         if request.method == "POST":
             form = SimpleLoginForm(request.POST)
             if form.is_valid():
+                # throttled before password hashing, which is the expensive part of login
+                wait = ServiceRegistry.get().login_throttle().attempt(client_ip(request), form.cleaned_data["email"])
+                if wait:
+                    LOGIN_THROTTLED.inc()
+                    form.add_error(None, "Too many login attempts, try again in {} seconds".format(math.ceil(wait)))
+                    response = timed_render(request, template_name, {"form": form})
+                    response.status_code = 429
+                    response["Retry-After"] = str(math.ceil(wait))
+                    return response
                 user = authenticate(request, email=form.cleaned_data["email"], password=form.cleaned_data["password"])
                 if user:
                     login(request, user)
@@ -54,7 +163,7 @@ class AuthRequestHandler:
                     form.add_error("password", "Incorrect email or password")
         else:
             form = SimpleLoginForm()
-        return render(request, template_name, {"form": form})
+        return timed_render(request, template_name, {"form": form})
 
     @method_decorator(anonymous_required)
     def register(self, request: HttpRequest, template_name: str) -> HttpResponse:
@@ -69,7 +178,7 @@ class AuthRequestHandler:
                 return redirect(PageName.HOME_PAGE.value)
         else:
             form = RegistrationForm()
-        return render(request, template_name, {"form": form})
+        return timed_render(request, template_name, {"form": form})
 
     @method_decorator(login_required)
     def logout_page(self, request: HttpRequest) -> HttpResponse:
@@ -80,29 +189,179 @@ class AuthRequestHandler:
 class NewstlerHandler:
     @method_decorator(login_required)
     def index(self, request: HttpRequest, template_name: str) -> HttpResponse:
-        linkedin_client = ServiceRegistry.get().linkedin()
-        state, endpoint = linkedin_client.authorization_endpoint
-        request.session[STATE_SESSION_NAME] = state.hex
-        if not hasattr(request.user, "meta") or not request.user.meta.access_token:
-            return render(request, template_name, {"linkedin_auth_url": endpoint})
+        if not linkedin_connected(request.user) or request.user.meta.refresh_required:
+            # signed state is checked by linkedin_endpoint, so the page does not write the session
+            endpoint = ServiceRegistry.get().linkedin().authorization_url(make_state(request.user.id))
+            return timed_render(request, template_name, {"linkedin_auth_url": endpoint})
         else:
             return redirect(to=reverse(PageName.NEWS.value))
 
     @method_decorator(login_required)
     def news_page(self, request: HttpRequest, template_name: str) -> HttpResponse:
-        linkedin_client = ServiceRegistry.get().linkedin()
+        if not linkedin_connected(request.user):
+            return redirect(reverse(PageName.HOME_PAGE.value))
+        try:
+            user_data = self.__user_data(request)
+        except RESTError as e:
+            return HttpResponse("<h1>Failed to get access token: {}".format(e.error))
+        if not user_data:
+            return redirect(reverse(PageName.HOME_PAGE.value))
+        return self.render_news_page(request, template_name, user_data)
+
+    def render_news_page(self, request: HttpRequest, template_name: str, user_data: UserData) -> HttpResponse:
+        """``news_page`` of user whose LinkedIn profile is loaded already"""
+        if settings.NEWS_PAGE_STREAMING:
+            return self.__stream_news_page(request, template_name, user_data)
+        try:
+            cursor, limit = self.__page_params(request)
+            fragment = self.__news_fragment(user_data, cursor, limit)
+        except (ValueError, InvalidCursor):
+            return HttpResponseBadRequest("<h1>Invalid news page</h1>")
+        return timed_render(request, template_name, {
+            "news_html": fragment.html,
+            "next_cursor": fragment.next_cursor,
+            "limit": limit,
+            "user_data": user_data,
+        })
+
+    @method_decorator(login_required)
+    def news_api(self, request: HttpRequest) -> HttpResponse:
+        """News page of ``news_page`` as json, see ``NewsStorage.get_news_json``"""
+        if not linkedin_connected(request.user):
+            return json_error("LinkedIn is not connected", status=403)
+        try:
+            user_data = self.__user_data(request)
+        except RESTError as e:
+            return json_error("Failed to get LinkedIn profile: {}".format(e.error), status=502)
+        if not user_data:
+            return json_error("LinkedIn is not connected", status=403)
         storage = ServiceRegistry.get().news_storage()
-        with linkedin_client.session(access_token=request.user.meta.access_token) as user_session:
-            try:
+        try:
+            cursor, limit = self.__page_params(request)
+        except ValueError:
+            return json_error("Invalid news page", status=400)
+        version = storage.version()
+        key = self.__fragment_key(storage, user_data, version, "json", cursor, limit)
+        headers = {"Cache-Control": settings.NEWS_API_CACHE_CONTROL}
+        if key is not None:
+            # validator is known before the page is fetched, so revalidation costs no storage lookup
+            headers["ETag"] = quote_etag(hashlib.md5(key.encode("utf-8")).hexdigest())
+            not_modified = get_conditional_response(request, etag=headers["ETag"])
+            if not_modified is not None:
+                return with_headers(not_modified, headers)
+        try:
+            content, current = self.__cached_fragment(
+                storage, version, key, lambda: storage.get_news_json(user_data, cursor=cursor, limit=limit))
+        except InvalidCursor:
+            return json_error("Invalid news page", status=400)
+        if not current:
+            headers.pop("ETag", None)
+        return with_headers(HttpResponse(content, content_type=JSON_CONTENT_TYPE), headers)
+
+    @staticmethod
+    def __user_data(request: HttpRequest) -> Optional[UserData]:
+        """
+        Profile of user with connected LinkedIn, None if LinkedIn rejected the token and must be connected again.
+        Stale profile is served while LinkedIn fails, e.g. when its circuit breaker is open.
+
+        :raise RESTError: on LinkedIn failures if there is no stale profile
+        """
+        linkedin_client = ServiceRegistry.get().linkedin()
+        profile_cache = ServiceRegistry.get().profile_cache()
+        meta = request.user.meta
+
+        def load_user_data() -> Optional[UserData]:
+            with linkedin_client.session(access_token=meta.access_token) as user_session:
                 user_data = user_session.get_user_data()
-            except RESTError as e:
-                return HttpResponse("<h1>Failed to get access token: {}".format(e.error))
-            if not user_data:
-                request.user.meta.access_token = None
-                request.user.meta.save()
-                return redirect(reverse(PageName.HOME_PAGE.value))
-        news = storage.get_news_by_user_data(user_data)
-        return render(request, template_name, {"news": news, "user_data": user_data})
+            if user_data:
+                ServiceRegistry.get().news_storage().subscribe(request.user.id, user_data)
+            return user_data
+
+        try:
+            user_data = profile_cache.get_user_data(request.user.id, expiration=meta.expiration,
+                                                    loader=load_user_data)
+        except RESTError as e:
+            return stale_user_data(request.user.id, e)
+        if not user_data:
+            NewstlerHandler.disconnect_linkedin(request.user)
+        return user_data
+
+    @staticmethod
+    def disconnect_linkedin(user: User) -> None:
+        """Forget access token rejected by LinkedIn"""
+        user.meta.access_token = None
+        user.meta.save()
+        ServiceRegistry.get().profile_cache().invalidate(user.id)
+
+    @staticmethod
+    def __page_params(request: HttpRequest) -> Tuple[Optional[str], int]:
+        """:raise ValueError: on invalid page size"""
+        cursor = request.GET.get("cursor") or None
+        limit = min(int(request.GET.get("limit", settings.NEWS_PAGE_SIZE)), settings.NEWS_PAGE_MAX_SIZE)
+        if limit < 1:
+            raise ValueError(limit)
+        return cursor, limit
+
+    @staticmethod
+    def __news_fragment(user_data: UserData, cursor: Optional[str], limit: int) -> NewsFragment:
+        """Rendered news page, shared by users with the same feed"""
+        storage = ServiceRegistry.get().news_storage()
+
+        def render_news() -> NewsFragment:
+            page = storage.get_news_page(user_data, cursor=cursor, limit=limit)
+            with instrumentation.timed("render"):
+                html = render_to_string(NEWS_ITEMS_TEMPLATE, {"news": page.articles})
+            return NewsFragment(html=html, next_cursor=page.next_cursor)
+
+        version = storage.version()
+        key = NewstlerHandler.__fragment_key(storage, user_data, version, "html", cursor, limit)
+        fragment, _ = NewstlerHandler.__cached_fragment(storage, version, key, render_news)
+        return fragment
+
+    @staticmethod
+    def __fragment_key(storage: NewsStorage, user_data: UserData, version: Optional[ContentVersion], kind: str,
+                       cursor: Optional[str], limit: int) -> Optional[str]:
+        """
+        Fragment cache key of news page, None if it must not be cached: feed is personal or storage does not
+        track changes. Version token of storage content makes keys of other content differ, in any process.
+        """
+        feed_key = storage.feed_key(user_data)
+        if feed_key is None or version is None:
+            return None
+        return "{}|{}|{}|{}|{}".format(kind, version.token, feed_key, cursor or "", limit)
+
+    @staticmethod
+    def __cached_fragment(storage: NewsStorage, version: Optional[ContentVersion], key: Optional[str],
+                          render: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Fragment of ``key`` from fragment cache and whether it is of storage content ``version``.
+        Fragment rendered while the content changed is returned but not cached, its key names the older version.
+        """
+        def render_version():
+            fragment = render()
+            if storage.version() != version:
+                raise _ContentChanged(fragment)
+            return fragment
+
+        try:
+            return ServiceRegistry.get().fragment_cache().get_or_render(key, render_version), True
+        except _ContentChanged as e:
+            return e.fragment, False
+
+    @staticmethod
+    def __stream_news_page(request: HttpRequest, template_name: str, user_data: UserData) -> HttpResponse:
+        storage = ServiceRegistry.get().news_storage()
+        page = render_to_string(template_name, {"news_stream_marker": NEWS_STREAM_MARKER, "user_data": user_data},
+                                request=request)
+        head, tail = page.split(NEWS_STREAM_MARKER, 1)
+
+        def content() -> Iterator[str]:
+            yield head
+            for chunk in storage.iter_news(user_data, chunk_size=settings.NEWS_STREAM_CHUNK_SIZE):
+                yield render_to_string(NEWS_ITEMS_TEMPLATE, {"news": chunk})
+            yield tail
+
+        return StreamingHttpResponse(content())
 
 
 class LinkedInHandler:
@@ -110,8 +369,7 @@ class LinkedInHandler:
     def linkedin_endpoint(self, request):
         auth_code = request.GET.get("code")  # type: Optional[str]
         state = request.GET.get("state")  # type: Optional[str]
-        session_state = request.session.get("state")
-        if not auth_code or not session_state or not state or session_state != state.strip():
+        if not auth_code or not state or not state_is_valid(state.strip(), request.user.id):
             return HttpResponse("<h1>Failed process</h1><p>{}</p>".format(request.GET.get("error")))
         linkedin_client = ServiceRegistry.get().linkedin()
         access_token_data = linkedin_client.get_access_token(auth_code=auth_code)
@@ -121,7 +379,17 @@ class LinkedInHandler:
             user_meta = UserMetaInformationModel()
             user_meta.user = request.user
         user_meta.access_token = access_token_data.access_token
-        user_meta.expiration = datetime.datetime.now() + datetime.timedelta(seconds=access_token_data.expires)
+        user_meta.expiration = timezone.now() + datetime.timedelta(seconds=int(access_token_data.expires))
+        user_meta.refresh_required = False
         user_meta.save()
+        ServiceRegistry.get().profile_cache().invalidate(request.user.id)
 
         return redirect(to=reverse(PageName.NEWS.value))
+
+
+class MetricsHandler:
+    def metrics(self, request: HttpRequest) -> HttpResponse:
+        """Metrics of this process in Prometheus text format"""
+        if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+            return HttpResponseForbidden()
+        return HttpResponse(instrumentation.REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
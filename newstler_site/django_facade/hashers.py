@@ -0,0 +1,13 @@
+"""Password hashers with configurable cost"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ProfiledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with ``PASSWORD_HASH_ITERATIONS`` rounds.
+    Passwords hashed with another number of rounds are rehashed on successful login.
+    """
+    @property
+    def iterations(self) -> int:
+        return settings.PASSWORD_HASH_ITERATIONS
@@ -0,0 +1,102 @@
+"""Middleware classes of django based facade"""
+from typing import Callable, Optional
+import json
+import logging
+import random
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from newstler_site import instrumentation
+from newstler_site.django_facade import database
+
+LOG = logging.getLogger('consolelogger')
+
+REQUEST_DURATION = instrumentation.REGISTRY.histogram(
+    "newstler_request_duration_seconds", "Request handling time", ("view",))
+PHASE_DURATION = instrumentation.REGISTRY.histogram(
+    "newstler_request_phase_duration_seconds", "Time spent per request phase", ("view", "phase"))
+DB_QUERIES = instrumentation.REGISTRY.histogram(
+    "newstler_request_db_queries", "Database queries per request", ("view",), buckets=(0, 1, 2, 5, 10, 25, 50, 100))
+OPERATIONS = instrumentation.REGISTRY.counter(
+    "newstler_request_operations_total", "Expensive operations, e.g. external calls, made by requests",
+    ("view", "operation"))
+
+
+class InstrumentationMiddleware:
+    """
+    Traces ``INSTRUMENTATION_SAMPLE_RATE`` share of requests: total and per-phase time,
+    database queries and external calls. Results go to metrics registry and,
+    with ``INSTRUMENTATION_LOG_REQUESTS``, to log as one json line per request.
+    """
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        self.sample_rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        self.log_requests = settings.INSTRUMENTATION_LOG_REQUESTS
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        trace = instrumentation.start_trace()
+        # queries of every database, e.g. of read replicas; debug cursor records queries even with DEBUG off
+        databases = connections.all()
+        force_debug_cursors = [connection.force_debug_cursor for connection in databases]
+        queries_before = sum(len(connection.queries_log) for connection in databases)
+        for connection in databases:
+            connection.force_debug_cursor = True
+        try:
+            response = self.get_response(request)
+        finally:
+            for connection, force_debug_cursor in zip(databases, force_debug_cursors):
+                connection.force_debug_cursor = force_debug_cursor
+            instrumentation.finish_trace()
+        trace.counts["db_queries"] = sum(len(connection.queries_log) for connection in databases) - queries_before
+        self._record(request, response, trace)
+        return response
+
+    def _record(self, request: HttpRequest, response: HttpResponse, trace: instrumentation.RequestTrace) -> None:
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match is not None and match.url_name else "unknown"
+        elapsed = trace.elapsed
+        REQUEST_DURATION.observe(elapsed, view=view)
+        for phase, duration in trace.phases.items():
+            PHASE_DURATION.observe(duration, view=view, phase=phase)
+        DB_QUERIES.observe(trace.counts["db_queries"], view=view)
+        for operation, amount in trace.counts.items():
+            if operation != "db_queries":
+                OPERATIONS.inc(amount, view=view, operation=operation)
+        if self.log_requests:
+            LOG.info(json.dumps({
+                "view": view,
+                "method": request.method,
+                "status": response.status_code,
+                "duration": round(elapsed, 6),
+                "phases": {phase: round(duration, 6) for phase, duration in trace.phases.items()},
+                "counts": trace.counts,
+            }, sort_keys=True))
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Sticky reads after writes when ``DATABASE_REPLICAS`` are configured: once a request writes to primary database,
+    the rest of it and requests of the same client during ``DATABASE_REPLICATION_LAG`` seconds,
+    e.g. the page a form redirects to, read from primary. Clients are pinned by a cookie.
+    Comes before middleware which writes in ``process_response``, e.g. ``SessionMiddleware``.
+    """
+    cookie_name = "pin_primary"
+
+    def __init__(self, get_response: Optional[Callable[[HttpRequest], HttpResponse]]=None) -> None:
+        super(ReplicaPinningMiddleware, self).__init__(get_response)
+        self.enabled = bool(settings.DATABASE_REPLICAS)
+
+    def process_request(self, request: HttpRequest) -> None:
+        if self.enabled:
+            database.start_request(pinned=self.cookie_name in request.COOKIES)
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        if self.enabled and database.written():
+            response.set_cookie(self.cookie_name, "1", max_age=settings.DATABASE_REPLICATION_LAG, httponly=True)
+        database.start_request()
+        return response
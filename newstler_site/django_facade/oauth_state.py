@@ -0,0 +1,22 @@
+"""
+OAuth 2.0 ``state`` of LinkedIn authorization: site user id signed with ``SECRET_KEY`` and a timestamp,
+verified by the redirect endpoint without server-side storage
+"""
+from django.conf import settings
+from django.core import signing
+
+_SIGNER = signing.TimestampSigner(salt="newstler.linkedin-state")
+
+
+def make_state(user_id: int) -> str:
+    """State binding authorization to site user, valid for ``settings.LINKEDIN_STATE_MAX_AGE`` seconds"""
+    return _SIGNER.sign(str(user_id))
+
+
+def state_is_valid(state: str, user_id: int) -> bool:
+    """State is made by ``make_state`` for ``user_id`` and has not expired"""
+    try:
+        return _SIGNER.unsign(state, max_age=settings.LINKEDIN_STATE_MAX_AGE) == str(user_id)
+    except signing.BadSignature:
+        # expired states raise SignatureExpired, a subclass
+        return False
@@ -39,10 +39,12 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "django_app",
+    "django_app.apps.DjangoAppConfig",
 ]
 
 MIDDLEWARE = [
+    "newstler_site.django_facade.middleware.InstrumentationMiddleware",
+    "newstler_site.django_facade.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,7 +55,8 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = "newstler_site.django_facade.urls"
-AUTHENTICATION_BACKENDS = ["newstler_site.django_facade.auth.EmailBackend", "django.contrib.auth.backends.ModelBackend"]
+AUTHENTICATION_BACKENDS = ["newstler_site.django_facade.auth.EmailBackend",
+                           "newstler_site.django_facade.auth.UsernameBackend"]
 LOGIN_REDIRECT_URL = "index"
 LOGIN_URL = "/login/"
 
@@ -81,10 +84,50 @@ WSGI_APPLICATION = "newstler_site.django_facade.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "ENGINE": os.environ.get("NEWSTLER_DB_ENGINE", "django.db.backends.sqlite3"),
+        "NAME": os.environ.get("NEWSTLER_DB_NAME", os.path.join(BASE_DIR, "db.sqlite3")),
+        "USER": os.environ.get("NEWSTLER_DB_USER", ""),
+        "PASSWORD": os.environ.get("NEWSTLER_DB_PASSWORD", ""),
+        "HOST": os.environ.get("NEWSTLER_DB_HOST", ""),
+        "PORT": os.environ.get("NEWSTLER_DB_PORT", ""),
+        # seconds a connection serves following requests of its thread, 0 - a connection per request
+        "CONN_MAX_AGE": int(os.environ.get("NEWSTLER_DB_CONN_MAX_AGE", "600")),
     }
 }
+# Read replicas, comma separated: hosts of a server database or files of SQLite one, e.g. kept by Litestream.
+# Reads of DATABASE_REPLICATED_MODELS go to replicas, everything else and reads after writes to primary database,
+# see newstler_site.django_facade.database.ReplicaRouter
+DATABASE_REPLICAS = []  # type: List[str]
+for _number, _replica in enumerate(filter(None, os.environ.get("NEWSTLER_DB_REPLICAS", "").split(","))):
+    _alias = "replica{}".format(_number)
+    DATABASES[_alias] = dict(DATABASES["default"], TEST={"MIRROR": "default"})
+    DATABASES[_alias]["NAME" if DATABASES["default"]["ENGINE"].endswith("sqlite3") else "HOST"] = _replica.strip()
+    DATABASE_REPLICAS.append(_alias)
+DATABASE_REPLICATED_MODELS = ["django_app.NewsItem", "django_app.NewsTag"]
+DATABASE_ROUTERS = ["newstler_site.django_facade.database.ReplicaRouter"]
+# Seconds clients read from primary database after their writes
+DATABASE_REPLICATION_LAG = int(os.environ.get("NEWSTLER_DB_REPLICATION_LAG", "5"))
+# Pragmas of every SQLite connection: with write-ahead log readers do not wait for writers, which commit
+# without fsync of every transaction; page cache in KiB when negative
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("NEWSTLER_SQLITE_JOURNAL_MODE", "wal"),
+    "synchronous": "normal",
+    "cache_size": -20000,
+    "mmap_size": 268435456,
+    "temp_store": "memory",
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("NEWSTLER_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("NEWSTLER_CACHE_LOCATION", ""),
+    }
+}
+
+# "django.contrib.sessions.backends.cached_db" saves a query per request, but it needs a cache shared by
+# all worker processes (e.g. memcached): with per-process cache a session deleted on logout
+# stays valid in other processes until it expires from their caches.
+SESSION_ENGINE = os.environ.get("NEWSTLER_SESSION_ENGINE", "django.contrib.sessions.backends.db")
 
 
 # Password validation
@@ -105,6 +148,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# PBKDF2 rounds of password hashes, each login costs that many sha256 computations of CPU.
+# Stored hashes of other cost are rehashed on login, other hashers are kept to check old hashes.
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("NEWSTLER_PASSWORD_HASH_ITERATIONS", "36000"))
+PASSWORD_HASHERS = [
+    "newstler_site.django_facade.hashers.ProfiledPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.BCryptPasswordHasher",
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.11/topics/i18n/
@@ -126,7 +180,44 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "django_facade", "static")]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.django.GzipManifestStaticFilesStorage'
+# content hashed names, served by WhiteNoise with far-future immutable Cache-Control, in Brotli or gzip variants
+STATICFILES_STORAGE = "newstler_site.django_facade.static_storage.PrunedCompressedManifestStorage"
+# stylesheets stripped by collectstatic of rules requiring classes no template uses
+STATICFILES_PRUNED_CSS = ["bootstrap/css/bootstrap.min.css"]
+# classes of pruned stylesheets kept though templates do not mention them, e.g. set by scripts
+STATICFILES_KEEP_CLASSES = []  # type: List[str]
+# processes compressing collected files, None - one per CPU core
+STATICFILES_COMPRESS_WORKERS = int(os.environ.get("NEWSTLER_COMPRESS_WORKERS", "0")) or None
+
+# News feed page: default and maximal number of articles per page,
+# streaming mode renders the whole feed chunk by chunk instead of pagination
+NEWS_PAGE_SIZE = 50
+NEWS_PAGE_MAX_SIZE = 200
+NEWS_PAGE_STREAMING = False
+NEWS_STREAM_CHUNK_SIZE = 200
+# Cache-Control of /api/news/. Responses carry ETag, so clients revalidate cheaply.
+# Feeds depend on the logged in user, so shared caches may store them only when they key on the session cookie
+# (responses vary on Cookie), e.g. "public, max-age=60".
+NEWS_API_CACHE_CONTROL = os.environ.get("NEWSTLER_NEWS_API_CACHE_CONTROL", "private, no-cache")
+
+# Seconds a user has to grant LinkedIn access after the connect button is rendered
+LINKEDIN_STATE_MAX_AGE = 3600
+
+# Threads of ASGI application for database access, template rendering and requests served by WSGI application.
+# News pages hold no thread while they wait for LinkedIn.
+ASGI_THREADS = int(os.environ.get("NEWSTLER_ASGI_THREADS", "16"))
+
+# Share of requests traced by InstrumentationMiddleware, 0 switches tracing off.
+# Traced requests are logged as json lines when INSTRUMENTATION_LOG_REQUESTS is on.
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get("NEWSTLER_INSTRUMENTATION_SAMPLE_RATE", "0.1"))
+INSTRUMENTATION_LOG_REQUESTS = os.environ.get("NEWSTLER_INSTRUMENTATION_LOG_REQUESTS", "") == "1"
+# Clients allowed to scrape /metrics/
+METRICS_ALLOWED_IPS = ["127.0.0.1"]
+# Client IP of requests passed by reverse proxies, e.g. Heroku router, for login throttling: number of trusted
+# proxies appending client address to CLIENT_IP_HEADER, the address appended by the farthest of them is the client.
+# 0 - REMOTE_ADDR is the client, any proxy would put all clients in one login throttle bucket.
+CLIENT_IP_HEADER = "HTTP_X_FORWARDED_FOR"
+CLIENT_IP_PROXY_HOPS = int(os.environ.get("NEWSTLER_CLIENT_IP_PROXY_HOPS", "0"))
 
 LOGGING = {
     'version': 1,
@@ -0,0 +1,207 @@
+"""
+Static files storage of ``collectstatic``: content hashed names, stylesheets stripped of rules no template uses
+and Brotli and gzip variants compressed by all CPU cores. WhiteNoise serves the variant a client accepts
+and caches hashed names forever.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from whitenoise.compress import Compressor, brotli_installed
+from whitenoise.storage import HelpfulExceptionMixin
+
+LOG = logging.getLogger('consolelogger')
+
+_CLASS_ATTRIBUTE = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_TEMPLATE_TAG = re.compile(r"{{.*?}}|{%.*?%}|{#.*?#}", re.DOTALL)
+_SELECTOR_CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+# parts of selectors that never require a class: quoted strings, attribute selectors and negations
+_SELECTOR_NOISE = re.compile(r"\"[^\"]*\"|'[^']*'|\[[^\]]*\]|:not\([^)]*\)")
+# at-rules holding rules, others like @font-face and @keyframes hold declarations and are kept as they are
+_GROUPING_AT_RULES = ("@media", "@supports", "@document")
+
+
+def template_classes(directories: Iterable[str]) -> Set[str]:
+    """Names in class attributes of templates in ``directories``, template tags inside attributes are skipped"""
+    classes = set()  # type: Set[str]
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.endswith(".html"):
+                    continue
+                with open(os.path.join(root, name), encoding="utf-8") as template:
+                    source = template.read()
+                for double_quoted, single_quoted in _CLASS_ATTRIBUTE.findall(source):
+                    classes.update(_TEMPLATE_TAG.sub(" ", double_quoted or single_quoted).split())
+    return classes
+
+
+def _blocks(css: str) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Top level (prelude, body) pairs of css rules, body is None for text kept verbatim:
+    statements like ``@charset "utf-8";`` and ``/*!`` license comments. Other comments are dropped.
+    """
+    prelude = []  # type: List[str]
+    position, length = 0, len(css)
+    while position < length:
+        char = css[position]
+        if css.startswith("/*", position):
+            end = css.find("*/", position + 2)
+            end = length if end < 0 else end + 2
+            if css.startswith("/*!", position):
+                yield css[position:end], None
+            position = end
+        elif char in "\"'":
+            end = _string_end(css, position)
+            prelude.append(css[position:end])
+            position = end
+        elif char == ";":
+            yield "".join(prelude).strip() + ";", None
+            prelude = []
+            position += 1
+        elif char == "{":
+            end = _block_end(css, position)
+            yield "".join(prelude).strip(), css[position + 1:end - 1]
+            prelude = []
+            position = end
+        else:
+            prelude.append(char)
+            position += 1
+
+
+def _string_end(css: str, start: int) -> int:
+    """Position after quoted string starting at ``start``"""
+    position = start + 1
+    while position < len(css) and css[position] != css[start]:
+        position += 2 if css[position] == "\\" else 1
+    return position + 1
+
+
+def _block_end(css: str, start: int) -> int:
+    """Position after the block opened by brace at ``start``"""
+    depth, position = 0, start
+    while position < len(css):
+        char = css[position]
+        if char in "\"'":
+            position = _string_end(css, position)
+            continue
+        if css.startswith("/*", position):
+            end = css.find("*/", position + 2)
+            position = len(css) if end < 0 else end + 2
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return position + 1
+        position += 1
+    return position
+
+
+def _split_selectors(prelude: str) -> List[str]:
+    """Selectors of a comma separated list, commas inside brackets and strings do not separate"""
+    selectors, depth, start = [], 0, 0
+    for match in re.finditer(r"\"[^\"]*\"|'[^']*'|[(\[]|[)\]]|,", prelude):
+        token = match.group()
+        if token in "([":
+            depth += 1
+        elif token in ")]":
+            depth -= 1
+        elif token == "," and depth == 0:
+            selectors.append(prelude[start:match.start()].strip())
+            start = match.end()
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def selector_used(selector: str, classes: Set[str]) -> bool:
+    """Selector may match an element of templates: every class it requires is used"""
+    return all(name in classes for name in _SELECTOR_CLASS.findall(_SELECTOR_NOISE.sub("", selector)))
+
+
+def prune_css(css: str, classes: Set[str]) -> str:
+    """
+    ``css`` without rules and selectors requiring classes not in ``classes``.
+    Element, attribute and id selectors are kept, as are @font-face, @keyframes and alike.
+    """
+    output = []  # type: List[str]
+    for prelude, body in _blocks(css):
+        if body is None:
+            output.append(prelude)
+        elif prelude.startswith(_GROUPING_AT_RULES):
+            rules = prune_css(body, classes)
+            if rules:
+                output.append("{}{{{}}}".format(prelude, rules))
+        elif prelude.startswith("@"):
+            output.append("{}{{{}}}".format(prelude, body))
+        else:
+            selectors = [selector for selector in _split_selectors(prelude) if selector_used(selector, classes)]
+            if selectors:
+                output.append("{}{{{}}}".format(",".join(selectors), body))
+    return "".join(output)
+
+
+def compress_file(path: str) -> None:
+    """Write Brotli and gzip variants of file next to it, unless compression is not effective"""
+    Compressor(extensions=getattr(settings, "WHITENOISE_SKIP_COMPRESS_EXTENSIONS", None), quiet=True).compress(path)
+
+
+class PrunedCompressedManifestStorage(HelpfulExceptionMixin, ManifestStaticFilesStorage):
+    """
+    ``ManifestStaticFilesStorage`` which strips stylesheets of ``STATICFILES_PRUNED_CSS`` of rules requiring
+    classes used by no template of ``TEMPLATES`` directories nor listed in ``STATICFILES_KEEP_CLASSES``,
+    before they are hashed, then compresses all files in ``STATICFILES_COMPRESS_WORKERS`` processes,
+    one per CPU core by default.
+    """
+    def post_process(self, paths: Dict[str, Tuple], dry_run: bool=False, **options):
+        if not dry_run:
+            self.prune(paths)
+        processed = {}  # type: Dict[str, Tuple[str, Optional[str], object]]
+        # files referencing other files are processed in several passes, the last result counts
+        for name, hashed_name, result in super(PrunedCompressedManifestStorage, self).post_process(
+                paths, dry_run=dry_run, **options):
+            processed[name] = (name, hashed_name, result)
+        if not dry_run:
+            self.compress(processed.values())
+        for result in processed.values():
+            yield result
+
+    def prune(self, paths: Dict[str, Tuple]) -> None:
+        """Replace collected stylesheets by pruned copies of their sources and make them the sources to hash"""
+        names = [name for name in getattr(settings, "STATICFILES_PRUNED_CSS", ()) if name in paths]
+        if not names:
+            return
+        classes = template_classes(directory for engine in settings.TEMPLATES for directory in engine["DIRS"])
+        classes.update(getattr(settings, "STATICFILES_KEEP_CLASSES", ()))
+        for name in names:
+            source_storage, source_path = paths[name]
+            with source_storage.open(source_path) as source:
+                css = source.read().decode("utf-8")
+            pruned = prune_css(css, classes).encode("utf-8")
+            self.delete(name)
+            self._save(name, ContentFile(pruned))
+            # hashed copies are made from the source, which is the pruned stylesheet from now on
+            paths[name] = (self, name)
+            LOG.info("Pruned %s: %d -> %d bytes", name, len(css.encode("utf-8")), len(pruned))
+
+    def compress(self, processed: Iterable[Tuple[str, Optional[str], object]]) -> None:
+        if not brotli_installed:
+            LOG.warning("Brotli is not installed, static files are compressed by gzip only")
+        compressor = Compressor(extensions=getattr(settings, "WHITENOISE_SKIP_COMPRESS_EXTENSIONS", None), quiet=True)
+        files = set()  # type: Set[str]
+        for name, hashed_name, result in processed:
+            if isinstance(result, Exception) or not compressor.should_compress(name):
+                continue
+            files.add(self.path(name))
+            if hashed_name is not None:
+                files.add(self.path(hashed_name))
+        with ProcessPoolExecutor(max_workers=getattr(settings, "STATICFILES_COMPRESS_WORKERS", None)) as pool:
+            # biggest files first, so no worker is left compressing a big one after the others are done
+            for _ in pool.map(compress_file, sorted(files, key=os.path.getsize, reverse=True)):
+                pass
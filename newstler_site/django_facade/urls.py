@@ -21,6 +21,7 @@ from django.contrib import admin
 auth_handler = handlers.AuthRequestHandler()
 linkedin_handler = handlers.LinkedInHandler()
 main_handler = handlers.NewstlerHandler()
+metrics_handler = handlers.MetricsHandler()
 
 urlpatterns = [
     url(r"^admin/", admin.site.urls),
@@ -29,5 +30,7 @@ urlpatterns = [
     url(r"^signup/$", auth_handler.register, {"template_name": "register.html"}, name=handlers.PageName.SIGN_IN.value),
     url(r"^linkedin/$", linkedin_handler.linkedin_endpoint, name=handlers.PageName.LINKEDIN_REDIRECT_POINT.value),
     url(r"^news/$", main_handler.news_page, {"template_name": "news.html"}, name=handlers.PageName.NEWS.value),
+    url(r"^api/news/$", main_handler.news_api, name="news_api"),
+    url(r"^metrics/$", metrics_handler.metrics, name="metrics"),
     url(r"^$", main_handler.index, {"template_name": "linkedin.html"}, name=handlers.PageName.HOME_PAGE.value),
 ]
@@ -0,0 +1,87 @@
+"""
+Warm-up of the application before a preforking server forks workers.
+Everything loaded by the master process is shared by workers copy-on-write instead of being loaded by each of them
+on its first requests.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict
+import gc
+import logging
+import os
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.service_registry import ServiceRegistry
+
+LOG = logging.getLogger('consolelogger')
+
+
+def _load_urls() -> None:
+    # resolving populates the resolver and imports all views
+    get_resolver().resolve("/")
+
+
+def _load_templates() -> None:
+    # cached template loader, enabled with DEBUG off, keeps compiled templates
+    for directory in settings.TEMPLATES[0]["DIRS"]:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".html"):
+                get_template(name)
+
+
+def _load_services() -> None:
+    registry = ServiceRegistry.get()
+    registry.linkedin()
+    registry.profile_cache()
+    registry.fragment_cache()
+    registry.login_throttle()
+    storage = registry.news_storage()
+    # builds feed index and tag matcher of storages loading them lazily
+    storage.version()
+    storage.feed_key(UserData(name="", position=""))
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Load URLconf with all views, compiled templates and services with their feed indexes and HTTP clients,
+    then close database connections, which must not be shared by forked workers.
+    SQLite FTS news storage opens its own connection in every worker, see ``SQLiteFTSNewsStorage``.
+    HTTP clients hold no connections yet, so their pools are created but not shared.
+    Call it in the master process after the application is loaded, e.g. from gunicorn ``on_starting`` hook
+    with ``preload_app`` on.
+
+    :return: seconds spent per step
+    """
+    steps = OrderedDict()  # type: Dict[str, float]
+
+    def step(name: str, action: Callable[[], None]) -> None:
+        started = time.perf_counter()
+        action()
+        steps[name] = time.perf_counter() - started
+
+    step("urls", _load_urls)
+    step("templates", _load_templates)
+    step("services", _load_services)
+    step("connections", connections.close_all)
+    step("gc", gc.collect)
+    if hasattr(gc, "freeze"):
+        # python 3.7+: objects loaded so far are not scanned by collections in workers,
+        # which would otherwise touch and copy their memory pages
+        gc.freeze()
+    LOG.info("Warmed up in %.3fs: %s", sum(steps.values()),
+             ", ".join("{} {:.3f}s".format(name, seconds) for name, seconds in steps.items()))
+    return steps
+
+
+def after_fork() -> None:
+    """
+    Per-worker initialization, call it in every forked worker, e.g. from gunicorn ``post_fork`` hook.
+    Python before 3.7 does not reseed ``random`` on fork, so workers would share retry jitter and trace sampling.
+    """
+    random.seed()
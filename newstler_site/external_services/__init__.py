@@ -1,11 +1,10 @@
 """Some initial actions for external services"""
 import logging
 
-from newstler_site.config import define_options
 from newstler_site.external_services.service_registry import ServiceRegistry, ConfigDrivenServiceRegistry
 
 
 LOG = logging.getLogger('consolelogger')
-options = define_options()
-service_registry = ConfigDrivenServiceRegistry(options)
+# config is read and services are created on first use
+service_registry = ConfigDrivenServiceRegistry()
 ServiceRegistry.configure(service_registry)
@@ -0,0 +1,108 @@
+"""
+Articles packed into flat arrays: ids in an ``array`` and every article pre-encoded as json in one byte buffer.
+Feed pages are serialized by copying byte ranges of the buffer, without a Python object per article.
+"""
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+
+from newstler_site.external_services.news_storage import NewsArticle, article_json
+
+
+def _tail(values: array, start: int) -> Iterator[int]:
+    """Lazy ``values[start:]``, ``islice`` would iterate over skipped values"""
+    return (values[i] for i in range(start, len(values)))
+
+
+class CompactArticleStore:
+    """
+    Immutable articles ordered newest first, so any run of a feed is a contiguous range of the buffer.
+    Articles of a tag are addressed by ascending positions in the store.
+    """
+    def __init__(self, rows: Iterable[Tuple[int, str, str, str]]) -> None:
+        """:param rows: ``(id, title, link, tag name)`` ordered by id descending"""
+        self._ids = array("q")
+        self._json = bytearray()
+        # article N is json[offsets[N]:offsets[N + 1]], a json object followed by comma
+        self._offsets = array("q", [0])
+        self._tags = {}  # type: Dict[str, array]
+        previous = None  # type: Optional[int]
+        for article_id, title, link, tag_name in rows:
+            if previous is not None and article_id >= previous:
+                raise ValueError("Articles must be ordered by id descending, {} follows {}".format(
+                    article_id, previous))
+            previous = article_id
+            positions = self._tags.get(tag_name)
+            if positions is None:
+                positions = self._tags[tag_name] = array("q")
+            positions.append(len(self._ids))
+            self._ids.append(article_id)
+            self._json += article_json(NewsArticle(id=article_id, title=title, link=link))
+            self._json += b","
+            self._offsets.append(len(self._json))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of arrays and buffer"""
+        arrays = [self._ids, self._offsets] + list(self._tags.values())
+        return len(self._json) + sum(len(values) * values.itemsize for values in arrays)
+
+    def tag_names(self) -> List[str]:
+        return list(self._tags)
+
+    def article(self, position: int) -> NewsArticle:
+        item = json.loads(self._json[self._offsets[position]:self._offsets[position + 1] - 1].decode("utf-8"))
+        return NewsArticle(id=item["id"], title=item["title"], link=item["link"])
+
+    def first_older(self, article_id: int) -> int:
+        """Position of the newest article older than ``article_id``"""
+        ids = self._ids
+        low, high = 0, len(ids)
+        while low < high:
+            middle = (low + high) // 2
+            if ids[middle] >= article_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def positions(self, tag_names: Optional[Iterable[str]], before_id: Optional[int],
+                  limit: Optional[int]=None) -> List[int]:
+        """Positions of up to ``limit`` articles of given tags (all if None) older than ``before_id``, newest first"""
+        start = 0 if before_id is None else self.first_older(before_id)
+        if tag_names is None:
+            end = len(self._ids) if limit is None else min(len(self._ids), start + limit)
+            return list(range(start, end))
+        lists = []
+        for name in set(tag_names):
+            positions = self._tags.get(name)
+            if positions is not None:
+                lists.append(_tail(positions, bisect_left(positions, start)))
+        return list(islice(merge(*lists), limit))
+
+    def article_id(self, position: int) -> int:
+        return self._ids[position]
+
+    def json_array(self, positions: List[int]) -> bytes:
+        """Json array of articles at ``positions``, runs of adjacent positions are copied at once"""
+        offsets = self._offsets
+        out = bytearray(b"[")
+        index = 0
+        with memoryview(self._json) as data:
+            while index < len(positions):
+                run_start = index
+                while index + 1 < len(positions) and positions[index + 1] == positions[index] + 1:
+                    index += 1
+                out += data[offsets[positions[run_start]]:offsets[positions[index] + 1]]
+                index += 1
+        if len(out) > 1:
+            out[-1:] = b"]"
+        else:
+            out += b"]"
+        return bytes(out)
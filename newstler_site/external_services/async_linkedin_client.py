@@ -0,0 +1,216 @@
+"""asyncio LinkedIn service client, used where many profiles are fetched at once"""
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from http.server import HTTPStatus
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from uuid import uuid4, UUID
+import asyncio
+import json
+
+from yarl import URL
+import aiohttp
+
+from newstler_site.external_services.circuit_breaker import CircuitBreaker
+from newstler_site.external_services.linkedin_client import (
+    AccessTokenResponse, CircuitOpenError, FakeLinkedInClient, RESTError, UserData, PROFILE_PATH,
+    is_service_failure, parse_user_data
+)
+
+UserDataResult = namedtuple("UserDataResult", ("access_token", "user_data", "error"))
+
+
+class AsyncLinkedInClient(ABC):
+    """Coroutine counterpart of ``LinkedInClient``"""
+    def __init__(self, *, bulk_concurrency: int=20, call_timeout: float=10.0) -> None:
+        self.bulk_concurrency = bulk_concurrency
+        self.call_timeout = call_timeout
+
+    @abstractmethod
+    def authorization_endpoint(self) -> Tuple[UUID, URL]:
+        """LinkedIn state and endpoint for getting user OAuth2.0 authorization code"""
+
+    @abstractmethod
+    async def get_access_token(self, auth_code: str) -> AccessTokenResponse:
+        """Get user access token by auth code"""
+
+    @abstractmethod
+    async def get_user_data(self) -> Optional[UserData]:
+        """Get user data"""
+
+    @abstractmethod
+    def session(self, access_token: str) -> "_AsyncSession":
+        """Get user authenticated linkedin session, use it as ``async with client.session(token) as session``"""
+
+    async def close(self) -> None:
+        """Release network resources"""
+
+    async def bulk_get_user_data(self, access_tokens: Iterable[str], *, concurrency: Optional[int]=None,
+                                 timeout: Optional[float]=None) -> List[UserDataResult]:
+        """
+        Fetch profiles of many users, at most ``concurrency`` calls at a time, each limited by ``timeout`` seconds.
+        Results keep order of ``access_tokens``, failed calls have ``error`` set instead of raising.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.bulk_concurrency)
+        timeout = timeout or self.call_timeout
+
+        async def fetch(access_token: str) -> UserDataResult:
+            async with semaphore:
+                try:
+                    async with self.session(access_token) as user_session:
+                        user_data = await asyncio.wait_for(user_session.get_user_data(), timeout)
+                except asyncio.TimeoutError:
+                    return UserDataResult(access_token, None, RESTError("LinkedIn call timed out"))
+                except RESTError as e:
+                    return UserDataResult(access_token, None, e)
+                return UserDataResult(access_token, user_data, None)
+
+        return list(await asyncio.gather(*[fetch(access_token) for access_token in access_tokens]))
+
+
+class _AsyncSession:
+    """Async context manager yielding client bound to user access token"""
+    def __init__(self, client: AsyncLinkedInClient) -> None:
+        self.client = client
+
+    async def __aenter__(self) -> AsyncLinkedInClient:
+        return self.client
+
+    async def __aexit__(self, *exc_info) -> None:
+        pass
+
+
+class FakeAsyncLinkedInClient(AsyncLinkedInClient):
+    # See FakeLinkedInClient
+    def __init__(self, **kwargs) -> None:
+        super(FakeAsyncLinkedInClient, self).__init__(**kwargs)
+        self._sync = FakeLinkedInClient()
+
+    @property
+    def authorization_endpoint(self) -> Tuple[UUID, URL]:
+        return self._sync.authorization_endpoint
+
+    async def get_access_token(self, auth_code: str) -> AccessTokenResponse:
+        return self._sync.get_access_token(auth_code)
+
+    async def get_user_data(self) -> Optional[UserData]:
+        return self._sync.get_user_data()
+
+    def session(self, access_token: str) -> _AsyncSession:
+        return _AsyncSession(self)
+
+
+class _HttpPool:
+    """aiohttp session shared by client and its user sessions, recreated for every new event loop"""
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._http = None  # type: Optional[aiohttp.ClientSession]
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+
+    def get(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_event_loop()
+        if self._http is None or self._http.closed or self._loop is not loop:
+            self._http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.size))
+            self._loop = loop
+        return self._http
+
+    async def close(self) -> None:
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+
+
+class RestAsyncLinkedInClient(AsyncLinkedInClient):
+    """LinkedIn REST client on top of aiohttp"""
+    def __init__(self, *, base_url: str, client_id: str, client_secret: str, redirect_uri: str, auth_path: str,
+                 token_path: str, api_url: str, pool_size: int=100, bulk_concurrency: int=20,
+                 call_timeout: float=10.0, breaker: Optional[CircuitBreaker]=None) -> None:
+        super(RestAsyncLinkedInClient, self).__init__(bulk_concurrency=bulk_concurrency, call_timeout=call_timeout)
+        self.api_url = api_url
+        self.token_path = token_path
+        self.auth_path = auth_path
+        self.redirect_uri = redirect_uri
+        self.base_url = base_url
+        self.client_secret = client_secret
+        self.client_id = client_id
+        self.pool_size = pool_size
+        self.breaker = breaker
+        self._pool = _HttpPool(pool_size)
+        self.__user_access_token = None  # type: Optional[str]
+
+    @property
+    def authorization_endpoint(self) -> Tuple[UUID, URL]:
+        state = uuid4()
+        return state, URL(self.base_url).with_path(self.auth_path).with_query(
+            response_type="code",
+            client_id=self.client_id,
+            redirect_uri=self.redirect_uri,
+            state=state.hex,
+        )
+
+    async def __request(self, method: str, url: URL, expected_codes: Sequence[HTTPStatus],
+                        **kwargs) -> Tuple[int, Any]:
+        """Response status and decoded json body of successful response"""
+        async def send() -> Tuple[int, str]:
+            async with self._pool.get().request(method, str(url), **kwargs) as response:
+                return response.status, await response.text()
+
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("LinkedIn is unavailable, calls are suspended")
+        failed = True
+        try:
+            status, body = await asyncio.wait_for(send(), self.call_timeout)
+            failed = is_service_failure(status)
+            if status not in (code.value for code in expected_codes):
+                raise RESTError("Unexpected response code [{}] from linkedin client, expected: [{}]".format(
+                    status, expected_codes))
+            return status, json.loads(body) if status == HTTPStatus.OK else None
+        except asyncio.TimeoutError as e:
+            raise RESTError("LinkedIn request timed out after {}s".format(self.call_timeout)) from e
+        except (aiohttp.ClientError, ValueError) as e:
+            raise RESTError("LinkedIn request failed: {}".format(e)) from e
+        finally:
+            if self.breaker is not None:
+                self.breaker.record(failed)
+
+    async def get_access_token(self, auth_code: str) -> AccessTokenResponse:
+        url = URL(self.base_url).with_path(self.token_path)
+        data = dict(grant_type="authorization_code",
+                    code=auth_code,
+                    redirect_uri=self.redirect_uri,
+                    client_id=self.client_id,
+                    client_secret=self.client_secret)
+        _, body = await self.__request("POST", url, [HTTPStatus.OK], data=data)
+        return AccessTokenResponse(access_token=body["access_token"], expires=body["expires_in"])
+
+    def session(self, access_token: str) -> _AsyncSession:
+        new_instance = self.__class__(
+            base_url=self.base_url,
+            client_secret=self.client_secret,
+            client_id=self.client_id,
+            redirect_uri=self.redirect_uri,
+            token_path=self.token_path,
+            auth_path=self.auth_path,
+            api_url=self.api_url,
+            pool_size=self.pool_size,
+            bulk_concurrency=self.bulk_concurrency,
+            call_timeout=self.call_timeout,
+            breaker=self.breaker,
+        )
+        new_instance._pool = self._pool
+        new_instance.__user_access_token = access_token
+        return _AsyncSession(new_instance)
+
+    async def get_user_data(self) -> Optional[UserData]:
+        if not self.__user_access_token:
+            raise ValueError("LinkedIn session does not initialized by user access token")
+        url = URL(self.base_url).with_path(PROFILE_PATH).with_query(format="json")
+        status, body = await self.__request(
+            "GET", url, [HTTPStatus.OK, HTTPStatus.FORBIDDEN, HTTPStatus.UNAUTHORIZED],
+            headers={"Authorization": "Bearer {}".format(self.__user_access_token)},
+        )
+        if status == HTTPStatus.FORBIDDEN or status == HTTPStatus.UNAUTHORIZED:
+            return None
+        return parse_user_data(body)
+
+    async def close(self) -> None:
+        await self._pool.close()
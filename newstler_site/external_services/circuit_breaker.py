@@ -0,0 +1,99 @@
+"""Circuit breaker failing calls of an unavailable external service at once instead of waiting for its timeouts"""
+from enum import Enum, unique
+from typing import Callable
+import logging
+import threading
+import time
+
+from newstler_site import instrumentation
+
+LOG = logging.getLogger('consolelogger')
+
+
+@unique
+class CircuitState(Enum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+CIRCUIT_STATE = instrumentation.REGISTRY.gauge(
+    "newstler_circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ("circuit",))
+CIRCUIT_TRANSITIONS = instrumentation.REGISTRY.counter(
+    "newstler_circuit_transitions_total", "Circuit breaker state changes", ("circuit", "state"))
+CIRCUIT_REJECTED = instrumentation.REGISTRY.counter(
+    "newstler_circuit_rejected_calls_total", "Calls failed at once by open circuit breaker", ("circuit",))
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+    Circuit opens after ``failure_threshold`` consecutive failures and rejects calls for ``recovery_timeout``
+    seconds, then lets ``half_open_probes`` calls through at a time: circuit closes once that many succeed
+    and opens again on the first failure.
+    Every allowed call must be followed by ``record``.
+    """
+    def __init__(self, name: str, *, failure_threshold: int, recovery_timeout: float, half_open_probes: int=1,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        if failure_threshold <= 0 or half_open_probes <= 0:
+            raise ValueError("Circuit breaker failure threshold and probes must be positive")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._successful_probes = 0
+        CIRCUIT_STATE.set(self._state.value, circuit=name)
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self._recover()
+            return self._state
+
+    def _transition(self, state: CircuitState) -> None:
+        # called with lock held
+        LOG.warning("Circuit %s: %s -> %s", self.name, self._state.name, state.name)
+        self._state = state
+        self._failures = self._probes = self._successful_probes = 0
+        if state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+        CIRCUIT_STATE.set(state.value, circuit=self.name)
+        CIRCUIT_TRANSITIONS.inc(circuit=self.name, state=state.name.lower())
+
+    def _recover(self) -> None:
+        if self._state == CircuitState.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._transition(CircuitState.HALF_OPEN)
+
+    def allow(self) -> bool:
+        """Call may be made now; rejected calls are counted"""
+        with self._lock:
+            self._recover()
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+        CIRCUIT_REJECTED.inc(circuit=self.name)
+        return False
+
+    def record(self, failed: bool) -> None:
+        """Result of an allowed call"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                if failed:
+                    self._transition(CircuitState.OPEN)
+                else:
+                    self._successful_probes += 1
+                    self._probes -= 1
+                    if self._successful_probes >= self.half_open_probes:
+                        self._transition(CircuitState.CLOSED)
+            elif self._state == CircuitState.CLOSED:
+                self._failures = self._failures + 1 if failed else 0
+                if self._failures >= self.failure_threshold:
+                    self._transition(CircuitState.OPEN)
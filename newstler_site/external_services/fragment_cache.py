@@ -0,0 +1,141 @@
+"""Read-through cache of rendered page fragments shared by all users who see the same content"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+import hashlib
+import logging
+import threading
+import time
+
+from django.core.cache import caches
+
+from newstler_site.external_services.profile_cache import LRUCache, process_local
+
+LOG = logging.getLogger('consolelogger')
+
+_MISSING = object()
+
+
+class FragmentCache(ABC):
+    """Fragments are keyed by a string describing their content, e.g. normalized tag set and page"""
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @abstractmethod
+    def get_or_render(self, key: Optional[str], render: Callable[[], Any]) -> Any:
+        """
+        Cached fragment or result of ``render`` which is cached then. Fragments with ``key`` None are never cached.
+        Exceptions of ``render`` are propagated and nothing is cached.
+        """
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _count(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+class DisabledFragmentCache(FragmentCache):
+    """Cache that always renders"""
+    def get_or_render(self, key: Optional[str], render: Callable[[], Any]) -> Any:
+        self._count(hit=False)
+        return render()
+
+
+class TieredFragmentCache(FragmentCache):
+    """
+    Per-process LRU in front of django cache framework.
+
+    Keys must describe content exactly, e.g. include ``NewsStorage.version`` token, so fragments are never stale:
+    a process seeing other content looks up other keys.
+    Concurrent misses of a key are rendered once: threads of a process wait for the first one,
+    other processes wait up to ``lock_timeout`` seconds while a lock entry of the key is in django cache.
+    Django cache keeping entries per process, e.g. ``LocMemCache``, would only duplicate the LRU, so it is not used.
+    """
+    def __init__(self, *, max_size: int, ttl: int, cache_alias: str, lock_timeout: float=5.0,
+                 key_prefix: str="news-fragment", clock: Callable[[], float]=time.monotonic,
+                 sleep: Callable[[float], None]=time.sleep) -> None:
+        super(TieredFragmentCache, self).__init__()
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.lock_timeout = lock_timeout
+        self.key_prefix = key_prefix
+        self.shared = not process_local(cache_alias)
+        if not self.shared:
+            LOG.warning("Cache %r is not shared by processes, rendered fragments are cached per process", cache_alias)
+        self._clock = clock
+        self._sleep = sleep
+        self._local = LRUCache(max_size=max_size, clock=clock)
+        self._lock = threading.Lock()
+        self._inflight = {}  # type: Dict[str, threading.Event]
+
+    @property
+    def _cache(self):
+        return caches[self.cache_alias]
+
+    def get_or_render(self, key: Optional[str], render: Callable[[], Any]) -> Any:
+        if key is None:
+            self._count(hit=False)
+            return render()
+        full_key = "{}:{}".format(self.key_prefix, hashlib.md5(key.encode("utf-8")).hexdigest())
+        value = self._local.get(full_key, _MISSING)
+        if value is not _MISSING:
+            self._count(hit=True)
+            return value
+
+        with self._lock:
+            event = self._inflight.get(full_key)
+            leader = event is None
+            if leader:
+                event = self._inflight[full_key] = threading.Event()
+        if not leader:
+            event.wait(self.lock_timeout)
+            value = self._local.get(full_key, _MISSING)
+            if value is not _MISSING:
+                self._count(hit=True)
+                return value
+            # first render failed or took too long
+        try:
+            value, hit = self._load(full_key, render)
+        finally:
+            if leader:
+                with self._lock:
+                    del self._inflight[full_key]
+                event.set()
+        self._count(hit=hit)
+        return value
+
+    def _load(self, full_key: str, render: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Fragment from django cache or rendered, stored in both tiers"""
+        if not self.shared:
+            value, hit = render(), False
+        else:
+            value = self._cache.get(full_key, _MISSING)
+            hit = value is not _MISSING
+            if not hit:
+                value, hit = self._render_shared(full_key, render)
+        self._local.set(full_key, value, ttl=self.ttl)
+        return value, hit
+
+    def _render_shared(self, full_key: str, render: Callable[[], Any]) -> Tuple[Any, bool]:
+        lock_key = "{}:lock".format(full_key)
+        locked = self._cache.add(lock_key, 1, self.lock_timeout)
+        if not locked:
+            deadline = self._clock() + self.lock_timeout
+            while self._clock() < deadline:
+                self._sleep(0.05)
+                value = self._cache.get(full_key, _MISSING)
+                if value is not _MISSING:
+                    return value, True
+        try:
+            value = render()
+            self._cache.set(full_key, value, self.ttl)
+        finally:
+            if locked:
+                self._cache.delete(lock_key)
+        return value, False
@@ -0,0 +1,211 @@
+"""News storage ranking articles by full-text relevance of their title and tag to user position, on SQLite FTS5"""
+from typing import Callable, Iterable, List, Optional, Tuple
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django_app.models import NewsItem, NewsTag
+from newstler_site import instrumentation
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.news_storage import (
+    DEFAULT_PAGE_SIZE, ContentVersion, FeedFingerprint, NewsArticle, NewsPage, NewsStorage, RankedCursor,
+    TagLookup, decode_ranked_cursor, encode_ranked_cursor
+)
+
+_TOKEN = re.compile(r"\w+")
+
+# bm25 weights of indexed columns: a word of tag name counts as five words of title
+_TITLE_WEIGHT = 1.0
+_TAG_WEIGHT = 5.0
+
+_BUILD_BATCH_SIZE = 5000
+_MAX_ROWID = 2 ** 63 - 1
+
+
+def position_tokens(position: str) -> List[str]:
+    """Distinct lowercased words of position, sorted so equal positions give equal queries"""
+    return sorted({token.lower() for token in _TOKEN.findall(position)})
+
+
+class SQLiteFTSNewsStorage(NewsStorage):
+    """
+    Storage matching words of user position against an FTS5 index of article titles and tag names.
+    Articles are ranked by bm25 relevance multiplied by tag weight, then newest first.
+    Positions matching nothing get all articles, newest first.
+
+    The index is a snapshot of the database built at creation in a separate SQLite database at ``path``.
+    It is rebuilt by ``reload`` or, with positive ``max_age``, once older than that many seconds,
+    into a new database replacing the current one when complete.
+    Forked processes, e.g. workers of gunicorn master which warmed it up, open their own connection on first query.
+
+    :raise RuntimeError: if SQLite is built without FTS5
+    """
+    def __init__(self, path: str=":memory:", max_age: float=0, clock: Callable[[], float]=time.monotonic) -> None:
+        self.path = path
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._connection = None  # type: Optional[sqlite3.Connection]
+        # process owning the connection: SQLite connections must not be used across fork, nor closed by children
+        self._pid = os.getpid()
+        self._inherited = []  # type: List[sqlite3.Connection]
+        self._loaded_at = 0.0
+        self._fingerprint = FeedFingerprint()
+        self.reload()
+
+    def reload(self) -> None:
+        """Build the index into a new database, then swap it in, queries are served by the current one meanwhile"""
+        tags = TagLookup(lambda: {pk: (name, weight)
+                                  for pk, name, weight in NewsTag.objects.values_list("pk", "name", "weight")})
+        rows = NewsItem.objects.order_by("pk").values_list("pk", "title", "link", "tag_id")
+        fingerprint = FeedFingerprint()
+        in_memory = self.path == ":memory:"
+        build_path = self.path
+        if not in_memory:
+            descriptor, build_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                                      dir=os.path.dirname(os.path.abspath(self.path)))
+            os.close(descriptor)
+        connection = sqlite3.connect(build_path, check_same_thread=False)
+        try:
+            with connection:
+                connection.execute("CREATE VIRTUAL TABLE news_fts"
+                                   " USING fts5(title, tag, link UNINDEXED, weight UNINDEXED)")
+                batch = []  # type: List[Tuple[int, str, str, str, float]]
+                for pk, title, link, tag_id in rows.iterator():
+                    tag = tags.get(tag_id)
+                    if tag is None:
+                        continue
+                    name, weight = tag
+                    batch.append((pk, title, name, link, weight))
+                    fingerprint.add(pk, title, link, name)
+                    if len(batch) >= _BUILD_BATCH_SIZE:
+                        self._insert(connection, batch)
+                        batch = []
+                self._insert(connection, batch)
+            if not in_memory:
+                connection.close()
+        except BaseException as e:
+            connection.close()
+            if not in_memory:
+                os.remove(build_path)
+            if isinstance(e, sqlite3.OperationalError) and "fts5" in str(e):
+                raise RuntimeError("SQLite {} is built without FTS5".format(sqlite3.sqlite_version)) from e
+            raise
+        with self._lock:
+            self._release_connection()
+            if not in_memory:
+                os.replace(build_path, self.path)
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection = connection
+            self._pid = os.getpid()
+            self._fingerprint = fingerprint
+            self._loaded_at = self._clock()
+
+    def _release_connection(self) -> None:
+        """Close current connection, one inherited from parent process is only dropped"""
+        if self._connection is None:
+            return
+        if self._pid == os.getpid():
+            self._connection.close()
+        else:
+            # closing it would touch the database of parent process
+            self._inherited.append(self._connection)
+        self._connection = None
+
+    def _reopen_after_fork(self) -> None:
+        """
+        Own connection of forked process, e.g. of a gunicorn worker of master which built the index while warming up.
+        In-memory index is built again, database at ``path`` is opened again.
+        """
+        if self.path == ":memory:":
+            with self._reload_lock:
+                if self._pid != os.getpid():
+                    self.reload()
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._release_connection()
+                self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                self._pid = os.getpid()
+
+    @staticmethod
+    def _insert(connection: sqlite3.Connection, batch: Iterable[Tuple[int, str, str, str, float]]) -> None:
+        connection.executemany("INSERT INTO news_fts (rowid, title, tag, link, weight) VALUES (?, ?, ?, ?, ?)", batch)
+
+    def _reload_if_stale(self) -> None:
+        if self.max_age <= 0 or self._clock() - self._loaded_at < self.max_age:
+            return
+        if self._reload_lock.acquire(blocking=False):
+            try:
+                self.reload()
+            finally:
+                self._reload_lock.release()
+
+    def _query(self, sql: str, parameters: Tuple) -> List[Tuple]:
+        if self._pid != os.getpid():
+            self._reopen_after_fork()
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _match_query(self, user_data: UserData) -> Optional[str]:
+        """FTS5 query of position words, None if position has no words or none matches"""
+        tokens = position_tokens(user_data.position or "")
+        if not tokens:
+            return None
+        query = " OR ".join('"{}"'.format(token) for token in tokens)
+        if not self._query("SELECT 1 FROM news_fts WHERE news_fts MATCH ? LIMIT 1", (query,)):
+            return None
+        return query
+
+    def _ranked_page(self, query: Optional[str], after: Optional[RankedCursor],
+                     limit: int) -> List[Tuple[float, NewsArticle]]:
+        if query is None:
+            # all articles have zero score, cursors of higher scores were issued before the feed changed
+            if after is not None and after.score < 0:
+                return []
+            before_id = after.id if after is not None and after.score == 0 else _MAX_ROWID
+            rows = self._query(
+                "SELECT 0.0, rowid, title, link FROM news_fts WHERE rowid < ? ORDER BY rowid DESC LIMIT ?",
+                (before_id, limit))
+        else:
+            ranked = ("SELECT -bm25(news_fts, {}, {}) * weight AS score, rowid AS id, title, link"
+                      " FROM news_fts WHERE news_fts MATCH ?".format(_TITLE_WEIGHT, _TAG_WEIGHT))
+            if after is None:
+                rows = self._query(
+                    "SELECT score, id, title, link FROM ({}) ORDER BY score DESC, id DESC LIMIT ?".format(ranked),
+                    (query, limit))
+            else:
+                rows = self._query(
+                    "SELECT score, id, title, link FROM ({}) WHERE score < ? OR (score = ? AND id < ?)"
+                    " ORDER BY score DESC, id DESC LIMIT ?".format(ranked),
+                    (query, after.score, after.score, after.id, limit))
+        return [(score, NewsArticle(id=pk, title=title, link=link)) for score, pk, title, link in rows]
+
+    def version(self) -> ContentVersion:
+        self._reload_if_stale()
+        return self._fingerprint.version()
+
+    def feed_key(self, user_data: UserData) -> Optional[str]:
+        """Query of position words, the ranked feed depends on nothing else"""
+        self._reload_if_stale()
+        return json.dumps(self._match_query(user_data))
+
+    def get_news_by_user_data(self, user_data: UserData) -> Iterable[NewsArticle]:
+        return [article for chunk in self.iter_news(user_data, chunk_size=1000) for article in chunk]
+
+    def get_news_page(self, user_data: UserData, cursor: Optional[str]=None,
+                      limit: int=DEFAULT_PAGE_SIZE) -> NewsPage:
+        after = decode_ranked_cursor(cursor) if cursor is not None else None
+        self._reload_if_stale()
+        with instrumentation.timed("storage"):
+            ranked = self._ranked_page(self._match_query(user_data), after, limit + 1)
+        if len(ranked) > limit:
+            score, article = ranked[limit - 1]
+            return NewsPage(articles=[article for _, article in ranked[:limit]],
+                            next_cursor=encode_ranked_cursor(score, article.id))
+        return NewsPage(articles=[article for _, article in ranked], next_cursor=None)
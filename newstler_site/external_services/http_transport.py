@@ -0,0 +1,69 @@
+"""Shared HTTP transport for external service clients"""
+from typing import Callable, FrozenSet, Iterable
+import random
+import time
+
+from requests.adapters import HTTPAdapter
+import requests
+
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))  # type: FrozenSet[str]
+RETRY_STATUSES = frozenset((502, 503, 504))  # type: FrozenSet[int]
+
+
+class HttpTransport:
+    """
+    Keep-alive connection pool with connect/read timeouts.
+    Idempotent requests are retried on connection errors, timeouts and gateway errors
+    with exponential backoff and full jitter. Safe to share between threads.
+    """
+    def __init__(self, *, pool_size: int=10, connect_timeout: float=3.05, read_timeout: float=10.0,
+                 max_retries: int=2, backoff_factor: float=0.2, retry_statuses: Iterable[int]=RETRY_STATUSES,
+                 sleep: Callable[[float], None]=time.sleep) -> None:
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = frozenset(retry_statuses)
+        self._sleep = sleep
+        self._session = self._make_session()
+
+    def _make_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number ``attempt`` (zero based)"""
+        return random.uniform(0, self.backoff_factor * (2 ** attempt))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        :raise requests.RequestException: if the last attempt failed
+        """
+        method = method.upper()
+        attempts = 1 + (self.max_retries if method in IDEMPOTENT_METHODS else 0)
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(attempts):
+            is_last = attempt + 1 == attempts
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if is_last:
+                    raise
+            else:
+                if is_last or response.status_code not in self.retry_statuses:
+                    return response
+                response.close()
+            self._sleep(self.backoff(attempt))
+        raise AssertionError("unreachable")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self._session.close()
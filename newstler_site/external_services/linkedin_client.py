@@ -9,16 +9,40 @@ from http.server import HTTPStatus
 from yarl import URL
 import requests
 
+from newstler_site import instrumentation
+from newstler_site.external_services.circuit_breaker import CircuitBreaker
+from newstler_site.external_services.http_transport import HttpTransport
+
 
 UserData = namedtuple("UserData", ("name", "position"))
 AccessTokenResponse = namedtuple("AccessTokenResponse", ("access_token", "expires"))
 
+PROFILE_PATH = "/v1/people/~:(first-name,positions)"
+
+
+def parse_user_data(data: dict) -> UserData:
+    """User data from LinkedIn people API response"""
+    if data["positions"]["values"]:
+        position = next(iter(data["positions"]["values"]))["title"]
+    else:
+        position = None
+    return UserData(name=data["firstName"], position=position)
+
+
+def is_service_failure(status_code: int) -> bool:
+    """Response status telling LinkedIn is down or overloaded rather than the request is wrong"""
+    return status_code >= HTTPStatus.INTERNAL_SERVER_ERROR or status_code == HTTPStatus.TOO_MANY_REQUESTS
+
 
 class LinkedInClient(ABC):
     @abstractmethod
     def authorization_endpoint(self) -> Tuple[UUID, URL]:
         """LinkedIn state and endpoint for getting user OAuth2.0 authorization code"""
 
+    @abstractmethod
+    def authorization_url(self, state: str) -> URL:
+        """LinkedIn endpoint for getting user OAuth2.0 authorization code with given ``state``"""
+
     @abstractmethod
     def get_access_token(self, auth_code: str) -> AccessTokenResponse:
         """Get user access token by auth code"""
@@ -37,9 +61,13 @@ class FakeLinkedInClient(LinkedInClient):
     # if there are no access to
     # real service by any reasons (usually we don't need real access for developing).
     # In that test case not fully implement (no facade support, in case time limit), but added for idea demonstration.
-    def authorization_endpoint(self) -> Tuple[str, URL]:
+    @property
+    def authorization_endpoint(self) -> Tuple[UUID, URL]:
         return uuid4(), URL("http://fakelinkedin.com/authorize")
 
+    def authorization_url(self, state: str) -> URL:
+        return URL("http://fakelinkedin.com/authorize").with_query(state=state)
+
     def get_access_token(self, auth_code: str) -> AccessTokenResponse:
         return AccessTokenResponse(access_token=uuid4().hex, expires="11260")
 
@@ -57,10 +85,15 @@ class RESTError(Exception):
         self.error = error
 
 
+class CircuitOpenError(RESTError):
+    """LinkedIn call rejected without being made, since LinkedIn failed too many times recently"""
+
+
 class RestLinkedInClient(LinkedInClient):
     """LinkedIn REST client"""
     def __init__(self, *, base_url: str, client_id: str, client_secret: str, redirect_uri: str, auth_path: str,
-                 token_path: str, api_url: str):
+                 token_path: str, api_url: str, transport: Optional[HttpTransport]=None,
+                 breaker: Optional[CircuitBreaker]=None):
         self.api_url = api_url
         self.token_path = token_path
         self.auth_path = auth_path
@@ -68,16 +101,21 @@ class RestLinkedInClient(LinkedInClient):
         self.base_url = base_url
         self.client_secret = client_secret
         self.client_id = client_id
+        self.transport = transport or HttpTransport()
+        self.breaker = breaker
         self.__user_access_token = None
 
     @property
     def authorization_endpoint(self) -> Tuple[UUID, URL]:
         state = uuid4()
-        return state, URL(self.base_url).with_path(self.auth_path).with_query(
+        return state, self.authorization_url(state.hex)
+
+    def authorization_url(self, state: str) -> URL:
+        return URL(self.base_url).with_path(self.auth_path).with_query(
             response_type="code",
             client_id=self.client_id,
             redirect_uri=self.redirect_uri,
-            state=state.hex,
+            state=state,
         )
 
     @staticmethod
@@ -86,6 +124,22 @@ class RestLinkedInClient(LinkedInClient):
             raise RESTError("Unexpected response code [{}] from linkedin client, expected: [{}]".format(
                 response.status_code, expected_codes))
 
+    def __request(self, method: str, url: URL, **kwargs) -> requests.Response:
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("LinkedIn is unavailable, calls are suspended")
+        instrumentation.count("linkedin_calls")
+        failed = True
+        try:
+            with instrumentation.timed("linkedin"):
+                response = self.transport.request(method, str(url), **kwargs)
+            failed = is_service_failure(response.status_code)
+            return response
+        except requests.RequestException as e:
+            raise RESTError("LinkedIn request failed: {}".format(e)) from e
+        finally:
+            if self.breaker is not None:
+                self.breaker.record(failed)
+
     def get_access_token(self, auth_code: str) -> AccessTokenResponse:
         url = URL(self.base_url).with_path(self.token_path)
         data = dict(grant_type="authorization_code",
@@ -93,7 +147,7 @@ class RestLinkedInClient(LinkedInClient):
                     redirect_uri=self.redirect_uri,
                     client_id=self.client_id,
                     client_secret=self.client_secret)
-        response = requests.post(url=str(url), data=data)
+        response = self.__request("POST", url, data=data)
         self.__validate_response(response, expected_codes=[HTTPStatus.OK])
         if response.status_code == HTTPStatus.BAD_REQUEST:
             raise RESTError(response.json()["error"])
@@ -109,6 +163,8 @@ class RestLinkedInClient(LinkedInClient):
             token_path=self.token_path,
             auth_path=self.auth_path,
             api_url=self.api_url,
+            transport=self.transport,
+            breaker=self.breaker,
         )  # type: LinkedInClient
         new_instance.__user_access_token = access_token
         yield new_instance
@@ -117,15 +173,10 @@ class RestLinkedInClient(LinkedInClient):
     def get_user_data(self) -> Optional[UserData]:
         if not self.__user_access_token:
             raise ValueError("LinkedIn session does not initialized by user access token")
-        url = URL(self.base_url).with_path("/v1/people/~:(first-name,positions)").with_query(format="json")
-        response = requests.get(str(url), headers={"Authorization": "Bearer {}".format(self.__user_access_token)})
+        url = URL(self.base_url).with_path(PROFILE_PATH).with_query(format="json")
+        response = self.__request("GET", url, headers={"Authorization": "Bearer {}".format(self.__user_access_token)})
         self.__validate_response(response, expected_codes=[HTTPStatus.OK, HTTPStatus.FORBIDDEN,
                                                            HTTPStatus.UNAUTHORIZED])
         if response.status_code == HTTPStatus.FORBIDDEN or response.status_code == HTTPStatus.UNAUTHORIZED:
             return None
-        data = response.json()
-        if data["positions"]["values"]:
-            position = next(iter(data["positions"]["values"]))["title"]
-        else:
-            position = None
-        return UserData(name=data["firstName"], position=position)
+        return parse_user_data(response.json())
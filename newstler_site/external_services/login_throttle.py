@@ -0,0 +1,114 @@
+"""Token bucket throttling of login attempts per client IP and per email"""
+from abc import ABC, abstractmethod
+from typing import Callable, Optional, Tuple
+import threading
+import time
+
+from django.core.cache import caches
+
+from newstler_site.external_services.profile_cache import LRUCache
+
+BucketState = Tuple[float, float]  # tokens left, time of last update
+
+
+class TokenBuckets(ABC):
+    """Buckets of ``capacity`` tokens refilled with ``rate`` tokens per second, one bucket per key"""
+    def __init__(self, *, capacity: float, rate: float, clock: Callable[[], float]) -> None:
+        if capacity < 1 or rate <= 0:
+            raise ValueError("Token bucket needs capacity >= 1 and positive rate, got {} and {}".format(capacity, rate))
+        self.capacity = capacity
+        self.rate = rate
+        self._clock = clock
+
+    @property
+    def refill_time(self) -> float:
+        """Seconds an empty bucket needs to become full, full buckets need not be stored"""
+        return self.capacity / self.rate
+
+    @abstractmethod
+    def _load(self, key: str) -> Optional[BucketState]:
+        """Stored bucket state"""
+
+    @abstractmethod
+    def _store(self, key: str, state: BucketState) -> None:
+        """Store bucket state for ``refill_time`` seconds"""
+
+    def _take(self, key: str) -> float:
+        now = self._clock()
+        state = self._load(key)
+        tokens = self.capacity if state is None else min(self.capacity, state[0] + (now - state[1]) * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        self._store(key, (tokens - 1, now))
+        return 0.0
+
+    def take(self, key: str) -> float:
+        """Take a token: 0 if taken, otherwise seconds until the bucket has one"""
+        return self._take(key)
+
+
+class InMemoryTokenBuckets(TokenBuckets):
+    """Per-process buckets of at most ``max_size`` most recent keys"""
+    def __init__(self, *, capacity: float, rate: float, max_size: int,
+                 clock: Callable[[], float]=time.monotonic) -> None:
+        super(InMemoryTokenBuckets, self).__init__(capacity=capacity, rate=rate, clock=clock)
+        self._buckets = LRUCache(max_size=max_size, clock=clock)
+        self._lock = threading.Lock()
+
+    def _load(self, key: str) -> Optional[BucketState]:
+        return self._buckets.get(key)
+
+    def _store(self, key: str, state: BucketState) -> None:
+        self._buckets.set(key, state, ttl=self.refill_time)
+
+    def take(self, key: str) -> float:
+        with self._lock:
+            return self._take(key)
+
+
+class DjangoCacheTokenBuckets(TokenBuckets):
+    """
+    Buckets in django cache framework, shared between processes when backend allows.
+    Updates are not atomic, so concurrent attempts may occasionally take the same token.
+    """
+    def __init__(self, *, capacity: float, rate: float, cache_alias: str, key_prefix: str="login-throttle",
+                 clock: Callable[[], float]=time.time) -> None:
+        super(DjangoCacheTokenBuckets, self).__init__(capacity=capacity, rate=rate, clock=clock)
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+
+    def _key(self, key: str) -> str:
+        return "{}:{}".format(self.key_prefix, key)
+
+    def _load(self, key: str) -> Optional[BucketState]:
+        return caches[self.cache_alias].get(self._key(key))
+
+    def _store(self, key: str, state: BucketState) -> None:
+        caches[self.cache_alias].set(self._key(key), state, int(self.refill_time) + 1)
+
+
+class LoginThrottle(ABC):
+    @abstractmethod
+    def attempt(self, ip: str, email: str) -> float:
+        """Account a login attempt: 0 if it may proceed, otherwise seconds to wait before the next one"""
+
+
+class DisabledLoginThrottle(LoginThrottle):
+    def attempt(self, ip: str, email: str) -> float:
+        return 0.0
+
+
+class TokenBucketLoginThrottle(LoginThrottle):
+    """
+    Attempts are limited per client IP, against bursts from one host,
+    and per email, against password guessing of one account from many hosts.
+    """
+    def __init__(self, *, ip_buckets: TokenBuckets, email_buckets: TokenBuckets) -> None:
+        self.ip_buckets = ip_buckets
+        self.email_buckets = email_buckets
+
+    def attempt(self, ip: str, email: str) -> float:
+        wait = self.ip_buckets.take("ip:{}".format(ip))
+        if wait:
+            return wait
+        return self.email_buckets.take("email:{}".format(email.strip().lower()))
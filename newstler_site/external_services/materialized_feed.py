@@ -0,0 +1,297 @@
+"""
+Feeds precomputed in database: ranked heads of the feeds users read are kept as ``FeedEntry`` rows
+by ``FeedMaterializer`` running in background, so a feed page is one range scan of an index.
+Users with equal tag scores read the same feed, ``UserFeed`` maps every user to it.
+"""
+from collections import defaultdict, namedtuple
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import hashlib
+import json
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import Max
+
+from django_app.models import FeedEntry, MaterializedFeed, NewsItem, NewsTag, UserFeed
+from newstler_site import instrumentation
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.news_storage import (
+    DEFAULT_PAGE_SIZE, FeedIndex, NewsArticle, NewsPage, NewsTagMatcher, RankedNewsStorage, decode_ranked_cursor,
+    make_ranked_page, ranked_page, scores_key
+)
+
+LOG = logging.getLogger('consolelogger')
+
+RefreshStats = namedtuple("RefreshStats", ("matched", "built", "dropped", "fanned_out", "entries", "duration"))
+
+_POSITION_MAX_LENGTH = UserFeed._meta.get_field("position").max_length
+# SQLite allows at most 999 query parameters
+_IN_BATCH_SIZE = 500
+
+
+def key_hash(key: str) -> str:
+    """Digest of ``scores_key`` identifying materialized feed"""
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def feed_scores(feed: MaterializedFeed) -> Optional[Dict[str, float]]:
+    pairs = json.loads(feed.scores)
+    return dict(pairs) if pairs is not None else None
+
+
+def _ranks_before_cutoff(feed: MaterializedFeed, score: float, news_id: int) -> bool:
+    """Entries ranked after cutoff of a trimmed feed would leave a gap of trimmed ones before them"""
+    return feed.cutoff_id is None or (score, news_id) > (feed.cutoff_score, feed.cutoff_id)
+
+
+class DatabaseFeedIndex(FeedIndex):
+    """Feed index querying news table by its (tag, id) index, nothing is held in memory"""
+    def tag_names(self) -> List[str]:
+        return list(NewsTag.objects.filter(news__isnull=False).values_list("name", flat=True).distinct())
+
+    @staticmethod
+    def _news(tag_names: Optional[Iterable[str]]):
+        news = NewsItem.objects.order_by("-pk")
+        return news if tag_names is None else news.filter(tag__name__in=list(tag_names))
+
+    def articles(self, tag_names: Optional[Iterable[str]]=None) -> List[NewsArticle]:
+        return [NewsArticle(id=pk, title=title, link=link)
+                for pk, title, link in self._news(tag_names).values_list("pk", "title", "link").iterator()]
+
+    def page(self, tag_names: Optional[Iterable[str]], before_id: Optional[int], limit: int) -> List[NewsArticle]:
+        news = self._news(tag_names)
+        if before_id is not None:
+            news = news.filter(pk__lt=before_id)
+        return [NewsArticle(id=pk, title=title, link=link)
+                for pk, title, link in news.values_list("pk", "title", "link")[:limit]]
+
+
+class MaterializedFeedStorage(RankedNewsStorage):
+    """
+    Storage serving feed pages from ``FeedEntry`` rows of feeds materialized by ``FeedMaterializer``.
+    Feeds not built yet and pages past the trimmed head of a feed are queried from news table.
+    News reach materialized feeds when the materializer fans them out, so feeds lag behind by its interval.
+    """
+    def __init__(self, matcher_max_age: float=60.0) -> None:
+        self._index = DatabaseFeedIndex()
+        self._matcher = NewsTagMatcher(max_age=matcher_max_age)
+
+    @property
+    def index(self) -> DatabaseFeedIndex:
+        return self._index
+
+    @property
+    def matcher(self) -> NewsTagMatcher:
+        return self._matcher
+
+    def subscribe(self, user_id: int, user_data: UserData) -> None:
+        position = (user_data.position or "")[:_POSITION_MAX_LENGTH]
+        # changed positions are matched to tags again by the materializer
+        if not UserFeed.objects.filter(user_id=user_id).exclude(position=position).update(position=position,
+                                                                                          feed=None):
+            UserFeed.objects.get_or_create(user_id=user_id, defaults={"position": position})
+
+    def get_news_page(self, user_data: UserData, cursor: Optional[str]=None,
+                      limit: int=DEFAULT_PAGE_SIZE) -> NewsPage:
+        after = decode_ranked_cursor(cursor) if cursor is not None else None
+        with instrumentation.timed("storage"):
+            feed_hash = key_hash(scores_key(self._scores(user_data)))
+            entries = FeedEntry.objects.filter(feed__key_hash=feed_hash)
+            if after is not None:
+                entries = entries.filter(score__lte=after.score).exclude(score=after.score, news_id__gte=after.id)
+            rows = list(entries.order_by("-score", "-news_id").values_list(
+                "score", "news_id", "news__title", "news__link", "feed__cutoff_id")[:limit + 1])
+            complete = len(rows) > limit or self._holds_whole_feed(feed_hash, rows)
+        if not complete:
+            return super(MaterializedFeedStorage, self).get_news_page(user_data, cursor=cursor, limit=limit)
+        return make_ranked_page([(score, NewsArticle(id=pk, title=title, link=link))
+                                 for score, pk, title, link, _ in rows], limit)
+
+    @staticmethod
+    def _holds_whole_feed(feed_hash: str, rows: List[tuple]) -> bool:
+        """Feed is built and not trimmed, so a short page is its last one"""
+        if rows:
+            return rows[-1][-1] is None
+        return MaterializedFeed.objects.filter(key_hash=feed_hash, fanned_out_through__isnull=False,
+                                               cutoff_id__isnull=True).exists()
+
+
+class FeedSubscribers:
+    """Built materialized feeds by tag name, with scores of the tag in them"""
+    def __init__(self, feeds: Iterable[MaterializedFeed]) -> None:
+        self.feeds = list(feeds)
+        self._by_tag = defaultdict(list)  # type: Dict[str, List[Tuple[MaterializedFeed, float]]]
+        self._all_news = []  # type: List[Tuple[MaterializedFeed, float]]
+        for feed in self.feeds:
+            scores = feed_scores(feed)
+            if scores is None:
+                self._all_news.append((feed, 0.0))
+                continue
+            for name, score in scores.items():
+                self._by_tag[name].append((feed, score))
+
+    @classmethod
+    def load(cls) -> "FeedSubscribers":
+        return cls(MaterializedFeed.objects.filter(fanned_out_through__isnull=False))
+
+    def entries(self, news: Iterable[Tuple[int, str]], fanned_out: bool) -> Iterator[FeedEntry]:
+        """
+        Entries of ``news`` given as (id, tag name) pairs in feeds of their tags.
+        :param fanned_out: news already passed to feeds, e.g. retagged ones, rather than new ones
+        """
+        for news_id, tag_name in news:
+            for feed, score in chain(self._by_tag.get(tag_name, ()), self._all_news):
+                if (news_id <= feed.fanned_out_through) == fanned_out and _ranks_before_cutoff(feed, score, news_id):
+                    yield FeedEntry(feed_id=feed.pk, score=score, news_id=news_id)
+
+
+def _missing(entries: Iterable[FeedEntry]) -> List[FeedEntry]:
+    """``entries`` not in their feeds, e.g. of news committed after news of greater ids were fanned out"""
+    entries = list(entries)
+    news_ids = sorted({entry.news_id for entry in entries})
+    existing = set()  # type: Set[Tuple[int, int]]
+    for start in range(0, len(news_ids), _IN_BATCH_SIZE):
+        existing.update(FeedEntry.objects.filter(news_id__in=news_ids[start:start + _IN_BATCH_SIZE]).values_list(
+            "feed_id", "news_id"))
+    return [entry for entry in entries if (entry.feed_id, entry.news_id) not in existing]
+
+
+def refresh_news_entries(news_ids: List[int]) -> int:
+    """
+    Move entries of ``news_ids`` to feeds of their current tags, e.g. after news were retagged.
+    News not fanned out yet are left to ``FeedMaterializer``.
+    :return: number of entries created
+    """
+    with transaction.atomic():
+        FeedEntry.objects.filter(news_id__in=news_ids).delete()
+        news = NewsItem.objects.filter(pk__in=news_ids).values_list("pk", "tag__name")
+        entries = list(FeedSubscribers.load().entries(news, fanned_out=True))
+        FeedEntry.objects.bulk_create(entries, batch_size=_IN_BATCH_SIZE)
+    return len(entries)
+
+
+class FeedMaterializer:
+    """
+    Keeps feeds of users recorded in ``UserFeed`` materialized, every ``run_once``:
+    points users whose tag scores changed (by position or by tags) to feeds of their new scores,
+    builds ranked heads of ``max_items`` entries of new feeds, fans news added since the last run out
+    to feeds of their tags in batches of ``batch_size`` news and drops feeds nobody reads.
+
+    Ids are allocated before commit, so news may become visible after news of greater ids were fanned out,
+    e.g. rows of a long bulk import. Every fan-out scans ``rescan_ids`` ids below the fanned out ones again
+    and adds news missing from feeds.
+    """
+    def __init__(self, *, matcher: NewsTagMatcher, max_items: int, batch_size: int, rescan_ids: int=10000) -> None:
+        self.matcher = matcher
+        self.max_items = max_items
+        self.batch_size = batch_size
+        self.rescan_ids = rescan_ids
+
+    def match_users(self) -> int:
+        """:return: number of users moved to another feed"""
+        self.matcher.invalidate()
+        feed_ids = dict(MaterializedFeed.objects.values_list("key_hash", "pk"))
+        # users of equal position are matched and moved together
+        positions = list(UserFeed.objects.values_list("position", "feed__key_hash").distinct())
+        moved = 0
+        for position, current_hash in positions:
+            key = scores_key(self.matcher.match(position) or None)
+            feed_hash = key_hash(key)
+            if feed_hash == current_hash:
+                continue
+            if feed_hash not in feed_ids:
+                feed_ids[feed_hash] = MaterializedFeed.objects.get_or_create(key_hash=feed_hash,
+                                                                             defaults={"scores": key})[0].pk
+            moved += UserFeed.objects.filter(position=position).exclude(feed_id=feed_ids[feed_hash]).update(
+                feed_id=feed_ids[feed_hash])
+        return moved
+
+    def drop_unused(self) -> int:
+        unused = list(MaterializedFeed.objects.filter(users__isnull=True).values_list("pk", flat=True))
+        for start in range(0, len(unused), _IN_BATCH_SIZE):
+            MaterializedFeed.objects.filter(pk__in=unused[start:start + _IN_BATCH_SIZE]).delete()
+        return len(unused)
+
+    @staticmethod
+    def _ranked_ids(scores: Optional[Dict[str, float]], through: int, limit: int) -> List[Tuple[float, int]]:
+        def page(tag_names: Optional[List[str]], before_id: Optional[int], page_limit: int) -> List[int]:
+            news = NewsItem.objects.filter(pk__lte=through if before_id is None else min(through, before_id - 1))
+            if tag_names is not None:
+                news = news.filter(tag__name__in=tag_names)
+            return list(news.order_by("-pk").values_list("pk", flat=True)[:page_limit])
+        return ranked_page(scores, None, limit, page)
+
+    def build(self, feed: MaterializedFeed) -> int:
+        """
+        Fill empty ``feed`` with its first ``max_items`` news.
+        :return: number of entries created
+        """
+        through = NewsItem.objects.aggregate(last=Max("pk"))["last"] or 0
+        ranked = self._ranked_ids(feed_scores(feed), through, self.max_items + 1)
+        with transaction.atomic():
+            FeedEntry.objects.bulk_create([FeedEntry(feed_id=feed.pk, score=score, news_id=news_id)
+                                           for score, news_id in ranked[:self.max_items]], batch_size=_IN_BATCH_SIZE)
+            feed.fanned_out_through = through
+            feed.cutoff_score, feed.cutoff_id = ranked[self.max_items - 1] if len(ranked) > self.max_items \
+                else (None, None)
+            feed.save(update_fields=["fanned_out_through", "cutoff_score", "cutoff_id"])
+        return min(len(ranked), self.max_items)
+
+    def trim(self, feed: MaterializedFeed) -> None:
+        """Delete entries ranked after the first ``max_items`` ones"""
+        head = list(feed.entries.order_by("-score", "-news_id").values_list("score", "news_id")[
+            self.max_items - 1:self.max_items + 1])
+        if len(head) < 2:
+            return
+        (feed.cutoff_score, feed.cutoff_id), (score, news_id) = head
+        feed.entries.filter(score__lte=score).exclude(score=score, news_id__gt=news_id).delete()
+        MaterializedFeed.objects.filter(pk=feed.pk).update(cutoff_score=feed.cutoff_score, cutoff_id=feed.cutoff_id)
+
+    def fan_out(self) -> Tuple[int, int]:
+        """:return: numbers of news fanned out and of entries created"""
+        subscribers = FeedSubscribers.load()
+        if not subscribers.feeds:
+            return 0, 0
+        fanned_out_through = min(feed.fanned_out_through for feed in subscribers.feeds)
+        last_id = max(0, fanned_out_through - self.rescan_ids)
+        fanned_out = created = 0
+        while True:
+            batch = list(NewsItem.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", "tag__name")[
+                :self.batch_size])
+            if not batch:
+                return fanned_out, created
+            last_id = batch[-1][0]
+            with transaction.atomic():
+                entries = list(subscribers.entries(batch, fanned_out=False))
+                entries.extend(_missing(subscribers.entries(batch, fanned_out=True)))
+                FeedEntry.objects.bulk_create(entries, batch_size=_IN_BATCH_SIZE)
+                MaterializedFeed.objects.filter(fanned_out_through__lt=last_id).update(fanned_out_through=last_id)
+                touched = {entry.feed_id for entry in entries}
+                for feed in subscribers.feeds:
+                    feed.fanned_out_through = max(feed.fanned_out_through, last_id)
+                    if feed.pk in touched:
+                        self.trim(feed)
+            fanned_out += sum(1 for news_id, _ in batch if news_id > fanned_out_through)
+            created += len(entries)
+
+    def rebuild_all(self) -> None:
+        """Empty all feeds to be built again, e.g. after tags were renamed"""
+        with transaction.atomic():
+            FeedEntry.objects.all().delete()
+            MaterializedFeed.objects.update(fanned_out_through=None, cutoff_score=None, cutoff_id=None)
+
+    def run_once(self) -> RefreshStats:
+        started = time.monotonic()
+        matched = self.match_users()
+        dropped = self.drop_unused()
+        built = entries = 0
+        for feed in MaterializedFeed.objects.filter(fanned_out_through__isnull=True):
+            entries += self.build(feed)
+            built += 1
+        fanned_out, created = self.fan_out()
+        stats = RefreshStats(matched=matched, built=built, dropped=dropped, fanned_out=fanned_out,
+                             entries=entries + created, duration=time.monotonic() - started)
+        LOG.info("Materialized feeds refresh: %s", stats)
+        return stats
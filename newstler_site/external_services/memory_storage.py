@@ -0,0 +1,107 @@
+"""News storage serving feeds from a memory-resident snapshot, without database access"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import threading
+import time
+
+from django_app.models import NewsItem, NewsTag
+from newstler_site import instrumentation
+from newstler_site.external_services.article_store import CompactArticleStore
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.news_storage import (
+    DEFAULT_PAGE_SIZE, ContentVersion, FeedFingerprint, FeedIndex, NewsArticle, RankedCursor, RankedNewsStorage,
+    TagLookup, decode_ranked_cursor, encode_ranked_cursor, feed_json, ranked_page
+)
+from newstler_site.external_services.tag_matcher import TagMatcher
+
+
+class SnapshotFeedIndex(FeedIndex):
+    """Immutable index of all articles in a ``CompactArticleStore``, loaded from database once"""
+    def __init__(self) -> None:
+        tags = TagLookup(lambda: dict(NewsTag.objects.values_list("pk", "name")))
+        self.weights = {}  # type: Dict[str, float]
+        for name, weight in NewsTag.objects.values_list("name", "weight"):
+            self.weights[name] = max(weight, self.weights.get(name, weight))
+        self.fingerprint = FeedFingerprint()
+        rows = NewsItem.objects.order_by("-pk").values_list("pk", "title", "link", "tag_id")
+        self.store = CompactArticleStore(self._fingerprinted(
+            (pk, title, link, tags.get(tag_id)) for pk, title, link, tag_id in rows.iterator()))
+
+    def _fingerprinted(self, rows: Iterable[Tuple[int, str, str, Optional[str]]]
+                       ) -> Iterator[Tuple[int, str, str, str]]:
+        for article_id, title, link, tag_name in rows:
+            # article of a tag deleted meanwhile
+            if tag_name is None:
+                continue
+            self.fingerprint.add(article_id, title, link, tag_name)
+            yield article_id, title, link, tag_name
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def tag_names(self) -> List[str]:
+        return self.store.tag_names()
+
+    def articles(self, tag_names: Optional[Iterable[str]]=None) -> List[NewsArticle]:
+        return [self.store.article(position) for position in self.store.positions(tag_names, None)]
+
+    def page(self, tag_names: Optional[Iterable[str]], before_id: Optional[int], limit: int) -> List[NewsArticle]:
+        return [self.store.article(position) for position in self.store.positions(tag_names, before_id, limit)]
+
+    def version(self) -> ContentVersion:
+        return self.fingerprint.version()
+
+    def ranked_positions(self, scores: Optional[Dict[str, float]], after: Optional[RankedCursor],
+                         limit: int) -> List[Tuple[float, int]]:
+        """``ranked_page`` as store positions"""
+        return ranked_page(scores, after, limit, self.store.positions)
+
+
+class MemoryNewsStorage(RankedNewsStorage):
+    """
+    Storage serving feeds from a snapshot of all articles taken at creation.
+    Changes are picked up by ``reload`` or, with positive ``max_age``, once the snapshot is older than that
+    many seconds. The old snapshot is served while the new one loads.
+    """
+    def __init__(self, max_age: float=0, clock: Callable[[], float]=time.monotonic) -> None:
+        self.max_age = max_age
+        self._clock = clock
+        self._reload_lock = threading.Lock()
+        self._index = SnapshotFeedIndex()
+        self._matcher = TagMatcher(self._index.weights)
+        self._loaded_at = clock()
+
+    def reload(self) -> None:
+        index = SnapshotFeedIndex()
+        matcher = TagMatcher(index.weights)
+        self._index, self._matcher, self._loaded_at = index, matcher, self._clock()
+
+    def _reload_if_stale(self) -> None:
+        if self.max_age <= 0 or self._clock() - self._loaded_at < self.max_age:
+            return
+        if self._reload_lock.acquire(blocking=False):
+            try:
+                self.reload()
+            finally:
+                self._reload_lock.release()
+
+    @property
+    def index(self) -> SnapshotFeedIndex:
+        self._reload_if_stale()
+        return self._index
+
+    @property
+    def matcher(self) -> TagMatcher:
+        return self._matcher
+
+    def get_news_json(self, user_data: UserData, cursor: Optional[str]=None, limit: int=DEFAULT_PAGE_SIZE) -> bytes:
+        """Page copied from pre-encoded articles of the snapshot"""
+        after = decode_ranked_cursor(cursor) if cursor is not None else None
+        index = self.index
+        with instrumentation.timed("storage"):
+            ranked = index.ranked_positions(self._scores(user_data), after, limit + 1)
+        next_cursor = None
+        if len(ranked) > limit:
+            score, position = ranked[limit - 1]
+            next_cursor = encode_ranked_cursor(score, index.store.article_id(position))
+        with instrumentation.timed("render"):
+            return feed_json(index.store.json_array([position for _, position in ranked[:limit]]), next_cursor)
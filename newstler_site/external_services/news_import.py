@@ -0,0 +1,211 @@
+"""
+Streaming bulk import of news from JSONL, CSV and RSS/Atom files.
+Files are read record by record, so memory use does not depend on their size.
+"""
+from collections import namedtuple
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional, Set
+import csv
+import json
+import logging
+import os
+import time
+import xml.etree.ElementTree as ElementTree
+
+from django.db import transaction
+
+from django_app.links import link_hash
+from django_app.models import NewsItem, NewsTag
+from django_app.signals import news_items_bulk_created
+
+LOG = logging.getLogger('consolelogger')
+
+NewsRecord = namedtuple("NewsRecord", ("title", "link", "tag"))
+ImportStats = namedtuple("ImportStats", ("read", "created", "duplicates", "skipped", "tags_created", "duration"))
+
+FORMATS = {
+    ".jsonl": "jsonl",
+    ".json": "jsonl",
+    ".csv": "csv",
+    ".xml": "rss",
+    ".rss": "rss",
+    ".atom": "rss",
+}
+
+
+def read_jsonl(stream: IO[str]) -> Iterator[NewsRecord]:
+    """One json object with "title", "link" and "tag" keys per line"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            LOG.warning("Skipped malformed json line: %.100s", line)
+            continue
+        yield NewsRecord(title=item.get("title"), link=item.get("link"), tag=item.get("tag"))
+
+
+def read_csv(stream: IO[str]) -> Iterator[NewsRecord]:
+    """CSV with "title", "link" and "tag" columns named in the header row"""
+    for row in csv.DictReader(stream):
+        yield NewsRecord(title=row.get("title"), link=row.get("link"), tag=row.get("tag"))
+
+
+def _local_name(element: ElementTree.Element) -> str:
+    return element.tag.rsplit("}", 1)[-1]
+
+
+def _child(element: ElementTree.Element, name: str) -> Optional[ElementTree.Element]:
+    for child in element:
+        if _local_name(child) == name:
+            return child
+    return None
+
+
+def _rss_record(element: ElementTree.Element) -> NewsRecord:
+    """RSS ``item`` or Atom ``entry``, first category is the tag"""
+    title = _child(element, "title")
+    link = _child(element, "link")
+    category = _child(element, "category")
+    return NewsRecord(
+        title=title.text if title is not None else None,
+        link=(link.get("href") or link.text) if link is not None else None,
+        tag=(category.get("term") or category.text) if category is not None else None,
+    )
+
+
+def read_rss(stream: IO[bytes]) -> Iterator[NewsRecord]:
+    """RSS 2.0 items or Atom entries, parsed incrementally and dropped once read"""
+    parents = []  # type: List[ElementTree.Element]
+    for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local_name(element) in ("item", "entry"):
+            yield _rss_record(element)
+            if parents:
+                parents[-1].remove(element)
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[str]:
+    """Given files and files of known formats in given directories"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, name)
+            if os.path.isfile(file_path) and os.path.splitext(name)[1].lower() in FORMATS:
+                yield file_path
+
+
+def read_files(paths: Iterable[str], file_format: Optional[str]=None) -> Iterator[NewsRecord]:
+    """
+    Records of all files, format is guessed by file extension unless ``file_format`` is given.
+
+    :raise ValueError: on unknown file format
+    """
+    for path in iter_files(paths):
+        current_format = file_format or FORMATS.get(os.path.splitext(path)[1].lower())
+        if current_format == "rss":
+            with open(path, "rb") as binary_stream:
+                yield from read_rss(binary_stream)
+        elif current_format in ("jsonl", "csv"):
+            reader = read_jsonl if current_format == "jsonl" else read_csv
+            with open(path, encoding="utf-8", newline="") as text_stream:
+                yield from reader(text_stream)
+        else:
+            raise ValueError("Unknown news file format: {}".format(path))
+
+
+# rows per "link_hash IN (...)" query, below SQLite limit of query parameters
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _digest(hex_hash: str) -> bytes:
+    # 8 bytes keep set of millions of links small, collisions are negligible at that size
+    return bytes.fromhex(hex_hash[:16])
+
+
+class NewsImporter:
+    """
+    Writes records as ``NewsItem`` rows in ``bulk_create`` batches of ``batch_size``, each in its own transaction.
+    Records with canonical links already in database or seen earlier are skipped, missing tags are created.
+    """
+    def __init__(self, *, batch_size: int=5000, default_tag: Optional[str]=None) -> None:
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive, got {}".format(batch_size))
+        self.batch_size = batch_size
+        self.default_tag = default_tag
+        self._title_length = NewsItem._meta.get_field("title").max_length
+        self._link_length = NewsItem._meta.get_field("link").max_length
+        self._tag_length = NewsTag._meta.get_field("name").max_length
+        self._tag_ids = {}  # type: Dict[str, int]
+        self._tags_created = 0
+
+    def _tag_id(self, name: str) -> int:
+        """Tags are matched case insensitively, new ones are created on first use"""
+        key = name.lower()
+        tag_id = self._tag_ids.get(key)
+        if tag_id is None:
+            tag_id = self._tag_ids[key] = NewsTag.objects.create(name=name).pk
+            self._tags_created += 1
+        return tag_id
+
+    def _load_tags(self) -> None:
+        for pk, name in NewsTag.objects.order_by("-pk").values_list("pk", "name").iterator():
+            self._tag_ids[name.lower()] = pk
+
+    def _write(self, batch: List[NewsItem]) -> int:
+        """:return: number of stored items, items with links stored meanwhile are dropped via link hash index"""
+        with transaction.atomic():
+            stored = set()  # type: Set[str]
+            for start in range(0, len(batch), LOOKUP_CHUNK_SIZE):
+                hashes = [item.link_hash for item in batch[start:start + LOOKUP_CHUNK_SIZE]]
+                stored.update(NewsItem.objects.filter(link_hash__in=hashes).values_list("link_hash", flat=True))
+            batch = [item for item in batch if item.link_hash not in stored]
+            NewsItem.objects.bulk_create(batch)
+        news_items_bulk_created.send(sender=NewsItem, count=len(batch))
+        return len(batch)
+
+    def run(self, records: Iterable[NewsRecord], progress: Optional[Callable[[int], None]]=None) -> ImportStats:
+        """:param progress: called with number of created items after every batch"""
+        started = time.perf_counter()
+        self._tags_created = 0
+        self._load_tags()
+        seen = set()  # type: Set[bytes]
+        read = created = duplicates = skipped = 0
+        batch = []  # type: List[NewsItem]
+        for record in records:
+            read += 1
+            title = (record.title or "").strip()
+            link = (record.link or "").strip()
+            tag = (record.tag or self.default_tag or "").strip()
+            if not title or not link or not tag or len(link) > self._link_length or len(tag) > self._tag_length:
+                skipped += 1
+                continue
+            hex_hash = link_hash(link)
+            digest = _digest(hex_hash)
+            if digest in seen:
+                duplicates += 1
+                continue
+            seen.add(digest)
+            batch.append(NewsItem(title=title[:self._title_length], link=link, link_hash=hex_hash,
+                                  tag_id=self._tag_id(tag)))
+            if len(batch) >= self.batch_size:
+                stored = self._write(batch)
+                created += stored
+                duplicates += len(batch) - stored
+                batch = []
+                if progress is not None:
+                    progress(created)
+        if batch:
+            stored = self._write(batch)
+            created += stored
+            duplicates += len(batch) - stored
+            if progress is not None:
+                progress(created)
+        return ImportStats(read=read, created=created, duplicates=duplicates, skipped=skipped,
+                           tags_created=self._tags_created, duration=time.perf_counter() - started)
@@ -1,19 +1,141 @@
 """Module contains base types and implement specific classes for news storage"""
 from abc import ABC, abstractmethod
-from collections import namedtuple
-from enum import Enum
-from typing import Iterable
+from bisect import bisect_left
+from collections import namedtuple, defaultdict
+from heapq import merge
+from itertools import islice
+from operator import attrgetter
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar, Union
+import base64
+import json
+import logging
+import math
+import threading
+import time
+import zlib
 
-from django_app.models import NewsItem
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete
+
+from django_app.models import NewsItem, NewsTag
+from django_app.signals import news_items_bulk_created, news_items_bulk_changed
+from newstler_site import instrumentation
 from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.tag_matcher import TagMatcher
+
 
+NewsArticle = namedtuple("NewItem", ("id", "title", "link"))
+NewsPage = namedtuple("NewsPage", ("articles", "next_cursor"))
+RankedCursor = namedtuple("RankedCursor", ("score", "id"))
+# token is equal for equal content in any process
+ContentVersion = namedtuple("ContentVersion", ("token",))
 
-class Tag(Enum):
-    PYTHON = "python"
-    JS = "javascript"
+DEFAULT_PAGE_SIZE = 50
 
+LOG = logging.getLogger('consolelogger')
+
+
+class InvalidCursor(ValueError):
+    """Malformed pagination cursor"""
+
+
+def encode_cursor(article_id: int) -> str:
+    """Opaque cursor pointing right after given article"""
+    return base64.urlsafe_b64encode(str(article_id).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    :raise InvalidCursor: if cursor was not produced by ``encode_cursor``
+    """
+    try:
+        return int(_decode_cursor_payload(cursor))
+    except ValueError:
+        raise InvalidCursor("Invalid news cursor: {!r}".format(cursor))
+
+
+def encode_ranked_cursor(score: float, article_id: int) -> str:
+    """Opaque cursor pointing right after given article of a relevance ranked feed"""
+    payload = "{!r}:{}".format(float(score), article_id)
+    return base64.urlsafe_b64encode(payload.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_ranked_cursor(cursor: str) -> RankedCursor:
+    """
+    :raise InvalidCursor: if cursor was not produced by ``encode_ranked_cursor``
+    """
+    try:
+        score, article_id = _decode_cursor_payload(cursor).split(":")
+        result = RankedCursor(score=float(score), id=int(article_id))
+    except ValueError:
+        raise InvalidCursor("Invalid news cursor: {!r}".format(cursor))
+    if not math.isfinite(result.score):
+        raise InvalidCursor("Invalid news cursor: {!r}".format(cursor))
+    return result
+
+
+def _decode_cursor_payload(cursor: str) -> str:
+    """:raise ValueError: binascii and unicode errors are its subclasses"""
+    return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+
+
+def article_json(article: NewsArticle) -> bytes:
+    """Compact json object of article, keys in fixed order so equal articles give equal bytes"""
+    return '{{"id":{},"title":{},"link":{}}}'.format(
+        int(article.id), json.dumps(article.title), json.dumps(str(article.link))).encode("utf-8")
+
+
+def feed_json(articles_json: bytes, next_cursor: Optional[str]) -> bytes:
+    """Json feed page of a json array of articles"""
+    return b''.join((b'{"articles":', articles_json, b',"next_cursor":', json.dumps(next_cursor).encode("ascii"),
+                     b'}'))
+
+
+class FeedFingerprint:
+    """
+    Order independent fingerprint of articles: count and xor of their 64 bit hashes,
+    updated in place as articles are added and removed.
+    """
+    def __init__(self) -> None:
+        self.count = 0
+        self.value = 0
+
+    @staticmethod
+    def _hash(article_id: int, title: str, link: str, tag_name: str) -> int:
+        data = "{}\0{}\0{}\0{}".format(article_id, title, link, tag_name).encode("utf-8")
+        return zlib.crc32(data) << 32 | zlib.adler32(data)
+
+    def add(self, article_id: int, title: str, link: str, tag_name: str) -> None:
+        self.count += 1
+        self.value ^= self._hash(article_id, title, link, tag_name)
+
+    def remove(self, article_id: int, title: str, link: str, tag_name: str) -> None:
+        self.count -= 1
+        self.value ^= self._hash(article_id, title, link, tag_name)
+
+    def version(self) -> ContentVersion:
+        return ContentVersion(token="{:x}-{:016x}".format(self.count, self.value))
 
-NewsArticle = namedtuple("NewItem", ("id", "title", "link"))
+
+def make_page(articles: Sequence[NewsArticle], limit: int) -> NewsPage:
+    """Page of first ``limit`` articles, ``articles`` may contain one extra item to detect the next page"""
+    if len(articles) > limit:
+        return NewsPage(articles=list(articles[:limit]), next_cursor=encode_cursor(articles[limit - 1].id))
+    return NewsPage(articles=list(articles), next_cursor=None)
+
+
+def make_ranked_page(ranked: Sequence[Tuple[float, NewsArticle]], limit: int) -> NewsPage:
+    """``make_page`` of articles with their scores in a relevance ranked feed"""
+    if len(ranked) > limit:
+        score, article = ranked[limit - 1]
+        return NewsPage(articles=[article for _, article in ranked[:limit]],
+                        next_cursor=encode_ranked_cursor(score, article.id))
+    return NewsPage(articles=[article for _, article in ranked], next_cursor=None)
+
+
+def scores_key(scores: Optional[Dict[str, float]]) -> str:
+    """Normalized tag scores, None stands for the feed of all articles"""
+    return json.dumps(sorted(scores.items()) if scores is not None else None)
 
 
 class NewsStorage(ABC):
@@ -21,15 +143,454 @@ class NewsStorage(ABC):
     def get_news_by_user_data(self, user_data: UserData) -> Iterable[NewsArticle]:
         """Get sequence of news according given experience"""
 
+    def get_news_page(self, user_data: UserData, cursor: Optional[str]=None,
+                      limit: int=DEFAULT_PAGE_SIZE) -> NewsPage:
+        """
+        Keyset paginated news, newest first. Pass ``next_cursor`` of a page to get the following one.
+        Default implementation filters full feed, storages should override it with an indexed lookup.
+
+        :raise InvalidCursor: on malformed cursor
+        """
+        articles = iter(self.get_news_by_user_data(user_data))
+        if cursor is not None:
+            before_id = decode_cursor(cursor)
+            articles = (article for article in articles if article.id < before_id)
+        return make_page(list(islice(articles, limit + 1)), limit)
+
+    def get_news_json(self, user_data: UserData, cursor: Optional[str]=None, limit: int=DEFAULT_PAGE_SIZE) -> bytes:
+        """
+        Page of ``get_news_page`` as ``{"articles": [{"id": ..., "title": ..., "link": ...}, ...], "next_cursor": ...}``
+        utf-8 json. Storages holding pre-encoded articles should override it.
+
+        :raise InvalidCursor: on malformed cursor
+        """
+        page = self.get_news_page(user_data, cursor=cursor, limit=limit)
+        with instrumentation.timed("render"):
+            articles_json = b"[" + b",".join(article_json(article) for article in page.articles) + b"]"
+            return feed_json(articles_json, page.next_cursor)
+
+    def version(self) -> Optional[ContentVersion]:
+        """
+        Version of all feeds, cheap enough to check on every request without database access.
+        None if storage does not track changes.
+        """
+        return None
+
+    def feed_key(self, user_data: UserData) -> Optional[str]:
+        """
+        Key of user feed: users with equal keys get equal news, so rendered news can be shared between them.
+        None if feed is personal.
+        """
+        return None
+
+    def subscribe(self, user_id: int, user_data: UserData) -> None:
+        """
+        Record that user reads the feed of just loaded ``user_data``.
+        Storages precomputing feeds of their readers override it.
+        """
+
+    def iter_news(self, user_data: UserData, chunk_size: int=DEFAULT_PAGE_SIZE) -> Iterator[List[NewsArticle]]:
+        """Whole feed as chunks fetched page by page, so it is never held in memory at once"""
+        cursor = None  # type: Optional[str]
+        while True:
+            page = self.get_news_page(user_data, cursor=cursor, limit=chunk_size)
+            if page.articles:
+                yield page.articles
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+
 
 class FakeNewsStorage(NewsStorage):
     def get_news_by_user_data(self, user_data: UserData) -> Iterable[NewsArticle]:
         return [NewsArticle(id=0, title="Python", link="http://www.fake.ru")]
 
 
-class DjangoORMBasedStorage(NewsStorage):
+def group_by_score(scores: Dict[str, float]) -> List[Tuple[float, List[str]]]:
+    """Tag names of equal score, highest score first"""
+    groups = defaultdict(list)  # type: Dict[float, List[str]]
+    for name, score in scores.items():
+        groups[score].append(name)
+    return sorted(groups.items(), key=lambda group: group[0], reverse=True)
+
+
+def _reversed_slice(articles: List[NewsArticle], end: int) -> Iterator[NewsArticle]:
+    """Lazy ``reversed(articles[:end])`` without copying the list"""
+    return (articles[i] for i in range(end - 1, -1, -1))
+
+
+class FeedIndex(ABC):
+    """Per-tag article lists ordered by id"""
+    @abstractmethod
+    def tag_names(self) -> List[str]:
+        """Names of tags having articles"""
+
+    @abstractmethod
+    def articles(self, tag_names: Optional[Iterable[str]]=None) -> List[NewsArticle]:
+        """Articles of given tags (all articles if ``tag_names`` is None), newest first"""
+
+    @abstractmethod
+    def page(self, tag_names: Optional[Iterable[str]], before_id: Optional[int], limit: int) -> List[NewsArticle]:
+        """Up to ``limit`` articles older than ``before_id``, newest first"""
+
+    def version(self) -> Optional[ContentVersion]:
+        """Version of indexed articles, None if not tracked"""
+        return None
+
+    def ranked_page(self, scores: Optional[Dict[str, float]], after: Optional[RankedCursor],
+                    limit: int) -> List[Tuple[float, NewsArticle]]:
+        """
+        Up to ``limit`` articles following ``after`` in a feed ranked by tag ``scores``, newest first
+        among articles of equal score. With ``scores`` None all articles have zero score.
+        """
+        return ranked_page(scores, after, limit, self.page)
+
+
+PageItem = TypeVar("PageItem")
+
+
+def ranked_page(scores: Optional[Dict[str, float]], after: Optional[RankedCursor], limit: int,
+                page: Callable[[Optional[List[str]], Optional[int], int], List[PageItem]]
+                ) -> List[Tuple[float, PageItem]]:
+    """
+    ``FeedIndex.ranked_page`` over any ``page(tag_names, before_id, limit)`` lookup returning items newest first,
+    ``tag_names`` None stands for all tags.
+    """
+    groups = group_by_score(scores) if scores is not None else [(0.0, None)]
+    ranked = []  # type: List[Tuple[float, PageItem]]
+    for score, names in groups:
+        if len(ranked) >= limit:
+            break
+        if after is not None and score > after.score:
+            continue
+        before_id = after.id if after is not None and score == after.score else None
+        ranked.extend((score, item) for item in page(names, before_id, limit - len(ranked)))
+    return ranked
+
+
+Tag = TypeVar("Tag")
+
+
+class TagLookup(Generic[Tag]):
+    """
+    Tags by id for article rows queried after them. Tags are loaded again once a row refers to an unknown one,
+    which was created after they were loaded.
+    """
+    def __init__(self, load: Callable[[], Dict[int, Tag]]) -> None:
+        self._load = load
+        self._missing = set()  # type: Set[int]
+        self.tags = load()
+
+    def get(self, tag_id: int) -> Optional[Tag]:
+        """Tag of ``tag_id``, None if it is deleted, so its articles are being deleted too"""
+        tag = self.tags.get(tag_id)
+        if tag is None and tag_id not in self._missing:
+            self.tags = self._load()
+            tag = self.tags.get(tag_id)
+            if tag is None:
+                self._missing.add(tag_id)
+        return tag
+
+
+class TagFeedIndex(FeedIndex):
+    """
+    Precomputed per-tag article lists.
+    Kept in sync with committed changes made by this process through model signals
+    and rebuilt once older than ``max_age`` seconds to pick up changes of other processes.
+    Stale lists are served while they are rebuilt in a background thread (in the calling thread
+    without ``background``), so only the first build and builds after changes signals do not describe,
+    e.g. bulk updates, make readers wait.
+    """
+    def __init__(self, max_age: float, clock: Callable[[], float]=time.monotonic, background: bool=True) -> None:
+        self.max_age = max_age
+        self.background = background
+        self._clock = clock
+        # guards lists, held for lookups and in-place changes only
+        self._lock = threading.RLock()
+        # held while database is read by the one thread building
+        self._build_lock = threading.Lock()
+        self._refresh_thread = None  # type: Optional[threading.Thread]
+        self._built_at = None  # type: Optional[float]
+        # changes committed while a build reads database, applied to its lists too
+        self._pending = None  # type: Optional[List[Callable[[], None]]]
+        self._articles = {}  # type: Dict[str, List[NewsArticle]]
+        self._ids = {}  # type: Dict[str, List[int]]
+        self._article_tags = {}  # type: Dict[int, str]
+        self._tag_names = {}  # type: Dict[int, str]
+        self._fingerprint = FeedFingerprint()
+        post_save.connect(self._on_item_saved, sender=NewsItem)
+        post_delete.connect(self._on_item_deleted, sender=NewsItem)
+        news_items_bulk_created.connect(self._on_items_bulk_changed, sender=NewsItem)
+        news_items_bulk_changed.connect(self._on_items_bulk_changed, sender=NewsItem)
+        post_save.connect(self._on_tag_saved, sender=NewsTag)
+        post_delete.connect(self._on_tag_deleted, sender=NewsTag)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def build(self) -> None:
+        """Read all articles and replace lists, readers are served the previous ones meanwhile"""
+        with self._build_lock:
+            self._build()
+
+    def _build(self) -> None:
+        with self._lock:
+            self._pending = []
+        try:
+            built_at = self._clock()
+            tags = TagLookup(lambda: dict(NewsTag.objects.values_list("pk", "name")))  # type: TagLookup[str]
+            articles = defaultdict(list)  # type: Dict[str, List[NewsArticle]]
+            article_tags = {}  # type: Dict[int, str]
+            fingerprint = FeedFingerprint()
+            rows = NewsItem.objects.order_by("pk").values_list("pk", "title", "link", "tag_id")
+            for pk, title, link, tag_id in rows.iterator():
+                name = tags.get(tag_id)
+                if name is None:
+                    continue
+                articles[name].append(NewsArticle(id=pk, title=title, link=link))
+                article_tags[pk] = name
+                fingerprint.add(pk, title, link, name)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._fingerprint = fingerprint
+            self._tag_names = tags.tags
+            self._articles = dict(articles)
+            self._ids = {name: [article.id for article in tag_articles] for name, tag_articles in articles.items()}
+            self._article_tags = article_tags
+            self._built_at = built_at
+            for change in pending:
+                change()
+
+    def _stale(self) -> bool:
+        return self._built_at is not None and self._clock() - self._built_at >= self.max_age
+
+    def _ensure_fresh(self) -> None:
+        if self._built_at is None:
+            with self._build_lock:
+                # unless built by another thread meanwhile
+                if self._built_at is None:
+                    self._build()
+        elif self._stale():
+            self._refresh()
+
+    def _refresh(self) -> None:
+        if not self.background:
+            self._build_if_stale()
+            return
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh_in_background, name="feed-index-refresh",
+                                                    daemon=True)
+            self._refresh_thread.start()
+
+    def _build_if_stale(self) -> None:
+        with self._build_lock:
+            if self._stale():
+                self._build()
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self._build_if_stale()
+        except Exception:
+            LOG.exception("Feed index refresh failed")
+        finally:
+            # connections belong to this thread
+            connections.close_all()
+
+    def tag_names(self) -> List[str]:
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._articles)
+
+    def version(self) -> ContentVersion:
+        self._ensure_fresh()
+        with self._lock:
+            return self._fingerprint.version()
+
+    def articles(self, tag_names: Optional[Iterable[str]]=None) -> List[NewsArticle]:
+        self._ensure_fresh()
+        with self._lock:
+            names = self._articles.keys() if tag_names is None else set(tag_names)
+            lists = [reversed(self._articles[name]) for name in names if name in self._articles]
+            return list(merge(*lists, key=attrgetter("id"), reverse=True))
+
+    def page(self, tag_names: Optional[Iterable[str]], before_id: Optional[int], limit: int) -> List[NewsArticle]:
+        self._ensure_fresh()
+        with self._lock:
+            names = self._articles.keys() if tag_names is None else set(tag_names)
+            lists = []
+            for name in names:
+                if name not in self._articles:
+                    continue
+                end = len(self._ids[name]) if before_id is None else bisect_left(self._ids[name], before_id)
+                lists.append(_reversed_slice(self._articles[name], end))
+            return list(islice(merge(*lists, key=attrgetter("id"), reverse=True), limit))
+
+    def _put(self, article: NewsArticle, tag_name: str) -> None:
+        self._remove(article.id)
+        ids = self._ids.setdefault(tag_name, [])
+        articles = self._articles.setdefault(tag_name, [])
+        position = bisect_left(ids, article.id)
+        ids.insert(position, article.id)
+        articles.insert(position, article)
+        self._article_tags[article.id] = tag_name
+        self._fingerprint.add(article.id, article.title, article.link, tag_name)
+
+    def _remove(self, article_id: int) -> None:
+        tag_name = self._article_tags.pop(article_id, None)
+        if tag_name is None:
+            return
+        ids = self._ids[tag_name]
+        position = bisect_left(ids, article_id)
+        article = self._articles[tag_name][position]
+        self._fingerprint.remove(article.id, article.title, article.link, tag_name)
+        del ids[position]
+        del self._articles[tag_name][position]
+
+    def _apply(self, change: Callable[[], None]) -> None:
+        """
+        Apply ``change`` of lists once the current transaction commits, so rolled back changes never show up.
+        Changes committed during a build are applied to its lists as well.
+        """
+        def apply() -> None:
+            with self._lock:
+                if self._pending is not None:
+                    self._pending.append(change)
+                if self._built_at is not None:
+                    change()
+        transaction.on_commit(apply)
+
+    def _on_item_saved(self, sender, instance: NewsItem, **kwargs) -> None:
+        article = NewsArticle(id=instance.pk, title=instance.title, link=instance.link)
+        tag_id = instance.tag_id
+
+        def put() -> None:
+            tag_name = self._tag_names.get(tag_id)
+            if tag_name is None:
+                self.invalidate()
+                return
+            self._put(article, tag_name)
+        self._apply(put)
+
+    def _on_item_deleted(self, sender, instance: NewsItem, **kwargs) -> None:
+        article_id = instance.pk
+        self._apply(lambda: self._remove(article_id))
+
+    def _on_items_bulk_changed(self, sender, **kwargs) -> None:
+        self._apply(self.invalidate)
+
+    def _on_tag_saved(self, sender, instance: NewsTag, created: bool, **kwargs) -> None:
+        tag_id, name = instance.pk, instance.name
+
+        def save() -> None:
+            if created:
+                self._tag_names[tag_id] = name
+            elif self._tag_names.get(tag_id) != name:
+                # renames are rare, articles of renamed tag are regrouped by full rebuild
+                self.invalidate()
+        self._apply(save)
+
+    def _on_tag_deleted(self, sender, instance: NewsTag, **kwargs) -> None:
+        tag_id = instance.pk
+
+        def delete() -> None:
+            self._tag_names.pop(tag_id, None)
+        self._apply(delete)
+
+
+class NewsTagMatcher:
+    """
+    ``TagMatcher`` over ``NewsTag`` table. Rebuilt on first use after tags of this process change
+    or once older than ``max_age`` seconds to pick up changes of other processes.
+    """
+    def __init__(self, max_age: float, clock: Callable[[], float]=time.monotonic) -> None:
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._built_at = None  # type: Optional[float]
+        self._matcher = TagMatcher({})
+        post_save.connect(self._on_tag_changed, sender=NewsTag)
+        post_delete.connect(self._on_tag_changed, sender=NewsTag)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def get(self) -> TagMatcher:
+        with self._lock:
+            if self._built_at is None or self._clock() - self._built_at >= self.max_age:
+                weights = {}  # type: Dict[str, float]
+                for name, weight in NewsTag.objects.values_list("name", "weight").iterator():
+                    weights[name] = max(weight, weights.get(name, weight))
+                self._matcher = TagMatcher(weights)
+                self._built_at = self._clock()
+            return self._matcher
+
+    def match(self, text: str) -> Dict[str, float]:
+        """Relevance score of every tag mentioned in ``text``"""
+        return self.get().match(text)
+
+    def _on_tag_changed(self, sender, instance: NewsTag, **kwargs) -> None:
+        self.invalidate()
+
+
+class RankedNewsStorage(NewsStorage):
+    """
+    Storage serving feeds from ``index``, articles are ranked by relevance of their tags
+    to user position according to ``matcher``, then newest first.
+    """
+    @property
+    @abstractmethod
+    def index(self) -> FeedIndex:
+        """Index of all articles feeds are served from"""
+
+    @property
+    @abstractmethod
+    def matcher(self) -> Union[TagMatcher, NewsTagMatcher]:
+        """Matcher of user positions to tag scores"""
+
+    def version(self) -> Optional[ContentVersion]:
+        return self.index.version()
+
+    def _scores(self, user_data: UserData) -> Optional[Dict[str, float]]:
+        """Tag scores, None if position mentions no tags and the whole feed is shown"""
+        return self.matcher.match(user_data.position or "") or None
+
+    def feed_key(self, user_data: UserData) -> Optional[str]:
+        """Normalized tag scores, the ranked feed depends on nothing else"""
+        return scores_key(self._scores(user_data))
+
     def get_news_by_user_data(self, user_data: UserData) -> Iterable[NewsArticle]:
-        tags = (tag.value for tag in Tag if tag.value in user_data.position.lower())
-        news = NewsItem.objects.all() if not tags else NewsItem.objects.filter(tag__name__in=tags)
+        with instrumentation.timed("storage"):
+            scores = self._scores(user_data)
+            if scores is None:
+                return self.index.articles()
+            return [article for _, names in group_by_score(scores) for article in self.index.articles(names)]
+
+    def get_news_page(self, user_data: UserData, cursor: Optional[str]=None,
+                      limit: int=DEFAULT_PAGE_SIZE) -> NewsPage:
+        after = decode_ranked_cursor(cursor) if cursor is not None else None
+        with instrumentation.timed("storage"):
+            ranked = self.index.ranked_page(self._scores(user_data), after, limit + 1)
+        return make_ranked_page(ranked, limit)
+
+
+class DjangoORMBasedStorage(RankedNewsStorage):
+    """Storage serving feeds from ``TagFeedIndex`` built over django models"""
+    def __init__(self, index_max_age: float=60.0) -> None:
+        self._index = TagFeedIndex(max_age=index_max_age)
+        self._matcher = NewsTagMatcher(max_age=index_max_age)
+
+    @property
+    def index(self) -> TagFeedIndex:
+        return self._index
 
-        return (NewsArticle(id=x.pk, title=x.title, link=x.link) for x in news)
+    @property
+    def matcher(self) -> NewsTagMatcher:
+        return self._matcher
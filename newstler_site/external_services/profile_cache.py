@@ -0,0 +1,213 @@
+"""Caching of LinkedIn user profiles in front of ``LinkedInClient.get_user_data``"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import datetime
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+from newstler_site.external_services.linkedin_client import UserData
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with per-entry time to live"""
+    def __init__(self, max_size: int, clock: Callable[[], float]=time.monotonic) -> None:
+        if max_size <= 0:
+            raise ValueError("LRU cache size must be positive, got {}".format(max_size))
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any=None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float]=None) -> None:
+        expires_at = None if ttl is None else self._clock() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def process_local(cache_alias: str) -> bool:
+    """Django cache of ``cache_alias`` keeps entries in process memory or nowhere, so processes do not share them"""
+    return isinstance(caches[cache_alias], (LocMemCache, DummyCache))
+
+
+def ttl_until(expiration: Optional[datetime.datetime], default_ttl: int) -> int:
+    """Seconds a profile may be cached: ``default_ttl`` capped by the access token expiration"""
+    if expiration is None:
+        return default_ttl
+    now = timezone.now() if timezone.is_aware(expiration) else datetime.datetime.now()
+    remaining = int((expiration - now).total_seconds())
+    return max(0, min(default_ttl, remaining))
+
+
+class ProfileCache(ABC):
+    """
+    Read-through cache of ``UserData`` keyed by site user id.
+    Empty profiles (revoked or expired token) are never cached.
+    Profiles are kept ``stale_ttl`` seconds longer than their ttl to be served by ``get_stale`` when LinkedIn fails.
+    """
+    def __init__(self, default_ttl: int, stale_ttl: int=0, clock: Callable[[], float]=time.time) -> None:
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._stats_lock = threading.Lock()
+
+    @property
+    def shared(self) -> bool:
+        """Profiles stored by one process are seen by the others"""
+        return False
+
+    @abstractmethod
+    def _read(self, user_id: int) -> Optional[Tuple[UserData, float]]:
+        """Stored profile and time it is fresh until"""
+
+    @abstractmethod
+    def _write(self, user_id: int, user_data: UserData, fresh_until: float, ttl: int) -> None:
+        """Store profile for ``ttl`` seconds"""
+
+    @abstractmethod
+    def invalidate(self, user_id: int) -> None:
+        """Drop cached profile, e.g. when user connects new LinkedIn token"""
+
+    def get(self, user_id: int) -> Optional[UserData]:
+        """Cached profile or None"""
+        entry = self._read(user_id)
+        return entry[0] if entry is not None and entry[1] > self._clock() else None
+
+    def get_stale(self, user_id: int) -> Optional[UserData]:
+        """Cached profile even if its ttl is over, not older than ``stale_ttl`` then"""
+        entry = self._read(user_id)
+        return entry[0] if entry is not None else None
+
+    def set(self, user_id: int, user_data: UserData, ttl: int) -> None:
+        """Store profile for ``ttl`` seconds"""
+        self._write(user_id, user_data, self._clock() + ttl, ttl + self.stale_ttl)
+
+    def lookup(self, user_id: int) -> Optional[UserData]:
+        """``get`` counted in hit and miss statistics"""
+        user_data = self.get(user_id)
+        with self._stats_lock:
+            if user_data is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return user_data
+
+    def store(self, user_id: int, user_data: Optional[UserData], expiration: Optional[datetime.datetime]) -> None:
+        """Cache loaded profile until token expiration at most, empty profiles are skipped"""
+        if user_data is not None:
+            ttl = ttl_until(expiration, self.default_ttl)
+            if ttl > 0:
+                self.set(user_id, user_data, ttl)
+
+    def get_user_data(self, user_id: int, expiration: Optional[datetime.datetime],
+                      loader: Callable[[], Optional[UserData]]) -> Optional[UserData]:
+        """Cached profile or result of ``loader`` which is cached until token expiration at most"""
+        user_data = self.lookup(user_id)
+        if user_data is None:
+            user_data = loader()
+            self.store(user_id, user_data, expiration)
+        return user_data
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class DisabledProfileCache(ProfileCache):
+    """Cache that always misses, so every request goes to LinkedIn"""
+    def __init__(self) -> None:
+        super(DisabledProfileCache, self).__init__(default_ttl=0)
+
+    def _read(self, user_id: int) -> Optional[Tuple[UserData, float]]:
+        return None
+
+    def _write(self, user_id: int, user_data: UserData, fresh_until: float, ttl: int) -> None:
+        pass
+
+    def invalidate(self, user_id: int) -> None:
+        pass
+
+
+class InMemoryProfileCache(ProfileCache):
+    """Per-process LRU profile cache"""
+    def __init__(self, *, max_size: int, default_ttl: int, stale_ttl: int=0,
+                 clock: Callable[[], float]=time.time) -> None:
+        super(InMemoryProfileCache, self).__init__(default_ttl=default_ttl, stale_ttl=stale_ttl, clock=clock)
+        self._entries = LRUCache(max_size=max_size, clock=clock)
+
+    def _read(self, user_id: int) -> Optional[Tuple[UserData, float]]:
+        return self._entries.get(user_id)
+
+    def _write(self, user_id: int, user_data: UserData, fresh_until: float, ttl: int) -> None:
+        self._entries.set(user_id, (user_data, fresh_until), ttl=ttl)
+
+    def invalidate(self, user_id: int) -> None:
+        self._entries.delete(user_id)
+
+
+class DjangoProfileCache(ProfileCache):
+    """
+    Profile cache on top of django cache framework, shared between processes when backend allows.
+    Eviction policy is the one of the configured cache backend.
+    """
+    def __init__(self, *, cache_alias: str, default_ttl: int, stale_ttl: int=0,
+                 key_prefix: str="linkedin-profile") -> None:
+        super(DjangoProfileCache, self).__init__(default_ttl=default_ttl, stale_ttl=stale_ttl)
+        self.cache_alias = cache_alias
+        self.key_prefix = key_prefix
+
+    @property
+    def _cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def shared(self) -> bool:
+        return not process_local(self.cache_alias)
+
+    def _key(self, user_id: int) -> str:
+        return "{}:{}".format(self.key_prefix, user_id)
+
+    def _read(self, user_id: int) -> Optional[Tuple[UserData, float]]:
+        cached = self._cache.get(self._key(user_id))
+        # entries of older releases hold profile fields only
+        if cached is None or len(cached) != len(UserData._fields) + 1:
+            return None
+        return UserData(*cached[:-1]), cached[-1]
+
+    def _write(self, user_id: int, user_data: UserData, fresh_until: float, ttl: int) -> None:
+        self._cache.set(self._key(user_id), tuple(user_data) + (fresh_until,), ttl)
+
+    def invalidate(self, user_id: int) -> None:
+        self._cache.delete(self._key(user_id))
@@ -0,0 +1,115 @@
+"""Background refresh of LinkedIn profiles, so request handlers only read precomputed state"""
+from collections import namedtuple
+from typing import Callable, List, Optional
+import asyncio
+import datetime
+import logging
+import time
+
+from django.utils import timezone
+
+from django_app.models import UserMetaInformationModel
+from newstler_site import instrumentation
+from newstler_site.external_services.async_linkedin_client import AsyncLinkedInClient
+from newstler_site.external_services.news_storage import NewsStorage
+from newstler_site.external_services.profile_cache import ProfileCache, ttl_until
+
+LOG = logging.getLogger('consolelogger')
+
+PREFETCHED_PROFILES = instrumentation.REGISTRY.counter(
+    "newstler_profile_prefetch_users_total", "Active users whose LinkedIn profiles were prefetched", ("result",))
+EXPIRING_TOKENS = instrumentation.REGISTRY.counter(
+    "newstler_expiring_tokens_total", "LinkedIn tokens marked as expiring soon by profile prefetch")
+PREFETCH_DURATION = instrumentation.REGISTRY.histogram(
+    "newstler_profile_prefetch_duration_seconds", "Profile prefetch scan time",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800))
+
+PrefetchStats = namedtuple("PrefetchStats", ("scanned", "expiring", "refreshed", "revoked", "failed", "duration"))
+
+
+class ProfilePrefetcher:
+    """
+    Scans connected users ordered by primary key in batches:
+    tokens expiring within ``expiry_margin`` are marked as ``refresh_required``,
+    profiles of users logged in during ``active_period`` are fetched with bounded concurrency
+    and put into profile cache and subscribed to their feeds in ``news_storage``, revoked tokens are cleared.
+    """
+    def __init__(self, *, linkedin: AsyncLinkedInClient, profile_cache: ProfileCache, batch_size: int,
+                 concurrency: int, rate_limit: float, expiry_margin: datetime.timedelta,
+                 active_period: datetime.timedelta, news_storage: Optional[NewsStorage]=None,
+                 sleep: Callable[[float], None]=time.sleep) -> None:
+        self.linkedin = linkedin
+        self.profile_cache = profile_cache
+        self.news_storage = news_storage
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.expiry_margin = expiry_margin
+        self.active_period = active_period
+        self._sleep = sleep
+
+    def mark_expiring(self) -> int:
+        """Flag tokens expiring soon, users will be asked to reconnect LinkedIn"""
+        deadline = timezone.now() + self.expiry_margin
+        return UserMetaInformationModel.objects.filter(
+            access_token__isnull=False, expiration__lte=deadline, refresh_required=False,
+        ).update(refresh_required=True)
+
+    def _active_users(self):
+        now = timezone.now()
+        return UserMetaInformationModel.objects.filter(
+            access_token__isnull=False, expiration__gt=now, user__last_login__gte=now - self.active_period,
+        ).order_by("pk").values_list("pk", "user_id", "access_token", "expiration")
+
+    def _throttle(self, calls: int, started: float) -> None:
+        if self.rate_limit > 0:
+            delay = calls / self.rate_limit - (time.monotonic() - started)
+            if delay > 0:
+                self._sleep(delay)
+
+    def run_once(self) -> PrefetchStats:
+        started = time.monotonic()
+        expiring = self.mark_expiring()
+        scanned = refreshed = failed = revoked = 0
+        loop = asyncio.new_event_loop()
+        try:
+            last_pk = 0
+            while True:
+                batch = list(self._active_users().filter(pk__gt=last_pk)[:self.batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                batch_started = time.monotonic()
+                results = loop.run_until_complete(self.linkedin.bulk_get_user_data(
+                    [access_token for _, _, access_token, _ in batch], concurrency=self.concurrency))
+                revoked_pks = []  # type: List[int]
+                for (pk, user_id, _, expiration), result in zip(batch, results):
+                    if result.error is not None:
+                        failed += 1
+                        LOG.warning("Failed to prefetch LinkedIn profile of user %s: %s", user_id, result.error)
+                    elif result.user_data is None:
+                        revoked_pks.append(pk)
+                        self.profile_cache.invalidate(user_id)
+                    else:
+                        if self.news_storage is not None:
+                            self.news_storage.subscribe(user_id, result.user_data)
+                        ttl = ttl_until(expiration, self.profile_cache.default_ttl)
+                        if ttl > 0:
+                            self.profile_cache.set(user_id, result.user_data, ttl)
+                            refreshed += 1
+                if revoked_pks:
+                    UserMetaInformationModel.objects.filter(pk__in=revoked_pks).update(access_token=None)
+                scanned += len(batch)
+                revoked += len(revoked_pks)
+                self._throttle(len(batch), batch_started)
+        finally:
+            loop.run_until_complete(self.linkedin.close())
+            loop.close()
+        stats = PrefetchStats(scanned=scanned, expiring=expiring, refreshed=refreshed, revoked=revoked,
+                              failed=failed, duration=time.monotonic() - started)
+        for outcome in ("refreshed", "revoked", "failed"):
+            PREFETCHED_PROFILES.inc(getattr(stats, outcome), result=outcome)
+        EXPIRING_TOKENS.inc(stats.expiring)
+        PREFETCH_DURATION.observe(stats.duration)
+        LOG.info("LinkedIn profiles prefetch: %s", stats)
+        return stats
@@ -1,14 +1,32 @@
 """Classes that implement service-discovery mechanism."""
 from abc import ABC, abstractmethod
 from configparser import ConfigParser
+from typing import Optional
 import logging
 
 from newstler_site.external_services.linkedin_client import LinkedInClient, FakeLinkedInClient, RestLinkedInClient
-from newstler_site.config import options
+from newstler_site.external_services.async_linkedin_client import (
+    AsyncLinkedInClient, FakeAsyncLinkedInClient, RestAsyncLinkedInClient
+)
+from newstler_site.external_services.circuit_breaker import CircuitBreaker
+from newstler_site.external_services.http_transport import HttpTransport
+from newstler_site.config import get_options
 
 from cached_property import cached_property
 
-from newstler_site.external_services.news_storage import NewsStorage, DjangoORMBasedStorage
+from newstler_site.external_services.fragment_cache import (
+    FragmentCache, DisabledFragmentCache, TieredFragmentCache
+)
+from newstler_site.external_services.login_throttle import (
+    LoginThrottle, DisabledLoginThrottle, TokenBucketLoginThrottle, InMemoryTokenBuckets, DjangoCacheTokenBuckets
+)
+from newstler_site.external_services.fts_storage import SQLiteFTSNewsStorage
+from newstler_site.external_services.materialized_feed import MaterializedFeedStorage
+from newstler_site.external_services.memory_storage import MemoryNewsStorage
+from newstler_site.external_services.news_storage import NewsStorage, DjangoORMBasedStorage, FakeNewsStorage
+from newstler_site.external_services.profile_cache import (
+    ProfileCache, DisabledProfileCache, InMemoryProfileCache, DjangoProfileCache
+)
 
 
 LOG = logging.getLogger('consolelogger')
@@ -50,16 +68,39 @@ class ServiceRegistry(ABC):
     def linkedin(self) -> LinkedInClient:
         """Proper LinkedIn client."""
 
+    @abstractmethod
+    def async_linkedin(self) -> AsyncLinkedInClient:
+        """Proper asyncio LinkedIn client."""
+
     @abstractmethod
     def news_storage(self) -> NewsStorage:
-        """Proper LinkedIn client."""
+        """Proper news storage."""
+
+    @abstractmethod
+    def profile_cache(self) -> ProfileCache:
+        """Proper LinkedIn profile cache."""
+
+    @abstractmethod
+    def fragment_cache(self) -> FragmentCache:
+        """Proper cache of rendered news."""
+
+    @abstractmethod
+    def login_throttle(self) -> LoginThrottle:
+        """Proper login attempts throttle."""
 
 
 class ConfigDrivenServiceRegistry(ServiceRegistry):
     """Service registry that uses app's config to get proper clients."""
 
-    def __init__(self, options: ConfigParser) -> None:
-        self.options = options
+    def __init__(self, options: Optional[ConfigParser]=None) -> None:
+        """:param options: config, by default config of the process read on first use"""
+        self._options = options
+
+    @property
+    def options(self) -> ConfigParser:
+        if self._options is None:
+            self._options = get_options()
+        return self._options
 
     def linkedin(self) -> LinkedInClient:
         return self._cached_linkedin
@@ -69,18 +110,125 @@ class ConfigDrivenServiceRegistry(ServiceRegistry):
         if self.options.getboolean("linkedin", "disabled"):
             return FakeLinkedInClient()
         return RestLinkedInClient(
-            base_url=options.get("linkedin", "url"),
-            client_id=options.get("linkedin", "client-id"),
-            client_secret=options.get("linkedin", "client-secret"),
-            redirect_uri=options.get("linkedin", "redirect-uri"),
-            auth_path=options.get("linkedin", "auth-path"),
-            token_path=options.get("linkedin", "token-endpoint"),
-            api_url=options.get("linkedin", "api-url")
+            base_url=self.options.get("linkedin", "url"),
+            client_id=self.options.get("linkedin", "client-id"),
+            client_secret=self.options.get("linkedin", "client-secret"),
+            redirect_uri=self.options.get("linkedin", "redirect-uri"),
+            auth_path=self.options.get("linkedin", "auth-path"),
+            token_path=self.options.get("linkedin", "token-endpoint"),
+            api_url=self.options.get("linkedin", "api-url"),
+            transport=HttpTransport(
+                pool_size=self.options.getint("linkedin", "pool-size"),
+                connect_timeout=self.options.getfloat("linkedin", "connect-timeout"),
+                read_timeout=self.options.getfloat("linkedin", "read-timeout"),
+                max_retries=self.options.getint("linkedin", "max-retries"),
+                backoff_factor=self.options.getfloat("linkedin", "retry-backoff"),
+            ),
+            breaker=self._linkedin_breaker,
         )
 
-    def news_storage(self):
+    @cached_property
+    def _linkedin_breaker(self) -> Optional[CircuitBreaker]:
+        """Circuit breaker shared by blocking and asyncio LinkedIn clients"""
+        failure_threshold = self.options.getint("linkedin", "breaker-failures")
+        if failure_threshold <= 0:
+            return None
+        return CircuitBreaker("linkedin", failure_threshold=failure_threshold,
+                              recovery_timeout=self.options.getfloat("linkedin", "breaker-recovery"),
+                              half_open_probes=self.options.getint("linkedin", "breaker-probes"))
+
+    def async_linkedin(self) -> AsyncLinkedInClient:
+        return self._cached_async_linkedin
+
+    @cached_property
+    def _cached_async_linkedin(self) -> AsyncLinkedInClient:
+        bulk_concurrency = self.options.getint("linkedin", "bulk-concurrency")
+        call_timeout = self.options.getfloat("linkedin", "read-timeout")
+        if self.options.getboolean("linkedin", "disabled"):
+            return FakeAsyncLinkedInClient(bulk_concurrency=bulk_concurrency, call_timeout=call_timeout)
+        return RestAsyncLinkedInClient(
+            base_url=self.options.get("linkedin", "url"),
+            client_id=self.options.get("linkedin", "client-id"),
+            client_secret=self.options.get("linkedin", "client-secret"),
+            redirect_uri=self.options.get("linkedin", "redirect-uri"),
+            auth_path=self.options.get("linkedin", "auth-path"),
+            token_path=self.options.get("linkedin", "token-endpoint"),
+            api_url=self.options.get("linkedin", "api-url"),
+            pool_size=self.options.getint("linkedin", "async-pool-size"),
+            bulk_concurrency=bulk_concurrency,
+            call_timeout=call_timeout,
+            breaker=self._linkedin_breaker,
+        )
+
+    def news_storage(self) -> NewsStorage:
         return self._cached_news_storage
 
     @cached_property
     def _cached_news_storage(self) -> NewsStorage:
-        return DjangoORMBasedStorage()
+        if self.options.getboolean("news-storage", "disabled"):
+            return FakeNewsStorage()
+        backend = self.options.get("news-storage", "backend")
+        if backend == "django-orm":
+            return DjangoORMBasedStorage(index_max_age=self.options.getfloat("news-storage", "index-max-age"))
+        if backend == "memory":
+            return MemoryNewsStorage(max_age=self.options.getfloat("news-storage", "snapshot-max-age"))
+        if backend == "sqlite-fts":
+            return SQLiteFTSNewsStorage(path=self.options.get("news-storage", "fts-path"),
+                                        max_age=self.options.getfloat("news-storage", "snapshot-max-age"))
+        if backend == "materialized":
+            return MaterializedFeedStorage(matcher_max_age=self.options.getfloat("news-storage", "index-max-age"))
+        raise ValueError("Unknown news storage backend: {}".format(backend))
+
+    def profile_cache(self) -> ProfileCache:
+        return self._cached_profile_cache
+
+    @cached_property
+    def _cached_profile_cache(self) -> ProfileCache:
+        if self.options.getboolean("profile-cache", "disabled"):
+            return DisabledProfileCache()
+        backend = self.options.get("profile-cache", "backend")
+        ttl = self.options.getint("profile-cache", "ttl")
+        stale_ttl = self.options.getint("profile-cache", "stale-ttl")
+        if backend == "memory":
+            return InMemoryProfileCache(max_size=self.options.getint("profile-cache", "max-size"), default_ttl=ttl,
+                                        stale_ttl=stale_ttl)
+        if backend == "django-cache":
+            return DjangoProfileCache(cache_alias=self.options.get("profile-cache", "cache-alias"), default_ttl=ttl,
+                                      stale_ttl=stale_ttl)
+        raise ValueError("Unknown profile cache backend: {}".format(backend))
+
+    def fragment_cache(self) -> FragmentCache:
+        return self._cached_fragment_cache
+
+    @cached_property
+    def _cached_fragment_cache(self) -> FragmentCache:
+        if self.options.getboolean("fragment-cache", "disabled"):
+            return DisabledFragmentCache()
+        return TieredFragmentCache(
+            max_size=self.options.getint("fragment-cache", "max-size"),
+            ttl=self.options.getint("fragment-cache", "ttl"),
+            cache_alias=self.options.get("fragment-cache", "cache-alias"),
+            lock_timeout=self.options.getfloat("fragment-cache", "lock-timeout"),
+        )
+
+    def login_throttle(self) -> LoginThrottle:
+        return self._cached_login_throttle
+
+    @cached_property
+    def _cached_login_throttle(self) -> LoginThrottle:
+        if self.options.getboolean("login-throttle", "disabled"):
+            return DisabledLoginThrottle()
+        backend = self.options.get("login-throttle", "backend")
+        if backend == "memory":
+            def buckets(kind: str):
+                return InMemoryTokenBuckets(capacity=self.options.getfloat("login-throttle", kind + "-burst"),
+                                            rate=self.options.getfloat("login-throttle", kind + "-rate"),
+                                            max_size=self.options.getint("login-throttle", "max-size"))
+        elif backend == "django-cache":
+            def buckets(kind: str):
+                return DjangoCacheTokenBuckets(capacity=self.options.getfloat("login-throttle", kind + "-burst"),
+                                               rate=self.options.getfloat("login-throttle", kind + "-rate"),
+                                               cache_alias=self.options.get("login-throttle", "cache-alias"))
+        else:
+            raise ValueError("Unknown login throttle backend: {}".format(backend))
+        return TokenBucketLoginThrottle(ip_buckets=buckets("ip"), email_buckets=buckets("email"))
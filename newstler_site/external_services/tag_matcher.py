@@ -0,0 +1,71 @@
+"""Multi-pattern matching of tag names in free text, e.g. user position titles"""
+from collections import defaultdict, deque
+from typing import Dict, List, Mapping, Tuple
+
+
+class TagMatcher:
+    """
+    Aho-Corasick automaton over tag names. Matching is case insensitive, takes whole words only
+    and runs in time proportional to text length, whatever the number of tags.
+    """
+    def __init__(self, weights: Mapping[str, float]) -> None:
+        """:param weights: relevance weight of every tag name"""
+        self._goto = [{}]  # type: List[Dict[str, int]]
+        self._fail = [0]
+        self._output = [[]]  # type: List[List[Tuple[int, str]]]
+        self.weights = dict(weights)
+        for name in self.weights:
+            pattern = name.strip().lower()
+            if pattern:
+                self._add(pattern, name)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def _add(self, pattern: str, name: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), name))
+
+    def _link(self) -> None:
+        """Failure links and merged outputs, breadth first so shorter suffixes are linked before longer ones"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def match(self, text: str) -> Dict[str, float]:
+        """Relevance score of every tag mentioned in ``text``: tag weight times number of mentions"""
+        text = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        scores = defaultdict(float)  # type: Dict[str, float]
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            after = position + 1
+            if after < len(text) and text[after].isalnum():
+                continue
+            for length, name in output[state]:
+                start = position - length + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    scores[name] += self.weights[name]
+        return dict(scores)
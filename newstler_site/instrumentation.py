@@ -0,0 +1,209 @@
+"""
+Request instrumentation: per-request phase timings and counters, process-wide metrics
+rendered in Prometheus text exposition format.
+Hooks are no-ops unless a trace is started for the current thread, so unsampled requests pay almost nothing.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]=()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _labels(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, values: LabelValues, extra: Sequence[Tuple[str, str]]=()) -> str:
+        pairs = list(zip(self.label_names, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + "}"
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines of all label values"""
+
+    def render(self) -> List[str]:
+        return ["# HELP {} {}".format(self.name, self.help_text), "# TYPE {} {}".format(self.name, self.kind)] + \
+            self.samples()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super(Counter, self).__init__(*args, **kwargs)
+        self._values = defaultdict(float)  # type: Dict[LabelValues, float]
+        # last totals passed to update
+        self._totals = {}  # type: Dict[LabelValues, float]
+
+    def inc(self, amount: float=1, **labels: str) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def update(self, total: float, **labels: str) -> None:
+        """
+        Advance by growth of ``total`` counted elsewhere, e.g. cache statistics read by a collector.
+        A total lower than the previous one is counted from zero, e.g. by a cache created meanwhile.
+        """
+        key = self._labels(labels)
+        with self._lock:
+            previous = self._totals.get(key, 0.0)
+            self._values[key] += total - previous if total >= previous else total
+            self._totals[key] = total
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._labels(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return ["{}{} {}".format(self.name, self._format_labels(key), value)
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float]=DEFAULT_BUCKETS, **kwargs) -> None:
+        super(Histogram, self).__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = {}  # type: Dict[LabelValues, List[int]]
+        self._sums = defaultdict(float)  # type: Dict[LabelValues, float]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._labels(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._sums[key] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append("{}_bucket{} {}".format(self.name, self._format_labels(key, [("le", le)]), cumulative))
+                lines.append("{}_sum{} {}".format(self.name, self._format_labels(key), self._sums[key]))
+                lines.append("{}_count{} {}".format(self.name, self._format_labels(key), cumulative))
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics; with several worker processes every process exposes its own values"""
+    def __init__(self) -> None:
+        self._metrics = {}  # type: Dict[str, _Metric]
+        self._collectors = []  # type: List[Callable[[], None]]
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str]=()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))  # type: ignore
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str]=()) -> Gauge:
+        return self._register(Gauge(name, help_text, label_names))  # type: ignore
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str]=(),
+                  buckets: Sequence[float]=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets=buckets))  # type: ignore
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Callback updating gauges right before exposition"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in list(self._collectors):
+            collector()
+        lines = []  # type: List[str]
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class RequestTrace:
+    """Timings of request phases and counters of expensive operations"""
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)  # type: Dict[str, float]
+        self.counts = defaultdict(int)  # type: Dict[str, int]
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_local = threading.local()
+
+
+def start_trace() -> RequestTrace:
+    _local.trace = RequestTrace()
+    return _local.trace
+
+
+def finish_trace() -> Optional[RequestTrace]:
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add wall time of the block to ``phase`` of current trace"""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.phases[phase] += time.perf_counter() - started
+
+
+def count(name: str, amount: int=1) -> None:
+    """Increase ``name`` counter of current trace"""
+    trace = current_trace()
+    if trace is not None:
+        trace.counts[name] += amount
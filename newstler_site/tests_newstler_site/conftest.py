@@ -3,8 +3,6 @@ from unittest.mock import NonCallableMock
 
 from yarl import URL
 
-from newstler_site.external_services.news_storage import NewsStorage, NewsArticle
-
 import django
 from django.conf import settings
 import pytest
@@ -17,6 +15,8 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "newstler_site.django_facade.set
 # `pytest` automatically calls this function once when tests are run.
 def pytest_configure():
     settings.DEBUG = False
+    # manifest storage needs collectstatic to be run before templates can be rendered
+    settings.STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
     # If you have any test specific settings, you can declare them here,
     # e.g.
     # settings.PASSWORD_HASHERS = (
@@ -26,6 +26,8 @@ def pytest_configure():
 
 
 def make_mock_news_storage():
+    # project modules touch django models, so they can be imported only after django.setup()
+    from newstler_site.external_services.news_storage import NewsStorage, NewsArticle
     mock = NonCallableMock(NewsStorage)
     mock.get_news_by_user_data.return_value = [
         NewsArticle(id=777, title="Mock news", link=URL("www.tests.org"))
@@ -37,3 +39,73 @@ def make_mock_news_storage():
 def news_storage():
     mock = make_mock_news_storage()
     return mock
+
+
+@pytest.fixture(scope="session")
+def django_db_setup():
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    setup_test_environment()
+    db_name = connection.creation.create_test_db(verbosity=0)
+    yield
+    connection.creation.destroy_test_db(db_name, verbosity=0)
+    teardown_test_environment()
+
+
+@pytest.fixture
+def db(django_db_setup):
+    """Test database access, all changes are rolled back after the test"""
+    from django.db import transaction
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@pytest.fixture
+def commit(db):
+    """Runs ``transaction.on_commit`` callbacks of the test transaction, as its commit would"""
+    from django.db import connection
+
+    def run_on_commit():
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for _, callback in callbacks:
+            callback()
+    return run_on_commit
+
+
+@pytest.fixture
+def service_registry(monkeypatch):
+    """Registry with fake LinkedIn client and real django storage, without caches"""
+    from newstler_site.external_services.fragment_cache import DisabledFragmentCache
+    from newstler_site.external_services.linkedin_client import FakeLinkedInClient
+    from newstler_site.external_services.login_throttle import DisabledLoginThrottle
+    from newstler_site.external_services.news_storage import DjangoORMBasedStorage
+    from newstler_site.external_services.profile_cache import DisabledProfileCache
+    from newstler_site.external_services.service_registry import ServiceRegistry
+    registry = NonCallableMock(ServiceRegistry)
+    registry.linkedin.return_value = FakeLinkedInClient()
+    registry.news_storage.return_value = DjangoORMBasedStorage()
+    registry.profile_cache.return_value = DisabledProfileCache()
+    registry.fragment_cache.return_value = DisabledFragmentCache()
+    registry.login_throttle.return_value = DisabledLoginThrottle()
+    monkeypatch.setattr(ServiceRegistry, "get", lambda: registry)
+    return registry
+
+
+@pytest.fixture
+def linkedin_user(db):
+    """Site user connected to LinkedIn"""
+    from django.contrib.auth.models import User
+    from django_app.models import UserMetaInformationModel
+    user = User.objects.create_user("john@newstler.test", "john@newstler.test", "secret-password")
+    UserMetaInformationModel.objects.create(user=user, access_token="token")
+    return user
+
+
+@pytest.fixture
+def client(linkedin_user):
+    """Django test client logged in as ``linkedin_user``"""
+    from django.test import Client
+    client = Client()
+    client.force_login(linkedin_user)
+    return client
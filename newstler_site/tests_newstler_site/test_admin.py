@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from django_app.admin import EstimatedCountPaginator, pk_batches, prefix_filter
+from django_app.models import FeedEntry, MaterializedFeed, NewsItem, NewsTag, UserMetaInformationModel
+
+import pytest
+
+CHANGELIST = "/admin/django_app/newsitem/"
+
+
+@pytest.fixture
+def admin_client(db):
+    user = User.objects.create_superuser("admin", "admin@newstler.test", "admin-password")
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+@pytest.fixture
+def tags(db):
+    return [NewsTag.objects.create(name="tag{}".format(i)) for i in range(5)]
+
+
+def add_news(tags, count):
+    start = NewsItem.objects.count()
+    return [NewsItem.objects.create(title="News #{}".format(i), link="http://news.test/{}".format(i),
+                                    tag=tags[i % len(tags)])
+            for i in range(start, start + count)]
+
+
+def changelist_queries(client, path=CHANGELIST, **params):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path, params)
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.parametrize("path", [CHANGELIST, "/admin/django_app/newstag/",
+                                  "/admin/django_app/usermetainformationmodel/"])
+def test_changelist_queries_do_not_grow_with_rows(admin_client, tags, path):
+    add_news(tags, 5)
+    for user in User.objects.all():
+        UserMetaInformationModel.objects.create(user=user, access_token="token")
+    few = changelist_queries(admin_client, path)
+    add_news(tags, 60)
+    for i in range(20):
+        user = User.objects.create_user("user{}".format(i), "user{}@newstler.test".format(i), "password")
+        UserMetaInformationModel.objects.create(user=user, access_token="token")
+    assert changelist_queries(admin_client, path) == few <= 8
+
+
+def test_news_search_by_title_prefix_and_link(admin_client, tags):
+    news = add_news(tags, 12)
+    response = admin_client.get(CHANGELIST, {"q": "News #1"})
+    assert sorted(item.pk for item in response.context["cl"].result_list) == \
+        sorted(item.pk for item in news if item.title.startswith("News #1"))
+    response = admin_client.get(CHANGELIST, {"q": "HTTP://news.test/7?utm_source=mail"})
+    assert [item.pk for item in response.context["cl"].result_list] == [news[7].pk]
+
+
+def test_title_prefix_search_uses_index(tags):
+    news = add_news(tags, 12)
+    queryset = NewsItem.objects.filter(**prefix_filter("title", "News #1"))
+    assert sorted(item.pk for item in queryset) == sorted(item.pk for item in news if item.title.startswith("News #1"))
+    sql, params = queryset.query.sql_with_params()
+    assert "LIKE" not in sql
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        assert "SEARCH" in plan and "title" in plan
+
+
+def test_estimated_count_paginator(tags, monkeypatch):
+    news = add_news(tags, 30)
+    monkeypatch.setattr(EstimatedCountPaginator, "max_count", 10)
+    news[-2].delete()
+    # last id is the estimate of unfiltered table, filtered rows are counted up to max_count
+    assert EstimatedCountPaginator(NewsItem.objects.all(), 10).count == news[-1].pk
+    assert EstimatedCountPaginator(NewsItem.objects.filter(tag=tags[0]), 10).count == 6
+    assert EstimatedCountPaginator(NewsItem.objects.filter(tag__in=tags[:3]), 10).count == 10
+
+
+def test_pk_batches(tags):
+    news = add_news(tags, 7)
+    assert list(pk_batches(NewsItem.objects.all(), batch_size=3)) == \
+        [[item.pk for item in news[i:i + 3]] for i in range(0, 7, 3)]
+
+
+def test_retag_action(admin_client, tags):
+    news = add_news(tags, 10)
+    selected = [str(item.pk) for item in news[:4]]
+    data = {"action": "retag_selected", "_selected_action": selected}
+    response = admin_client.post(CHANGELIST, data)
+    assert response.status_code == 200
+    assert set(response.context["selected"]) == set(selected)
+
+    data.update(post="yes", tag=str(tags[4].pk))
+    assert admin_client.post(CHANGELIST, data).status_code == 302
+    assert set(NewsItem.objects.filter(tag=tags[4]).values_list("pk", flat=True)) == \
+        {item.pk for item in news[:4]} | {news[4].pk, news[9].pk}
+
+
+def test_delete_action_across_all_filtered_rows(admin_client, tags):
+    news = add_news(tags, 10)
+    data = {"action": "delete_selected_in_batches", "_selected_action": [str(news[0].pk)], "select_across": "1"}
+    assert admin_client.post(CHANGELIST + "?tag__id__exact={}".format(tags[0].pk), data).status_code == 200
+    assert NewsItem.objects.count() == 10
+
+    data["post"] = "yes"
+    response = admin_client.post(CHANGELIST + "?tag__id__exact={}".format(tags[0].pk), data)
+    assert response.status_code == 302
+    assert NewsItem.objects.count() == 8
+    assert not NewsItem.objects.filter(tag=tags[0]).exists()
+
+
+def test_delete_action_removes_materialized_feed_entries(admin_client, tags):
+    news = add_news(tags, 3)
+    feed = MaterializedFeed.objects.create(key_hash="0" * 40, scores="null", fanned_out_through=news[-1].pk)
+    FeedEntry.objects.bulk_create([FeedEntry(feed=feed, score=0.0, news=item) for item in news])
+    data = {"action": "delete_selected_in_batches", "_selected_action": [str(news[1].pk)], "post": "yes"}
+    assert admin_client.post(CHANGELIST, data).status_code == 302
+    assert sorted(feed.entries.values_list("news_id", flat=True)) == [news[0].pk, news[2].pk]
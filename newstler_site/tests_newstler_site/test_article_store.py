@@ -0,0 +1,43 @@
+import json
+
+from newstler_site.external_services.article_store import CompactArticleStore
+from newstler_site.external_services.news_storage import NewsArticle
+
+import pytest
+
+ROWS = [
+    (9, "Django 2.0", "http://djangoproject.com", "python"),
+    (7, "Node \"10\"", "http://nodejs.org", "javascript"),
+    (5, "Python 3.7", "http://python.org/3.7", "python"),
+    (4, "Go 1.10", "http://golang.org", "golang"),
+    (2, "Ünïcode", "http://python.org/unicode", "python"),
+]
+
+
+@pytest.fixture
+def store():
+    return CompactArticleStore(ROWS)
+
+
+def test_positions_of_tags_newest_first(store):
+    assert store.positions(["python", "golang"], None) == [0, 2, 3, 4]
+    assert store.positions(["python", "golang"], before_id=5, limit=1) == [3]
+    assert store.positions(None, before_id=7, limit=2) == [2, 3]
+    assert store.positions(["rust"], None) == []
+
+
+def test_article_roundtrip(store):
+    assert [store.article(position) for position in range(len(store))] == [
+        NewsArticle(id=article_id, title=title, link=link) for article_id, title, link, _ in ROWS]
+
+
+@pytest.mark.parametrize("positions", [[], [1], [0, 1, 2], [0, 2, 3, 4]])
+def test_json_array_is_valid_json(store, positions):
+    articles = json.loads(store.json_array(positions).decode("utf-8"))
+    assert [article["id"] for article in articles] == [ROWS[position][0] for position in positions]
+    assert articles == [store.article(position)._asdict() for position in positions]
+
+
+def test_rejects_unordered_rows():
+    with pytest.raises(ValueError):
+        CompactArticleStore(reversed(ROWS))
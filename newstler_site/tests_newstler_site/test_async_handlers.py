@@ -0,0 +1,149 @@
+from concurrent.futures import Executor, Future
+import asyncio
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import RequestFactory, override_settings
+
+from django_app.models import NewsItem, NewsTag, UserMetaInformationModel
+from newstler_site.django_facade import async_handlers, database
+from newstler_site.django_facade.async_handlers import ASGIApplication, AsyncNewsHandler, ThreadRunner
+from newstler_site.django_facade.database import ReplicaRouter
+from newstler_site.external_services.async_linkedin_client import FakeAsyncLinkedInClient
+from newstler_site.external_services.linkedin_client import CircuitOpenError, UserData
+from newstler_site.external_services.profile_cache import InMemoryProfileCache
+from newstler_site.tests_newstler_site.test_async_linkedin_client import SlowLinkedInClient
+
+import pytest
+
+
+class InlineExecutor(Executor):
+    """Runs calls in the test thread, which holds the test transaction"""
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+class RevokedLinkedInClient(FakeAsyncLinkedInClient):
+    async def get_user_data(self):
+        return None
+
+
+class UnavailableLinkedInClient(FakeAsyncLinkedInClient):
+    async def get_user_data(self):
+        raise CircuitOpenError("LinkedIn is unavailable")
+
+
+@pytest.fixture
+def application(monkeypatch, service_registry):
+    # connections must survive requests to keep the test transaction, as django test client does
+    monkeypatch.setattr(async_handlers, "close_old_connections", lambda: None)
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    from django.core.wsgi import get_wsgi_application
+    yield ASGIApplication(get_wsgi_application(), executor=InlineExecutor(), routes={
+        "news_page": lambda run: AsyncNewsHandler(template_name="news.html", run=run),
+    })
+    request_started.connect(close_old_connections)
+    request_finished.connect(close_old_connections)
+
+
+@pytest.fixture
+def js_news(db):
+    tag = NewsTag.objects.create(name="javascript")
+    return [NewsItem.objects.create(title="JS news #{}".format(i), link="http://js.org/{}".format(i), tag=tag)
+            for i in range(3)]
+
+
+async def call(application, path, cookies=None, query_string=b""):
+    """Status, headers and body of ASGI response"""
+    headers = [(b"host", b"testserver")]
+    if cookies:
+        cookie = "; ".join("{}={}".format(name, morsel.value) for name, morsel in cookies.items())
+        headers.append((b"cookie", cookie.encode("latin-1")))
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query_string, "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(message.get("body", b"") for message in sent[1:])
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_news_page(application, service_registry, client, js_news):
+    service_registry.async_linkedin.return_value = FakeAsyncLinkedInClient()
+    status, headers, body = run(call(application, "/news/", client.cookies, b"limit=2"))
+    assert status == 200
+    assert b"JS news #2" in body and b"JS news #1" in body and b"JS news #0" not in body
+    assert headers[b"X-Frame-Options"] == b"SAMEORIGIN"
+
+
+def test_news_pages_wait_for_linkedin_concurrently(application, service_registry, client, js_news):
+    linkedin = service_registry.async_linkedin.return_value = SlowLinkedInClient(delay=0.05)
+    results = run(asyncio.gather(*[call(application, "/news/", client.cookies) for _ in range(20)]))
+    assert [status for status, _, _ in results] == [200] * 20
+    assert linkedin.max_running == 20
+
+
+def test_news_page_disconnects_revoked_token(application, service_registry, client, linkedin_user):
+    service_registry.async_linkedin.return_value = RevokedLinkedInClient()
+    status, headers, _ = run(call(application, "/news/", client.cookies))
+    assert status == 302 and headers[b"Location"] == b"/"
+    assert UserMetaInformationModel.objects.get(user=linkedin_user).access_token is None
+
+
+def test_news_page_requires_login(application, db):
+    status, headers, _ = run(call(application, "/news/"))
+    assert status == 302 and headers[b"Location"] == "{}?next=/news/".format(settings.LOGIN_URL).encode("ascii")
+
+
+def test_other_pages_are_served_by_wsgi_application(application, db):
+    status, _, body = run(call(application, "/login/"))
+    assert status == 200
+    assert b"<form" in body
+
+
+def test_news_page_serves_stale_profile_while_linkedin_is_unavailable(application, service_registry, client,
+                                                                      linkedin_user, js_news):
+    profile_cache = service_registry.profile_cache.return_value = InMemoryProfileCache(
+        max_size=10, default_ttl=900, stale_ttl=3600)
+    profile_cache.set(linkedin_user.id, UserData(name="John", position="JavaScript Developer"), ttl=0)
+    service_registry.async_linkedin.return_value = UnavailableLinkedInClient()
+    status, _, body = run(call(application, "/news/", client.cookies))
+    assert status == 200 and b"JS news #2" in body
+
+
+def test_thread_runner_carries_read_pinning_of_request():
+    runner = ThreadRunner(InlineExecutor())
+    request = RequestFactory().get("/news/")
+    with override_settings(DATABASE_REPLICAS=["replica0"]):
+        router = ReplicaRouter()
+        run(runner(database.start_request, True, request=request))
+        assert run(runner(router.db_for_read, NewsItem, request=request)) == "default"
+        assert run(runner(router.db_for_read, NewsItem)) == "replica0"
+
+        request = RequestFactory().get("/news/")
+        run(runner(router.db_for_write, UserMetaInformationModel, request=request))
+        assert run(runner(database.written, request=request))
+        assert not run(runner(database.written))
+
+
+def test_news_page_pins_client_to_primary_after_write(application, service_registry, client, linkedin_user):
+    service_registry.async_linkedin.return_value = RevokedLinkedInClient()
+    with override_settings(DATABASE_REPLICAS=["replica0"]):
+        status, headers, _ = run(call(application, "/news/", client.cookies))
+    assert status == 302
+    assert b"pin_primary=1" in headers[b"Set-Cookie"]
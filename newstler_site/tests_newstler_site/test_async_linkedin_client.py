@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+import asyncio
+
+from newstler_site.external_services.async_linkedin_client import FakeAsyncLinkedInClient, _AsyncSession
+from newstler_site.external_services.linkedin_client import RESTError, UserData
+
+
+class SlowLinkedInClient(FakeAsyncLinkedInClient):
+    """Answers after ``delay`` seconds, counts calls running at the same time"""
+    def __init__(self, delay, **kwargs):
+        super(SlowLinkedInClient, self).__init__(**kwargs)
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+
+    def session(self, access_token):
+        return _AsyncSession(SimpleNamespace(get_user_data=lambda: self.get_profile(access_token)))
+
+    async def get_profile(self, access_token):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if access_token == "broken":
+                raise RESTError("broken")
+            await asyncio.sleep(self.delay if access_token != "slow" else 1)
+            return UserData(name=access_token, position=None)
+        finally:
+            self.running -= 1
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_bulk_get_user_data_limits_concurrency():
+    client = SlowLinkedInClient(delay=0.01, bulk_concurrency=3)
+    tokens = ["token-{}".format(i) for i in range(10)]
+    results = run(client.bulk_get_user_data(tokens))
+    assert [result.user_data.name for result in results] == tokens
+    assert client.max_running == 3
+
+
+def test_bulk_get_user_data_reports_failures():
+    client = SlowLinkedInClient(delay=0.01)
+    results = run(client.bulk_get_user_data(["ok", "broken", "slow"], timeout=0.1))
+    assert results[0].user_data.name == "ok" and results[0].error is None
+    assert isinstance(results[1].error, RESTError)
+    assert isinstance(results[2].error, RESTError) and results[2].user_data is None
@@ -0,0 +1,90 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from newstler_site.external_services.circuit_breaker import CIRCUIT_STATE, CircuitBreaker, CircuitState
+from newstler_site.external_services.http_transport import HttpTransport
+from newstler_site.external_services.linkedin_client import CircuitOpenError, RESTError, RestLinkedInClient
+
+
+def make_breaker(now, **kwargs):
+    kwargs.setdefault("failure_threshold", 3)
+    kwargs.setdefault("recovery_timeout", 30)
+    return CircuitBreaker("test", clock=lambda: now[0], **kwargs)
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        assert breaker.allow()
+        breaker.record(failed=True)
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = make_breaker([0.0])
+    fail(breaker, 2)
+    breaker.record(failed=False)
+    fail(breaker, 2)
+    assert breaker.state == CircuitState.CLOSED
+    fail(breaker, 1)
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow()
+    assert CIRCUIT_STATE.value(circuit="test") == CircuitState.OPEN.value
+
+
+def test_half_open_circuit_lets_probes_through():
+    now = [0.0]
+    breaker = make_breaker(now, half_open_probes=2)
+    fail(breaker, 3)
+    now[0] += 30
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    breaker.record(failed=False)
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.record(failed=False)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_failed_probe_opens_circuit_again():
+    now = [0.0]
+    breaker = make_breaker(now)
+    fail(breaker, 3)
+    now[0] += 30
+    fail(breaker, 1)
+    assert breaker.state == CircuitState.OPEN
+    now[0] += 29
+    assert not breaker.allow()
+
+
+def make_client(side_effect, breaker):
+    transport = Mock(HttpTransport)
+    transport.request.side_effect = side_effect
+    client = RestLinkedInClient(base_url="http://linkedin.test", client_id="id", client_secret="secret",
+                                redirect_uri="http://local", auth_path="/auth", token_path="/token",
+                                api_url="http://linkedin.test/v1", transport=transport, breaker=breaker)
+    return client, transport
+
+
+def get_user_data(client):
+    with client.session(access_token="token") as user_session:
+        return user_session.get_user_data()
+
+
+def test_client_stops_calling_linkedin_when_circuit_opens():
+    breaker = make_breaker([0.0], failure_threshold=2)
+    client, transport = make_client([requests.Timeout(), Mock(status_code=503)], breaker)
+    for _ in range(2):
+        with pytest.raises(RESTError):
+            get_user_data(client)
+    with pytest.raises(CircuitOpenError):
+        get_user_data(client)
+    assert transport.request.call_count == 2
+
+
+def test_rejected_token_is_not_a_failure():
+    breaker = make_breaker([0.0], failure_threshold=1)
+    client, _ = make_client([Mock(status_code=401)] * 2, breaker)
+    assert get_user_data(client) is None
+    assert get_user_data(client) is None
+    assert breaker.state == CircuitState.CLOSED
@@ -0,0 +1,72 @@
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from django_app.models import NewsItem, NewsTag, UserMetaInformationModel
+from newstler_site.django_facade import database
+from newstler_site.django_facade.database import ReplicaRouter
+from newstler_site.django_facade.middleware import ReplicaPinningMiddleware
+
+import pytest
+
+
+@pytest.fixture
+def replicas():
+    with override_settings(DATABASE_REPLICAS=["replica0", "replica1"]):
+        database.start_request()
+        yield ReplicaRouter()
+    database.start_request()
+
+
+def test_sqlite_connections_use_write_ahead_log(tmpdir):
+    tuned = DatabaseWrapper(dict(connection.settings_dict, NAME=str(tmpdir.join("tuned.sqlite3"))), alias="tuned")
+    try:
+        with tuned.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            assert cursor.fetchone()[0] == "wal"
+            cursor.execute("PRAGMA synchronous")
+            assert cursor.fetchone()[0] == 1
+    finally:
+        tuned.close()
+
+
+def test_replicated_models_are_read_from_replicas_until_write(replicas):
+    assert replicas.db_for_read(NewsItem) in ("replica0", "replica1")
+    assert replicas.db_for_read(NewsTag) in ("replica0", "replica1")
+    assert replicas.db_for_read(UserMetaInformationModel) is None
+    assert replicas.db_for_write(UserMetaInformationModel) == "default"
+    assert replicas.db_for_read(NewsItem) == "default"
+
+    database.start_request()
+    assert replicas.db_for_read(NewsItem) != "default"
+    database.start_request(pinned=True)
+    assert replicas.db_for_read(NewsItem) == "default"
+    assert replicas.allow_migrate("replica0", "django_app") is False
+    assert replicas.allow_migrate("default", "django_app") is None
+
+
+def test_reads_in_transactions_go_to_primary(django_db_setup, replicas):
+    with transaction.atomic():
+        assert replicas.db_for_read(NewsItem) == "default"
+
+
+def test_client_reads_from_primary_after_write(replicas):
+    middleware = ReplicaPinningMiddleware()
+    request = RequestFactory().post("/login/")
+    middleware.process_request(request)
+    replicas.db_for_write(UserMetaInformationModel)
+    response = middleware.process_response(request, HttpResponse())
+    assert response.cookies["pin_primary"]["max-age"] == 5
+    assert replicas.db_for_read(NewsItem) != "default"
+
+    request = RequestFactory(HTTP_COOKIE="pin_primary=1").get("/news/")
+    middleware.process_request(request)
+    assert replicas.db_for_read(NewsItem) == "default"
+    assert "pin_primary" not in middleware.process_response(request, HttpResponse()).cookies
+
+    with override_settings(DATABASE_REPLICAS=[]):
+        middleware = ReplicaPinningMiddleware()
+    middleware.process_request(request)
+    replicas.db_for_write(UserMetaInformationModel)
+    assert "pin_primary" not in middleware.process_response(request, HttpResponse()).cookies
@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import uuid
+
+from django.core.cache import caches
+from django.test import override_settings
+
+from newstler_site.external_services.fragment_cache import DisabledFragmentCache, TieredFragmentCache
+
+import pytest
+
+
+@pytest.fixture
+def fragment_cache(tmpdir):
+    # default LocMemCache is per process, file based cache is shared like memcached
+    with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                               "LOCATION": str(tmpdir)}}):
+        yield TieredFragmentCache(max_size=10, ttl=60, cache_alias="default",
+                                  key_prefix="test-fragment-{}".format(uuid.uuid4().hex))
+
+
+def test_fragment_is_rendered_once(fragment_cache):
+    renders = []
+    for _ in range(3):
+        assert fragment_cache.get_or_render("python", lambda: renders.append(1) or "<p>python</p>") == "<p>python</p>"
+    assert len(renders) == 1
+    assert fragment_cache.stats() == {"hits": 2, "misses": 1}
+
+
+def test_fragment_is_shared_through_django_cache(fragment_cache):
+    fragment_cache.get_or_render("python", lambda: "<p>python</p>")
+    other_process = TieredFragmentCache(max_size=10, ttl=60, cache_alias="default",
+                                        key_prefix=fragment_cache.key_prefix)
+    assert other_process.get_or_render("python", lambda: "<p>rendered again</p>") == "<p>python</p>"
+
+
+def test_fragments_without_key_are_not_cached(fragment_cache):
+    assert [fragment_cache.get_or_render(None, lambda: i) for i in range(2)] == [0, 1]
+    assert [DisabledFragmentCache().get_or_render("python", lambda: i) for i in range(2)] == [0, 1]
+
+
+def test_per_process_django_cache_is_not_used():
+    fragment_cache = TieredFragmentCache(max_size=10, ttl=60, cache_alias="default",
+                                         key_prefix="test-fragment-{}".format(uuid.uuid4().hex))
+    assert not fragment_cache.shared
+    assert fragment_cache.get_or_render("python", lambda: "<p>python</p>") == "<p>python</p>"
+    assert fragment_cache.get_or_render("python", lambda: "<p>rendered again</p>") == "<p>python</p>"
+    key = "{}:{}".format(fragment_cache.key_prefix, hashlib.md5(b"python").hexdigest())
+    assert caches["default"].get(key) is None
+    assert caches["default"].get(key + ":lock") is None
+
+
+def test_render_failure_is_not_cached(fragment_cache):
+    def fail():
+        raise ValueError("no such page")
+
+    with pytest.raises(ValueError):
+        fragment_cache.get_or_render("python", fail)
+    assert fragment_cache.get_or_render("python", lambda: "rendered") == "rendered"
+
+
+def test_concurrent_misses_render_once(fragment_cache):
+    started = threading.Event()
+    release = threading.Event()
+    renders = []
+
+    def render():
+        renders.append(1)
+        started.set()
+        release.wait(5)
+        return "<p>python</p>"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        leader = executor.submit(fragment_cache.get_or_render, "python", render)
+        started.wait(5)
+        followers = [executor.submit(fragment_cache.get_or_render, "python", render) for _ in range(7)]
+        release.set()
+        assert {future.result() for future in [leader] + followers} == {"<p>python</p>"}
+    assert len(renders) == 1
+
+
+def test_other_process_waits_for_rendering_one(fragment_cache):
+    cache = caches["default"]
+    key = "{}:{}".format(fragment_cache.key_prefix, hashlib.md5(b"python").hexdigest())
+    cache.add(key + ":lock", 1, 5)
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        cache.set(key, "<p>from other process</p>")
+
+    fragment_cache._sleep = sleep
+    assert fragment_cache.get_or_render("python", lambda: "<p>rendered again</p>") == "<p>from other process</p>"
+    assert len(waits) == 1
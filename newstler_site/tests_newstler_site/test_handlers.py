@@ -0,0 +1,243 @@
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from django_app.models import NewsItem, NewsTag, UserFeed
+from newstler_site.django_facade.oauth_state import make_state
+from newstler_site.external_services.linkedin_client import CircuitOpenError, FakeLinkedInClient, UserData
+from newstler_site.external_services.materialized_feed import FeedMaterializer, MaterializedFeedStorage
+from newstler_site.external_services.news_storage import NewsTagMatcher
+from newstler_site.external_services.profile_cache import InMemoryProfileCache
+
+import pytest
+
+
+@pytest.fixture
+def js_news(db):
+    tag = NewsTag.objects.create(name="javascript")
+    return [NewsItem.objects.create(title="JS news #{}".format(i), link="http://js.org/{}".format(i), tag=tag)
+            for i in range(3)]
+
+
+def shown_titles(response, news):
+    content = response.content.decode("utf-8")
+    shown = [article for article in news if article.title in content]
+    return [article.title for article in sorted(shown, key=lambda article: content.index(article.title))]
+
+
+def test_news_page_is_paginated(service_registry, client, js_news):
+    response = client.get("/news/", {"limit": 2})
+    assert response.status_code == 200
+    assert shown_titles(response, js_news) == ["JS news #2", "JS news #1"]
+
+    response = client.get("/news/", {"limit": 2, "cursor": response.context["next_cursor"]})
+    assert shown_titles(response, js_news) == ["JS news #0"]
+    assert response.context["next_cursor"] is None
+
+
+def test_news_page_is_shared_by_fragment_cache(service_registry, client, js_news, commit):
+    from newstler_site.external_services.fragment_cache import TieredFragmentCache
+    fragment_cache = service_registry.fragment_cache.return_value = TieredFragmentCache(
+        max_size=10, ttl=60, cache_alias="default", key_prefix="test-news-fragment")
+    assert shown_titles(client.get("/news/"), js_news) == ["JS news #2", "JS news #1", "JS news #0"]
+    assert shown_titles(client.get("/news/"), js_news) == ["JS news #2", "JS news #1", "JS news #0"]
+    assert fragment_cache.stats() == {"hits": 1, "misses": 1}
+
+    js_news[1].delete()
+    commit()
+    assert shown_titles(client.get("/news/"), js_news) == ["JS news #2", "JS news #0"]
+
+
+@pytest.mark.parametrize("params", [{"cursor": "?"}, {"limit": "0"}, {"limit": "many"}])
+def test_news_page_rejects_invalid_pagination(service_registry, client, js_news, params):
+    assert client.get("/news/", params).status_code == 400
+
+
+@override_settings(NEWS_PAGE_STREAMING=True, NEWS_STREAM_CHUNK_SIZE=2)
+def test_news_page_streaming(service_registry, client, js_news):
+    response = client.get("/news/")
+    assert response.streaming
+    content = b"".join(response.streaming_content).decode("utf-8")
+    assert all(article.title in content for article in js_news)
+    assert content.rstrip().endswith("</html>")
+
+
+def count_queries(client, path):
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(path).status_code == 200
+    return len(queries)
+
+
+@pytest.mark.parametrize("session_engine, expected_queries", [
+    # user is loaded together with meta
+    ("django.contrib.sessions.backends.cached_db", 1),
+    ("django.contrib.sessions.backends.db", 2),
+])
+def test_news_page_queries(service_registry, linkedin_user, js_news, session_engine, expected_queries):
+    with override_settings(SESSION_ENGINE=session_engine):
+        client = Client()
+        client.force_login(linkedin_user)
+        count_queries(client, "/news/")  # builds storage index
+        assert count_queries(client, "/news/") == expected_queries
+
+
+class UnavailableLinkedInClient(FakeLinkedInClient):
+    def get_user_data(self):
+        raise CircuitOpenError("LinkedIn is unavailable")
+
+
+def test_news_page_serves_stale_profile_while_linkedin_is_unavailable(service_registry, client, linkedin_user,
+                                                                      js_news):
+    profile_cache = service_registry.profile_cache.return_value = InMemoryProfileCache(
+        max_size=10, default_ttl=900, stale_ttl=3600)
+    profile_cache.set(linkedin_user.id, UserData(name="John", position="JavaScript Developer"), ttl=0)
+    service_registry.linkedin.return_value = UnavailableLinkedInClient()
+    assert shown_titles(client.get("/news/"), js_news) == ["JS news #2", "JS news #1", "JS news #0"]
+
+    profile_cache.invalidate(linkedin_user.id)
+    response = client.get("/news/")
+    assert b"Failed to get access token" in response.content
+    assert not shown_titles(response, js_news)
+
+
+def test_news_page_of_materialized_feed(service_registry, client, linkedin_user, js_news):
+    service_registry.news_storage.return_value = MaterializedFeedStorage()
+    assert shown_titles(client.get("/news/"), js_news) == ["JS news #2", "JS news #1", "JS news #0"]
+    assert UserFeed.objects.get(user=linkedin_user).position == "JavaScript Developer"
+
+    FeedMaterializer(matcher=NewsTagMatcher(max_age=60), max_items=2, batch_size=10).run_once()
+    response = client.get("/news/", {"limit": 2})
+    assert shown_titles(response, js_news) == ["JS news #2", "JS news #1"]
+    response = client.get("/news/", {"limit": 2, "cursor": response.context["next_cursor"]})
+    assert shown_titles(response, js_news) == ["JS news #0"]
+
+
+def test_index_of_connected_user_does_not_write(service_registry, client):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get("/")
+    assert response.status_code == 302 and response["Location"] == "/news/"
+    assert not [query for query in queries if not query["sql"].startswith("SELECT")]
+
+
+def connect_url(client, linkedin_user):
+    linkedin_user.meta.access_token = None
+    linkedin_user.meta.save()
+    response = client.get("/")
+    assert response.status_code == 200
+    return response.context["linkedin_auth_url"]
+
+
+def test_linkedin_endpoint_accepts_signed_state(service_registry, client, linkedin_user):
+    state = connect_url(client, linkedin_user).query["state"]
+    response = client.get("/linkedin/", {"code": "code", "state": state})
+    assert response.status_code == 302 and response["Location"] == "/news/"
+    linkedin_user.meta.refresh_from_db()
+    assert linkedin_user.meta.access_token
+
+
+@pytest.mark.parametrize("forge", [
+    lambda state: state[:-1] + ("A" if state[-1] != "A" else "B"),
+    lambda state: make_state(0),
+])
+def test_linkedin_endpoint_rejects_forged_state(service_registry, client, linkedin_user, forge):
+    state = connect_url(client, linkedin_user).query["state"]
+    response = client.get("/linkedin/", {"code": "code", "state": forge(state)})
+    assert b"Failed process" in response.content
+    linkedin_user.meta.refresh_from_db()
+    assert linkedin_user.meta.access_token is None
+
+
+@override_settings(LINKEDIN_STATE_MAX_AGE=-1)
+def test_linkedin_endpoint_rejects_expired_state(service_registry, client, linkedin_user):
+    state = connect_url(client, linkedin_user).query["state"]
+    assert b"Failed process" in client.get("/linkedin/", {"code": "code", "state": state}).content
+
+
+def test_login_by_email_is_indexed(db):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, "auth_user")
+    assert any(constraint["index"] and constraint["columns"] == ["email"] for constraint in constraints.values())
+
+
+def test_news_api_is_paginated(service_registry, client, js_news):
+    response = client.get("/api/news/", {"limit": 2})
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/json"
+    page = json.loads(response.content.decode("utf-8"))
+    assert [article["title"] for article in page["articles"]] == ["JS news #2", "JS news #1"]
+    assert page["articles"][0] == {"id": js_news[2].pk, "title": "JS news #2", "link": "http://js.org/2"}
+
+    page = json.loads(client.get("/api/news/", {"limit": 2, "cursor": page["next_cursor"]}).content.decode("utf-8"))
+    assert page == {"articles": [{"id": js_news[0].pk, "title": "JS news #0", "link": "http://js.org/0"}],
+                    "next_cursor": None}
+
+
+@pytest.mark.parametrize("params", [{"cursor": "?"}, {"limit": "0"}])
+def test_news_api_rejects_invalid_pagination(service_registry, client, js_news, params):
+    response = client.get("/api/news/", params)
+    assert response.status_code == 400
+    assert "error" in json.loads(response.content.decode("utf-8"))
+
+
+def test_news_api_requires_linkedin(service_registry, client, linkedin_user):
+    linkedin_user.meta.access_token = None
+    linkedin_user.meta.save()
+    assert client.get("/api/news/").status_code == 403
+
+
+def test_news_api_answers_revalidation_without_storage(service_registry, client, js_news, commit):
+    response = client.get("/api/news/")
+    etag = response["ETag"]
+    assert response["Cache-Control"] == "private, no-cache"
+    assert not response.has_header("Last-Modified")
+
+    storage = service_registry.news_storage.return_value
+    with patch.object(storage, "get_news_json", side_effect=AssertionError("page fetched")):
+        response = client.get("/api/news/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+    assert client.get("/api/news/", {"limit": 1}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    NewsItem.objects.create(title="JS news #3", link="http://js.org/3", tag=js_news[0].tag)
+    commit()
+    response = client.get("/api/news/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_news_api_page_of_changing_content_has_no_etag(service_registry, client, js_news, commit):
+    from newstler_site.external_services.fragment_cache import TieredFragmentCache
+    service_registry.fragment_cache.return_value = TieredFragmentCache(
+        max_size=10, ttl=60, cache_alias="default", key_prefix="test-news-api-fragment")
+    storage = service_registry.news_storage.return_value
+    get_news_json = storage.get_news_json
+
+    def add_news_meanwhile(*args, **kwargs):
+        content = get_news_json(*args, **kwargs)
+        NewsItem.objects.create(title="JS news #3", link="http://js.org/3", tag=js_news[0].tag)
+        commit()
+        return content
+
+    with patch.object(storage, "get_news_json", side_effect=add_news_meanwhile):
+        response = client.get("/api/news/")
+    assert response.status_code == 200
+    assert not response.has_header("ETag")
+    assert "JS news #3" not in response.content.decode("utf-8")
+
+    response = client.get("/api/news/")
+    assert response.has_header("ETag")
+    assert "JS news #3" in response.content.decode("utf-8")
+
+
+def test_news_api_revalidation_queries(service_registry, linkedin_user, js_news):
+    with override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db"):
+        client = Client()
+        client.force_login(linkedin_user)
+        etag = client.get("/api/news/")["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get("/api/news/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+        # user with meta only
+        assert len(queries) == 1
@@ -0,0 +1,40 @@
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from newstler_site.external_services.http_transport import HttpTransport
+
+
+def make_transport(side_effect, max_retries=2):
+    transport = HttpTransport(max_retries=max_retries, sleep=lambda _: None)
+    transport._session = Mock(requests.Session)
+    transport._session.request.side_effect = side_effect
+    return transport
+
+
+def test_idempotent_request_is_retried():
+    ok = Mock(status_code=200)
+    transport = make_transport([requests.ConnectionError(), Mock(status_code=503), ok])
+    assert transport.get("http://linkedin.test") is ok
+    assert transport._session.request.call_count == 3
+
+
+def test_retries_are_bounded():
+    transport = make_transport(requests.Timeout())
+    with pytest.raises(requests.Timeout):
+        transport.get("http://linkedin.test")
+    assert transport._session.request.call_count == 3
+
+
+def test_post_is_not_retried():
+    transport = make_transport(requests.ConnectionError())
+    with pytest.raises(requests.ConnectionError):
+        transport.post("http://linkedin.test", data={})
+    assert transport._session.request.call_count == 1
+
+
+def test_timeouts_are_applied():
+    transport = make_transport([Mock(status_code=200)])
+    transport.get("http://linkedin.test")
+    assert transport._session.request.call_args[1]["timeout"] == transport.timeout
@@ -0,0 +1,74 @@
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from newstler_site import instrumentation
+from newstler_site.django_facade import middleware
+from newstler_site.django_facade.middleware import DB_QUERIES, InstrumentationMiddleware
+
+
+def test_metrics_exposition():
+    registry = instrumentation.MetricsRegistry()
+    registry.counter("calls_total", "Calls", ("kind",)).inc(2, kind="a")
+    registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1)).observe(0.5)
+    assert registry.render().splitlines() == [
+        "# HELP calls_total Calls",
+        "# TYPE calls_total counter",
+        'calls_total{kind="a"} 2.0',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 0',
+        'latency_seconds_bucket{le="1"} 1',
+        'latency_seconds_bucket{le="+Inf"} 1',
+        "latency_seconds_sum 0.5",
+        "latency_seconds_count 1",
+    ]
+
+
+def test_counter_follows_totals_counted_elsewhere():
+    counter = instrumentation.Counter("lookups_total", "Lookups", ("result",))
+    for total in (3, 5, 5, 2):
+        counter.update(total, result="hits")
+    # the last total comes from a new source
+    assert counter.value(result="hits") == 7
+
+
+def test_hooks_are_noop_without_trace():
+    with instrumentation.timed("phase"):
+        instrumentation.count("calls")
+    assert instrumentation.current_trace() is None
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+def test_news_request_is_traced(service_registry, client):
+    queries_before = DB_QUERIES._sums.get(("news_page",), 0)
+    assert client.get("/news/").status_code == 200
+    assert DB_QUERIES._sums[("news_page",)] > queries_before
+
+    metrics = client.get("/metrics/").content.decode("utf-8")
+    assert 'newstler_request_phase_duration_seconds_count{view="news_page",phase="render"}' in metrics
+    assert 'newstler_request_phase_duration_seconds_count{view="news_page",phase="storage"}' in metrics
+    assert 'newstler_profile_cache_lookups_total{result="misses"}' in metrics
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+def test_queries_of_all_databases_are_counted(tmpdir, monkeypatch):
+    replica = DatabaseWrapper(dict(connection.settings_dict, NAME=str(tmpdir.join("replica.sqlite3"))),
+                              alias="replica0")
+    # pragmas of new connections are queries too
+    replica.ensure_connection()
+    monkeypatch.setattr(middleware.connections, "all", lambda: [connection, replica])
+
+    def view(request):
+        with replica.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return HttpResponse()
+
+    queries_before = DB_QUERIES._sums.get(("unknown",), 0)
+    try:
+        InstrumentationMiddleware(view)(RequestFactory().get("/"))
+    finally:
+        replica.close()
+    assert DB_QUERIES._sums[("unknown",)] - queries_before == 1
+    assert not replica.force_debug_cursor
@@ -0,0 +1,58 @@
+import io
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+
+from django_app.links import canonical_link, dedupe_news_items, link_hash
+from django_app.models import NewsItem, NewsTag
+
+import pytest
+
+
+@pytest.mark.parametrize("link, expected", [
+    ("HTTP://News.Example.COM:80/Path?b=2&utm_source=tw&a=1#comments", "http://news.example.com/Path?a=1&b=2"),
+    ("https://example.com:8443?fbclid=x", "https://example.com:8443/"),
+    ("  https://example.com/a?Utm_Medium=x&q=python  ", "https://example.com/a?q=python"),
+    ("/relative/link", "/relative/link"),
+])
+def test_canonical_link(link, expected):
+    assert canonical_link(link) == expected
+
+
+@pytest.fixture
+def tag(db):
+    return NewsTag.objects.create(name="python")
+
+
+def test_save_stores_canonical_link_hash(tag):
+    item = NewsItem.objects.create(title="Python", link="http://python.org/?utm_source=rss", tag=tag)
+    assert item.link_hash == link_hash("http://PYTHON.org")
+
+
+def test_clean_rejects_duplicate_link(tag):
+    item = NewsItem.objects.create(title="Python", link="http://python.org/", tag=tag)
+    item.full_clean()
+    with pytest.raises(ValidationError) as error:
+        NewsItem(title="Python again", link="http://python.org/#top", tag=tag).full_clean()
+    assert "link" in error.value.message_dict
+
+
+def test_dedupe_keeps_oldest_item_of_every_link(tag):
+    NewsItem.objects.bulk_create([
+        NewsItem(title="First", link="http://python.org/?utm_campaign=a", tag=tag),
+        NewsItem(title="Other", link="http://django.org/", tag=tag),
+        NewsItem(title="Second", link="http://python.org/", tag=tag),
+        NewsItem(title="Third", link="http://Python.org:80/?utm_campaign=b", tag=tag),
+    ])
+    stats = dedupe_news_items(NewsItem, batch_size=2)
+    assert (stats.scanned, stats.hashed, stats.deleted) == (4, 2, 2)
+    assert list(NewsItem.objects.order_by("pk").values_list("title", flat=True)) == ["First", "Other"]
+    assert NewsItem.objects.filter(link_hash=None).count() == 0
+
+
+def test_dedupe_news_command(tag):
+    NewsItem.objects.bulk_create([NewsItem(title=str(i), link="http://python.org/?utm_id={}".format(i), tag=tag)
+                                  for i in range(3)])
+    output = io.StringIO()
+    call_command("dedupe_news", stdout=output)
+    assert "done: scanned=3 hashed=1 deleted=2" in output.getvalue()
@@ -0,0 +1,100 @@
+import uuid
+
+from django.contrib.auth.models import User
+from django.test import Client, RequestFactory, override_settings
+
+from newstler_site.django_facade.handlers import client_ip
+from newstler_site.external_services.login_throttle import (
+    DjangoCacheTokenBuckets, InMemoryTokenBuckets, TokenBucketLoginThrottle
+)
+
+import pytest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(params=["memory", "django-cache"])
+def make_buckets(request, clock):
+    def make(capacity, rate):
+        if request.param == "memory":
+            return InMemoryTokenBuckets(capacity=capacity, rate=rate, max_size=100, clock=clock)
+        return DjangoCacheTokenBuckets(capacity=capacity, rate=rate, cache_alias="default",
+                                       key_prefix="test-throttle-{}".format(uuid.uuid4().hex), clock=clock)
+    return make
+
+
+def test_bucket_allows_burst_then_refills(make_buckets, clock):
+    buckets = make_buckets(capacity=3, rate=0.5)
+    assert [buckets.take("ip:1") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("ip:1") == pytest.approx(2.0)
+    assert buckets.take("ip:2") == 0
+    clock.now += 2
+    assert buckets.take("ip:1") == 0
+    assert buckets.take("ip:1") == pytest.approx(2.0)
+
+
+def test_login_throttle_limits_ip_and_email(make_buckets):
+    throttle = TokenBucketLoginThrottle(ip_buckets=make_buckets(capacity=3, rate=0.1),
+                                        email_buckets=make_buckets(capacity=2, rate=0.1))
+    assert [throttle.attempt("10.0.0.1", "john@newstler.test") for _ in range(2)] == [0, 0]
+    # another host guessing the same account
+    assert throttle.attempt("10.0.0.2", "John@Newstler.test ") > 0
+    assert throttle.attempt("10.0.0.1", "anna@newstler.test") == 0
+    assert throttle.attempt("10.0.0.1", "kate@newstler.test") > 0
+
+
+def test_login_page_answers_429_when_throttled(service_registry, db):
+    service_registry.login_throttle.return_value = TokenBucketLoginThrottle(
+        ip_buckets=InMemoryTokenBuckets(capacity=1, rate=0.01, max_size=10),
+        email_buckets=InMemoryTokenBuckets(capacity=10, rate=1, max_size=10))
+    client = Client()
+    data = {"email": "john@newstler.test", "password": "wrong-password"}
+    assert client.post("/login/", data).status_code == 200
+    response = client.post("/login/", data)
+    assert response.status_code == 429
+    assert response["Retry-After"] == "100"
+
+
+@override_settings(CLIENT_IP_PROXY_HOPS=1)
+def test_clients_behind_proxy_are_throttled_separately(service_registry, db):
+    service_registry.login_throttle.return_value = TokenBucketLoginThrottle(
+        ip_buckets=InMemoryTokenBuckets(capacity=1, rate=0.01, max_size=10),
+        email_buckets=InMemoryTokenBuckets(capacity=10, rate=1, max_size=10))
+    client = Client(REMOTE_ADDR="10.1.0.1")
+    data = {"email": "john@newstler.test", "password": "wrong-password"}
+    assert client.post("/login/", data, HTTP_X_FORWARDED_FOR="203.0.113.1").status_code == 200
+    assert client.post("/login/", data, HTTP_X_FORWARDED_FOR="203.0.113.2").status_code == 200
+    # address forged by the client is not trusted
+    assert client.post("/login/", data, HTTP_X_FORWARDED_FOR="198.51.100.7, 203.0.113.1").status_code == 429
+
+
+def test_client_ip_of_trusted_proxies():
+    request = RequestFactory(REMOTE_ADDR="10.1.0.1").get("/", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2, 3.3.3.3")
+    assert client_ip(request) == "10.1.0.1"
+    with override_settings(CLIENT_IP_PROXY_HOPS=2):
+        assert client_ip(request) == "2.2.2.2"
+    with override_settings(CLIENT_IP_PROXY_HOPS=5):
+        assert client_ip(request) == "1.1.1.1"
+        assert client_ip(RequestFactory(REMOTE_ADDR="10.1.0.1").get("/")) == "10.1.0.1"
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+def test_password_is_rehashed_on_login_with_configured_cost(service_registry, db):
+    user = User.objects.create_user("john@newstler.test", "john@newstler.test", "secret-password")
+    assert user.password.startswith("pbkdf2_sha256$1000$")
+    with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+        response = Client().post("/login/", {"email": "john@newstler.test", "password": "secret-password"})
+        assert response.status_code == 302
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$2000$")
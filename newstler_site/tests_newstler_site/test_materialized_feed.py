@@ -0,0 +1,167 @@
+import math
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from django_app.models import FeedEntry, MaterializedFeed, NewsItem, NewsTag, UserFeed
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.materialized_feed import (
+    FeedMaterializer, MaterializedFeedStorage, refresh_news_entries
+)
+from newstler_site.external_services.news_storage import DjangoORMBasedStorage, NewsTagMatcher
+
+import pytest
+
+PYTHON_DEVELOPER = UserData(name="John", position="Python developer")
+FULL_STACK = UserData(name="Jane", position="Python and JavaScript developer")
+
+
+@pytest.fixture
+def tags(db):
+    return {name: NewsTag.objects.create(name=name, weight=weight)
+            for name, weight in [("python", 2.0), ("javascript", 1.0), ("go", 1.0)]}
+
+
+def add_news(tags, *names):
+    start = NewsItem.objects.count()
+    return [NewsItem.objects.create(title="News #{}".format(i), link="http://news.test/{}".format(i), tag=tags[name])
+            for i, name in enumerate(names, start)]
+
+
+def subscribe(storage, user_data, name=None):
+    user = User.objects.create_user(name or user_data.name, "{}@newstler.test".format(name or user_data.name), "p")
+    storage.subscribe(user.id, user_data)
+    return user
+
+
+def make_materializer(max_items=3, batch_size=2):
+    return FeedMaterializer(matcher=NewsTagMatcher(max_age=math.inf), max_items=max_items, batch_size=batch_size)
+
+
+def walk(storage, user_data, limit):
+    """Titles of all pages of user feed"""
+    pages, cursor = [], None
+    while True:
+        page = storage.get_news_page(user_data, cursor=cursor, limit=limit)
+        pages.append([article.title for article in page.articles])
+        cursor = page.next_cursor
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_pages_equal_ranked_feed_of_database(tags, limit):
+    add_news(tags, "python", "javascript", "go", "python", "javascript", "javascript", "python")
+    storage = MaterializedFeedStorage()
+    for user_data in (PYTHON_DEVELOPER, FULL_STACK, UserData(name="Bob", position="Manager")):
+        subscribe(storage, user_data)
+    make_materializer().run_once()
+    assert MaterializedFeed.objects.filter(cutoff_id__isnull=False).count() == 2
+    for user_data in (PYTHON_DEVELOPER, FULL_STACK, UserData(name="Ann", position="Manager")):
+        assert walk(storage, user_data, limit) == walk(DjangoORMBasedStorage(), user_data, limit)
+
+
+def test_page_of_materialized_feed_is_one_query(tags):
+    add_news(tags, "python", "javascript", "python", "go")
+    storage = MaterializedFeedStorage()
+    subscribe(storage, FULL_STACK)
+    make_materializer(max_items=10).run_once()
+    storage.get_news_page(FULL_STACK, limit=1)  # tags matcher is loaded
+    with CaptureQueriesContext(connection) as queries:
+        page = storage.get_news_page(FULL_STACK, limit=2)
+        last = storage.get_news_page(FULL_STACK, cursor=page.next_cursor, limit=2)
+    assert [article.title for article in page.articles + last.articles] == \
+        ["News #2", "News #0", "News #1"]
+    assert len(queries) == 2
+
+
+def test_unsubscribed_feed_is_served_from_news_table(tags):
+    add_news(tags, "python", "go")
+    storage = MaterializedFeedStorage()
+    assert [article.title for article in storage.get_news_page(PYTHON_DEVELOPER).articles] == ["News #0"]
+    assert not FeedEntry.objects.exists()
+
+
+def test_subscribe_records_position_changes(tags):
+    storage = MaterializedFeedStorage()
+    user = subscribe(storage, PYTHON_DEVELOPER)
+    make_materializer().run_once()
+    feed = UserFeed.objects.get(user=user).feed
+    assert feed is not None
+
+    storage.subscribe(user.id, PYTHON_DEVELOPER)
+    assert UserFeed.objects.get(user=user).feed == feed
+    storage.subscribe(user.id, FULL_STACK)
+    assert UserFeed.objects.get(user=user).position == FULL_STACK.position
+    assert UserFeed.objects.get(user=user).feed is None
+
+    stats = make_materializer().run_once()
+    assert (stats.matched, stats.built, stats.dropped) == (1, 1, 1)
+    assert not MaterializedFeed.objects.filter(pk=feed.pk).exists()
+
+
+def test_new_news_are_fanned_out_in_batches(tags):
+    add_news(tags, "python", "javascript")
+    storage = MaterializedFeedStorage()
+    subscribe(storage, PYTHON_DEVELOPER)
+    subscribe(storage, FULL_STACK)
+    materializer = make_materializer(max_items=4, batch_size=2)
+    materializer.run_once()
+
+    add_news(tags, "go", "python", "javascript", "javascript", "python")
+    stats = materializer.run_once()
+    assert (stats.matched, stats.built, stats.fanned_out) == (0, 0, 5)
+    # trimmed to 4 entries, higher scored python news first
+    assert [entry.news.title for entry in FeedEntry.objects.filter(feed__users__position=FULL_STACK.position)
+            .order_by("-score", "-news_id")] == ["News #6", "News #3", "News #0", "News #5"]
+    for user_data in (PYTHON_DEVELOPER, FULL_STACK):
+        assert walk(storage, user_data, 2) == walk(DjangoORMBasedStorage(), user_data, 2)
+
+
+def test_news_committed_after_greater_ids_are_fanned_out(tags):
+    news = add_news(tags, "python", "javascript", "python", "python")
+    storage = MaterializedFeedStorage()
+    subscribe(storage, FULL_STACK)
+    # id of the second news was allocated, but its transaction committed after the others were fanned out
+    late_id = news[1].pk
+    news[1].delete()
+    materializer = make_materializer(max_items=4)
+    materializer.run_once()
+    NewsItem.objects.create(pk=late_id, title="Late news", link="http://news.test/late", tag=tags["javascript"])
+
+    stats = materializer.run_once()
+    assert stats.fanned_out == 0
+    assert stats.entries == 1
+    assert walk(storage, FULL_STACK, 2) == walk(DjangoORMBasedStorage(), FULL_STACK, 2)
+    assert materializer.run_once().entries == 0
+    assert FeedEntry.objects.count() == 4
+
+
+def test_changed_tag_weights_move_users_to_new_feed(tags):
+    add_news(tags, "python", "javascript")
+    storage = MaterializedFeedStorage()
+    user = subscribe(storage, FULL_STACK)
+    materializer = make_materializer()
+    materializer.run_once()
+    feed = UserFeed.objects.get(user=user).feed
+
+    tags["javascript"].weight = 3.0
+    tags["javascript"].save()
+    stats = materializer.run_once()
+    assert (stats.matched, stats.built, stats.dropped) == (1, 1, 1)
+    assert UserFeed.objects.get(user=user).feed != feed
+    assert walk(storage, FULL_STACK, 2) == [["News #1", "News #0"]]
+
+
+def test_retagged_news_move_between_feeds(tags):
+    news = add_news(tags, "python", "go", "javascript")
+    storage = MaterializedFeedStorage()
+    subscribe(storage, PYTHON_DEVELOPER)
+    subscribe(storage, FULL_STACK)
+    make_materializer(max_items=10).run_once()
+
+    NewsItem.objects.filter(pk__in=[news[1].pk, news[2].pk]).update(tag=tags["python"])
+    assert refresh_news_entries([news[1].pk, news[2].pk]) == 4
+    for user_data in (PYTHON_DEVELOPER, FULL_STACK):
+        assert walk(storage, user_data, 10) == [["News #2", "News #1", "News #0"]]
@@ -0,0 +1,78 @@
+import io
+import json
+
+from django.core.management import call_command
+
+from django_app.models import NewsItem, NewsTag
+from newstler_site.external_services.news_import import (
+    NewsImporter, NewsRecord, read_csv, read_files, read_jsonl, read_rss
+)
+
+import pytest
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Feed</title>
+  <item><title>Python 3.6.2</title><link>http://python.org/362</link><category>Python</category></item>
+  <item><title>No category</title><link>http://news.test/1</link></item>
+</channel></rss>"""
+
+ATOM = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry><title>Node 8.5</title><link href="http://nodejs.org/85"/><category term="javascript"/></entry>
+</feed>"""
+
+
+def test_readers():
+    jsonl = io.StringIO('{"title": "A", "link": "http://a.test", "tag": "python"}\n\nnot json\n')
+    assert list(read_jsonl(jsonl)) == [NewsRecord("A", "http://a.test", "python")]
+    assert list(read_csv(io.StringIO("title,link,tag\nB,http://b.test,js\n"))) == [
+        NewsRecord("B", "http://b.test", "js")]
+    assert list(read_rss(io.BytesIO(RSS))) == [NewsRecord("Python 3.6.2", "http://python.org/362", "Python"),
+                                               NewsRecord("No category", "http://news.test/1", None)]
+    assert list(read_rss(io.BytesIO(ATOM))) == [NewsRecord("Node 8.5", "http://nodejs.org/85", "javascript")]
+
+
+def test_importer_dedupes_links_and_upserts_tags(db):
+    python = NewsTag.objects.create(name="python")
+    NewsItem.objects.create(title="Known", link="http://known.test", tag=python)
+    records = [
+        NewsRecord("Known again", "http://known.test", "python"),
+        NewsRecord("Python news", "http://py.test/1", "Python"),
+        NewsRecord("Python news copy", "http://py.test/1", "python"),
+        NewsRecord("Rust news", "http://rust.test/1", "rust"),
+        NewsRecord("Untagged", "http://untagged.test", None),
+        NewsRecord("", "http://no-title.test", "rust"),
+    ]
+    stats = NewsImporter(batch_size=1).run(records)
+    assert (stats.read, stats.created, stats.duplicates, stats.skipped, stats.tags_created) == (6, 2, 2, 2, 1)
+    assert sorted(NewsItem.objects.values_list("title", "tag__name")) == [
+        ("Known", "python"), ("Python news", "python"), ("Rust news", "rust")]
+
+
+def test_import_news_command(db, tmpdir):
+    tmpdir.join("news.jsonl").write("\n".join(json.dumps({"title": "News #{}".format(i),
+                                                          "link": "http://news.test/{}".format(i),
+                                                          "tag": "python"}) for i in range(5)))
+    tmpdir.join("feed.rss").write_binary(RSS)
+    tmpdir.join("notes.txt").write("ignored")
+    output = io.StringIO()
+    call_command("import_news", str(tmpdir), "--tag", "misc", "--batch-size", "2", stdout=output)
+    assert "read=7 created=6 duplicates=1" in output.getvalue()
+    assert NewsItem.objects.filter(tag__name="misc").count() == 1
+
+
+def test_read_files_rejects_unknown_format(tmpdir):
+    path = tmpdir.join("news.txt")
+    path.write("")
+    with pytest.raises(ValueError):
+        list(read_files([str(path)]))
+
+
+def test_importer_dedupes_canonical_links(db):
+    records = [
+        NewsRecord("Python", "http://python.org/?utm_source=rss", "python"),
+        NewsRecord("Python again", "HTTP://PYTHON.ORG/", "python"),
+    ]
+    stats = NewsImporter().run(records)
+    assert (stats.created, stats.duplicates) == (1, 1)
+    assert NewsImporter().run(records).duplicates == 2
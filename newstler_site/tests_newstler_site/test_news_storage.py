@@ -1,2 +1,151 @@
-def test_get_news_by_user_data_python():
-    pass
+from django.db import transaction
+
+from django_app.models import NewsItem, NewsTag
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.news_storage import (
+    DjangoORMBasedStorage, FeedFingerprint, InvalidCursor, TagFeedIndex, TagLookup
+)
+
+import pytest
+
+
+@pytest.fixture
+def news(db):
+    python = NewsTag.objects.create(name="python")
+    js = NewsTag.objects.create(name="javascript")
+    return [
+        NewsItem.objects.create(title="Python 3.6 released", link="http://python.org", tag=python),
+        NewsItem.objects.create(title="Node 8 LTS", link="http://nodejs.org", tag=js),
+        NewsItem.objects.create(title="Django 1.11", link="http://djangoproject.com", tag=python),
+    ]
+
+
+def titles(articles):
+    return [article.title for article in articles]
+
+
+def test_get_news_by_user_data_python(news):
+    storage = DjangoORMBasedStorage()
+    articles = storage.get_news_by_user_data(UserData(name="John", position="Senior Python Developer"))
+    assert titles(articles) == ["Django 1.11", "Python 3.6 released"]
+
+
+def test_get_news_by_user_data_without_matched_tags(news):
+    storage = DjangoORMBasedStorage()
+    for position in ("Manager", None):
+        articles = storage.get_news_by_user_data(UserData(name="John", position=position))
+        assert titles(articles) == ["Django 1.11", "Node 8 LTS", "Python 3.6 released"]
+
+
+def test_feed_index_follows_model_changes(news, commit):
+    storage = DjangoORMBasedStorage()
+    user_data = UserData(name="John", position="Python and JavaScript developer")
+    storage.get_news_by_user_data(user_data)
+
+    news[0].delete()
+    news[1].title = "Node 8.5"
+    news[1].save()
+    NewsItem.objects.create(title="PyCon", link="http://pycon.org", tag=news[2].tag)
+    commit()
+
+    assert titles(storage.get_news_by_user_data(user_data)) == ["PyCon", "Django 1.11", "Node 8.5"]
+
+
+def test_feed_index_ignores_rolled_back_changes(news, commit):
+    storage = DjangoORMBasedStorage()
+    user_data = UserData(name="John", position="Python developer")
+    storage.get_news_by_user_data(user_data)
+    with pytest.raises(RuntimeError), transaction.atomic():
+        NewsItem.objects.create(title="PyCon", link="http://pycon.org", tag=news[0].tag)
+        news[0].delete()
+        raise RuntimeError("rolled back")
+    commit()
+    assert titles(storage.get_news_by_user_data(user_data)) == ["Django 1.11", "Python 3.6 released"]
+
+
+def test_stale_feed_index_is_rebuilt(news):
+    now = [0.0]
+    index = TagFeedIndex(max_age=10, clock=lambda: now[0], background=False)
+    assert len(index.articles()) == 3
+    # as another process would, without signals
+    NewsItem.objects.bulk_create([NewsItem(title="PyCon", link="http://pycon.org", tag=news[0].tag)])
+    assert len(index.articles()) == 3
+    now[0] = 10
+    assert titles(index.articles(["python"])) == ["PyCon", "Django 1.11", "Python 3.6 released"]
+
+
+def test_tag_lookup_loads_tags_created_after_articles_query():
+    loads = iter([{1: "python"}, {1: "python", 2: "rust"}, {1: "python", 2: "rust"}])
+    tags = TagLookup(lambda: next(loads))
+    assert tags.get(1) == "python"
+    assert tags.get(2) == "rust"
+    # deleted tag is looked up once
+    assert tags.get(3) is None
+    assert tags.get(3) is None
+
+
+def test_get_news_page_walks_feed_by_cursor(news):
+    storage = DjangoORMBasedStorage()
+    user_data = UserData(name="John", position="Manager")
+    first = storage.get_news_page(user_data, limit=2)
+    assert titles(first.articles) == ["Django 1.11", "Node 8 LTS"]
+    second = storage.get_news_page(user_data, cursor=first.next_cursor, limit=2)
+    assert titles(second.articles) == ["Python 3.6 released"]
+    assert second.next_cursor is None
+
+
+def test_get_news_page_rejects_malformed_cursor(news):
+    with pytest.raises(InvalidCursor):
+        DjangoORMBasedStorage().get_news_page(UserData(name="John", position=None), cursor="not a cursor")
+
+
+def test_iter_news_yields_whole_feed_in_chunks(news):
+    chunks = list(DjangoORMBasedStorage().iter_news(UserData(name="John", position="Python"), chunk_size=1))
+    assert [titles(chunk) for chunk in chunks] == [["Django 1.11"], ["Python 3.6 released"]]
+
+
+def test_get_news_page_ranks_by_tag_weight(news):
+    NewsTag.objects.filter(name="javascript").update(weight=3.0)
+    storage = DjangoORMBasedStorage()
+    user_data = UserData(name="John", position="Python and JavaScript developer")
+    assert titles(storage.get_news_by_user_data(user_data)) == ["Node 8 LTS", "Django 1.11", "Python 3.6 released"]
+
+    first = storage.get_news_page(user_data, limit=2)
+    assert titles(first.articles) == ["Node 8 LTS", "Django 1.11"]
+    second = storage.get_news_page(user_data, cursor=first.next_cursor, limit=2)
+    assert titles(second.articles) == ["Python 3.6 released"]
+    assert second.next_cursor is None
+
+
+def test_matcher_picks_up_new_tags(news, commit):
+    storage = DjangoORMBasedStorage()
+    user_data = UserData(name="John", position="Rust developer")
+    assert len(storage.get_news_by_user_data(user_data)) == 3
+
+    rust = NewsTag.objects.create(name="Rust")
+    NewsItem.objects.create(title="Rust 1.20", link="http://rust-lang.org", tag=rust)
+    commit()
+    assert titles(storage.get_news_by_user_data(user_data)) == ["Rust 1.20"]
+
+
+def test_feed_fingerprint_is_order_independent():
+    first, second = FeedFingerprint(), FeedFingerprint()
+    rows = [(1, "Python", "http://python.org", "python"), (2, "Node", "http://nodejs.org", "javascript")]
+    for row in rows:
+        first.add(*row)
+    for row in reversed(rows):
+        second.add(*row)
+    assert first.version().token == second.version().token
+    second.remove(*rows[0])
+    assert first.version().token != second.version().token
+    second.add(*rows[0])
+    assert first.version().token == second.version().token
+
+
+def test_feed_index_version_follows_model_changes(news, commit):
+    storage = DjangoORMBasedStorage()
+    version = storage.version()
+    news[1].delete()
+    commit()
+    assert storage.version().token != version.token
+    assert storage.version().token == DjangoORMBasedStorage().version().token
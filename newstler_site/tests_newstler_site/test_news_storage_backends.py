@@ -0,0 +1,180 @@
+"""Behaviour every news storage backend selectable in config.ini must share"""
+from configparser import ConfigParser
+from unittest.mock import patch
+import json
+import os
+import threading
+
+from django_app.models import NewsItem, NewsTag
+from newstler_site.config import define_options
+from newstler_site.external_services.fts_storage import SQLiteFTSNewsStorage
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.memory_storage import MemoryNewsStorage
+from newstler_site.external_services.news_storage import DjangoORMBasedStorage, FakeNewsStorage, InvalidCursor
+from newstler_site.external_services.service_registry import ConfigDrivenServiceRegistry
+
+import pytest
+
+BACKENDS = {
+    "django-orm": DjangoORMBasedStorage,
+    "memory": MemoryNewsStorage,
+    "sqlite-fts": SQLiteFTSNewsStorage,
+}
+
+
+@pytest.fixture
+def news(db):
+    tags = {name: NewsTag.objects.create(name=name) for name in ("python", "javascript", "golang")}
+    items = []
+    for number in range(30):
+        name = ("python", "javascript", "golang")[number % 3]
+        items.append(NewsItem.objects.create(title="{} news {}".format(name.title(), number),
+                                             link="http://{}.test/{}".format(name, number), tag=tags[name]))
+    return items
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def storage(request, news):
+    # snapshot backends read the database once, so they are created after test data
+    return BACKENDS[request.param]()
+
+
+def walk(storage, user_data, limit):
+    articles = []
+    cursor = None
+    while True:
+        page = storage.get_news_page(user_data, cursor=cursor, limit=limit)
+        articles.extend(page.articles)
+        if page.next_cursor is None:
+            return articles
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize("position", ["Python developer", "Python and Golang developer", "Manager", None])
+def test_pages_cover_feed_without_duplicates(storage, position):
+    user_data = UserData(name="John", position=position)
+    feed = list(storage.get_news_by_user_data(user_data))
+    for limit in (1, 4, 50):
+        assert walk(storage, user_data, limit) == feed
+    assert len({article.id for article in feed}) == len(feed)
+
+
+def test_matched_articles_come_first(storage):
+    feed = list(storage.get_news_by_user_data(UserData(name="John", position="Python developer")))
+    assert {article.link.split("/")[2] for article in feed[:10]} == {"python.test"}
+
+
+def test_unmatched_position_gets_all_news_newest_first(storage, news):
+    feed = list(storage.get_news_by_user_data(UserData(name="John", position="Manager")))
+    assert [article.id for article in feed] == [item.pk for item in reversed(news)]
+
+
+def test_iter_news_equals_full_feed(storage):
+    user_data = UserData(name="John", position="Golang developer")
+    chunks = list(storage.iter_news(user_data, chunk_size=7))
+    assert [article for chunk in chunks for article in chunk] == list(storage.get_news_by_user_data(user_data))
+
+
+def test_equal_positions_have_equal_feed_keys(storage):
+    key = storage.feed_key(UserData(name="John", position="Python developer"))
+    assert key == storage.feed_key(UserData(name="Jane", position="python  Developer"))
+    assert key != storage.feed_key(UserData(name="John", position="Golang developer"))
+
+
+def test_rejects_malformed_cursor(storage):
+    with pytest.raises(InvalidCursor):
+        storage.get_news_page(UserData(name="John", position="Python"), cursor="not a cursor")
+
+
+def test_memory_storage_reloads_snapshot(news):
+    now = [0.0]
+    storage = MemoryNewsStorage(max_age=10, clock=lambda: now[0])
+    user_data = UserData(name="John", position="Manager")
+    NewsItem.objects.create(title="Fresh", link="http://fresh.test", tag=news[0].tag)
+    assert storage.get_news_page(user_data, limit=1).articles[0].id == news[-1].pk
+    now[0] = 10
+    assert storage.get_news_page(user_data, limit=1).articles[0].title == "Fresh"
+
+
+def test_sqlite_fts_storage_matches_titles_below_tags(news):
+    NewsItem.objects.create(title="Python tips for Python developers", link="http://tips.test", tag=news[1].tag)
+    storage = SQLiteFTSNewsStorage()
+    feed = storage.get_news_by_user_data(UserData(name="John", position="Python developer"))
+    assert [article.title for article in feed[10:]] == ["Python tips for Python developers"]
+
+
+@pytest.mark.parametrize("path", [":memory:", "news-fts.sqlite3"])
+def test_sqlite_fts_storage_serves_queries_while_reloading(news, tmpdir, path):
+    storage = SQLiteFTSNewsStorage(path=path if path == ":memory:" else str(tmpdir.join(path)))
+    user_data = UserData(name="John", position="Python developer")
+    NewsItem.objects.create(title="Fresh Python news", link="http://fresh.test", tag=news[0].tag)
+    insert = storage._insert
+    served = []
+
+    def insert_and_query(connection, batch):
+        insert(connection, batch)
+        query = threading.Thread(target=lambda: served.append(storage.get_news_page(user_data, limit=1)))
+        query.start()
+        query.join(5)
+
+    with patch.object(storage, "_insert", side_effect=insert_and_query):
+        storage.reload()
+    assert served[0].articles[0].title != "Fresh Python news"
+    assert storage.get_news_page(user_data, limit=1).articles[0].title == "Fresh Python news"
+    assert tmpdir.listdir() == ([] if path == ":memory:" else [tmpdir.join(path)])
+
+
+@pytest.mark.parametrize("path", [":memory:", "news-fts.sqlite3"])
+def test_sqlite_fts_storage_reopens_connection_after_fork(news, tmpdir, monkeypatch, path):
+    storage = SQLiteFTSNewsStorage(path=path if path == ":memory:" else str(tmpdir.join(path)))
+    user_data = UserData(name="John", position="Python developer")
+    expected = storage.get_news_page(user_data, limit=3)
+    inherited = storage._connection
+    parent_pid = os.getpid()
+    monkeypatch.setattr(os, "getpid", lambda: parent_pid + 1)
+    assert storage.get_news_page(user_data, limit=3) == expected
+    assert storage._connection is not inherited
+    # left open for the parent process
+    assert inherited.execute("SELECT count(*) FROM news_fts").fetchone() == (len(news),)
+
+
+def registry_with(**news_storage) -> ConfigDrivenServiceRegistry:
+    options = define_options()  # type: ConfigParser
+    options.read_dict({"news-storage": news_storage})
+    return ConfigDrivenServiceRegistry(options)
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_registry_selects_configured_backend(news, backend):
+    assert type(registry_with(backend=backend).news_storage()) is BACKENDS[backend]
+
+
+def test_registry_fakes_disabled_storage():
+    assert isinstance(registry_with(disabled="true").news_storage(), FakeNewsStorage)
+
+
+def test_registry_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        registry_with(backend="mongodb").news_storage()
+
+
+@pytest.mark.parametrize("position", ["Python and Golang developer", "Manager"])
+def test_json_pages_equal_news_pages(storage, position):
+    user_data = UserData(name="John", position=position)
+    cursor = None
+    while True:
+        page = storage.get_news_page(user_data, cursor=cursor, limit=4)
+        content = json.loads(storage.get_news_json(user_data, cursor=cursor, limit=4).decode("utf-8"))
+        assert content == {"articles": [article._asdict() for article in page.articles],
+                           "next_cursor": page.next_cursor}
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+
+
+def test_version_is_equal_for_equal_articles_and_changes_with_them(storage, news):
+    version = storage.version()
+    assert type(storage)().version().token == version.token
+    news[0].title = "Python news, updated"
+    news[0].save()
+    assert type(storage)().version().token != version.token
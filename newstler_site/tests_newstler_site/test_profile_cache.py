@@ -0,0 +1,71 @@
+import datetime
+
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.profile_cache import InMemoryProfileCache, LRUCache, ttl_until
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_expires_entries():
+    now = [100.0]
+    cache = LRUCache(max_size=2, clock=lambda: now[0])
+    cache.set("a", 1, ttl=10)
+    assert cache.get("a") == 1
+    now[0] += 10
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_is_capped_by_token_expiration():
+    expiration = datetime.datetime.now() + datetime.timedelta(seconds=60)
+    assert 0 < ttl_until(expiration, default_ttl=900) <= 60
+    assert ttl_until(expiration - datetime.timedelta(hours=1), default_ttl=900) == 0
+    assert ttl_until(None, default_ttl=900) == 900
+
+
+def test_profile_cache_counts_hits_and_misses():
+    cache = InMemoryProfileCache(max_size=10, default_ttl=900)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return UserData(name="John", position="Python Developer")
+
+    for _ in range(3):
+        assert cache.get_user_data(1, expiration=None, loader=loader).name == "John"
+    assert len(calls) == 1
+    assert cache.stats() == {"hits": 2, "misses": 1}
+
+
+def test_profile_cache_does_not_store_empty_profiles():
+    cache = InMemoryProfileCache(max_size=10, default_ttl=900)
+    assert cache.get_user_data(1, expiration=None, loader=lambda: None) is None
+    assert cache.get_user_data(1, expiration=None, loader=lambda: None) is None
+    assert cache.stats() == {"hits": 0, "misses": 2}
+
+
+def test_profile_cache_invalidate():
+    cache = InMemoryProfileCache(max_size=10, default_ttl=900)
+    cache.set(1, UserData(name="John", position=None), ttl=900)
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_profile_cache_keeps_stale_profiles():
+    now = [1000.0]
+    cache = InMemoryProfileCache(max_size=10, default_ttl=900, stale_ttl=3600, clock=lambda: now[0])
+    cache.set(1, UserData(name="John", position=None), ttl=900)
+    now[0] += 900
+    assert cache.get(1) is None
+    assert cache.get_stale(1).name == "John"
+    now[0] += 3600
+    assert cache.get_stale(1) is None
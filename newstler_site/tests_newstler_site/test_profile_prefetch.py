@@ -0,0 +1,83 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from django_app.models import UserFeed, UserMetaInformationModel
+from newstler_site.external_services.async_linkedin_client import FakeAsyncLinkedInClient, _AsyncSession
+from newstler_site.external_services.linkedin_client import UserData
+from newstler_site.external_services.materialized_feed import MaterializedFeedStorage
+from newstler_site.external_services.profile_cache import DjangoProfileCache, InMemoryProfileCache
+from newstler_site.external_services.profile_prefetch import PREFETCHED_PROFILES, ProfilePrefetcher
+
+import pytest
+
+
+class TokenEchoLinkedInClient(FakeAsyncLinkedInClient):
+    """Profile name is the access token, "revoked" token is rejected"""
+    def session(self, access_token):
+        client = FakeAsyncLinkedInClient()
+
+        async def get_user_data():
+            return None if access_token == "revoked" else UserData(name=access_token, position="Python developer")
+
+        client.get_user_data = get_user_data
+        return _AsyncSession(client)
+
+
+def make_user(name, access_token, expires_in, last_login=None):
+    user = User.objects.create_user(name, "{}@newstler.test".format(name), "secret")
+    user.last_login = last_login or timezone.now()
+    user.save()
+    UserMetaInformationModel.objects.create(user=user, access_token=access_token,
+                                            expiration=timezone.now() + datetime.timedelta(seconds=expires_in))
+    return user
+
+
+def test_prefetch_profiles(db):
+    active = make_user("active", "active-token", expires_in=7 * 86400)
+    expiring = make_user("expiring", "expiring-token", expires_in=3600)
+    revoked = make_user("revoked", "revoked", expires_in=7 * 86400)
+    idle = make_user("idle", "idle-token", expires_in=7 * 86400,
+                     last_login=timezone.now() - datetime.timedelta(days=90))
+    cache = InMemoryProfileCache(max_size=10, default_ttl=900)
+    prefetcher = ProfilePrefetcher(linkedin=TokenEchoLinkedInClient(), profile_cache=cache, batch_size=2,
+                                   concurrency=2, rate_limit=0, expiry_margin=datetime.timedelta(days=1),
+                                   active_period=datetime.timedelta(days=30))
+
+    refreshed = PREFETCHED_PROFILES.value(result="refreshed")
+    stats = prefetcher.run_once()
+
+    assert (stats.scanned, stats.expiring, stats.refreshed, stats.revoked, stats.failed) == (3, 1, 2, 1, 0)
+    assert PREFETCHED_PROFILES.value(result="refreshed") == refreshed + 2
+    assert cache.get(active.id).name == "active-token"
+    assert cache.get(expiring.id).name == "expiring-token"
+    assert cache.get(idle.id) is None
+    assert UserMetaInformationModel.objects.get(user=expiring).refresh_required
+    assert UserMetaInformationModel.objects.get(user=revoked).access_token is None
+
+
+def test_prefetched_users_are_subscribed_to_their_feeds(db):
+    active = make_user("active", "active-token", expires_in=7 * 86400)
+    make_user("revoked", "revoked", expires_in=7 * 86400)
+    prefetcher = ProfilePrefetcher(linkedin=TokenEchoLinkedInClient(),
+                                   profile_cache=InMemoryProfileCache(max_size=10, default_ttl=900),
+                                   batch_size=10, concurrency=2, rate_limit=0, expiry_margin=datetime.timedelta(days=1),
+                                   active_period=datetime.timedelta(days=30), news_storage=MaterializedFeedStorage())
+    prefetcher.run_once()
+    assert list(UserFeed.objects.values_list("user_id", "position")) == [(active.id, "Python developer")]
+
+
+def test_prefetch_command_refuses_profile_cache_of_its_own_process(db):
+    with pytest.raises(CommandError):
+        call_command("prefetch_profiles")
+
+
+def test_profile_cache_is_shared_by_cache_of_all_processes():
+    assert not InMemoryProfileCache(max_size=10, default_ttl=900).shared
+    assert not DjangoProfileCache(cache_alias="default", default_ttl=900).shared
+    with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                               "LOCATION": "/tmp/newstler-test-cache"}}):
+        assert DjangoProfileCache(cache_alias="default", default_ttl=900).shared
@@ -0,0 +1,79 @@
+import os
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import override_settings
+from whitenoise.compress import brotli_installed
+from whitenoise.django import DjangoWhiteNoise
+
+from newstler_site.django_facade.static_storage import prune_css, template_classes
+
+import pytest
+
+CSS = (
+    '/*! License */@charset "utf-8";/* dropped */'
+    "html{margin:0}.btn,.card{padding:1px}.btn:not(.disabled):hover{color:red}"
+    '.tooltip::after{content:"{ , }"}[hidden]{display:none!important}'
+    "@media (min-width:576px){.card{margin:0}.btn .badge{top:0}}"
+    "@media print{.navbar{display:none}}@keyframes spin{from{opacity:0}to{opacity:1}}"
+    "/*# sourceMappingURL=bootstrap.min.css.map */"
+)
+
+
+def test_prune_css_keeps_rules_of_used_classes():
+    assert prune_css(CSS, {"btn", "navbar"}) == (
+        '/*! License */@charset "utf-8";'
+        "html{margin:0}.btn{padding:1px}.btn:not(.disabled):hover{color:red}[hidden]{display:none!important}"
+        "@media print{.navbar{display:none}}@keyframes spin{from{opacity:0}to{opacity:1}}"
+    )
+
+
+def test_template_classes(tmpdir):
+    tmpdir.join("page.html").write(
+        '<div class="row {% if wide %}wide{% endif %}"><a class=\'btn  btn-primary\' href="#">{{ a }}</a></div>')
+    tmpdir.join("notes.txt").write('class="ignored"')
+    assert template_classes([str(tmpdir)]) == {"row", "wide", "btn", "btn-primary"}
+
+
+@pytest.fixture
+def collected(tmpdir):
+    with override_settings(STATIC_ROOT=str(tmpdir),
+                           STATICFILES_STORAGE="newstler_site.django_facade.static_storage."
+                                               "PrunedCompressedManifestStorage",
+                           STATICFILES_COMPRESS_WORKERS=2):
+        call_command("collectstatic", interactive=False, verbosity=0)
+        yield str(tmpdir)
+
+
+def get(application, url, accept_encoding):
+    status_headers = []
+    body = b"".join(application({"REQUEST_METHOD": "GET", "PATH_INFO": url, "HTTP_ACCEPT_ENCODING": accept_encoding},
+                                lambda status, headers: status_headers.extend((status, dict(headers)))))
+    return status_headers[0], status_headers[1], body
+
+
+def test_collected_stylesheet_is_pruned_hashed_and_compressed(collected):
+    name = staticfiles_storage.stored_name("bootstrap/css/bootstrap.min.css")
+    assert name != "bootstrap/css/bootstrap.min.css"
+    path = os.path.join(collected, name)
+    assert os.path.getsize(path) < 0.2 * os.path.getsize(os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "django_facade", "static", "bootstrap", "css", "bootstrap.min.css"))
+    with open(path, encoding="utf-8") as css:
+        pruned = css.read()
+    assert ".navbar-brand{" in pruned and ".carousel" not in pruned
+    assert os.path.exists(path + ".gz")
+    assert os.path.exists(path + ".br") == brotli_installed
+
+
+def test_hashed_files_are_served_compressed_and_immutable(collected):
+    application = DjangoWhiteNoise(lambda environ, start_response: [])
+    url = staticfiles_storage.url("bootstrap/css/bootstrap.min.css")
+    status, headers, body = get(application, url, "gzip, deflate, br")
+    assert status == "200 OK"
+    assert headers["Cache-Control"] == "max-age=315360000, public, immutable"
+    assert headers["Content-Encoding"] == ("br" if brotli_installed else "gzip")
+    assert int(headers["Content-Length"]) == len(body)
+
+    _, headers, _ = get(application, "/static/bootstrap/css/bootstrap.min.css", "gzip")
+    assert headers["Content-Encoding"] == "gzip"
+    assert "immutable" not in headers["Cache-Control"]
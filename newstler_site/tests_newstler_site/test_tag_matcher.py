@@ -0,0 +1,23 @@
+from newstler_site.external_services.tag_matcher import TagMatcher
+
+
+def test_match_scores_whole_word_mentions():
+    matcher = TagMatcher({"python": 2.0, "java": 1.0, "javascript": 1.5, "machine learning": 3.0})
+    scores = matcher.match("Python/JavaScript developer, Python and Machine Learning fan")
+    assert scores == {"python": 4.0, "javascript": 1.5, "machine learning": 3.0}
+
+
+def test_match_ignores_parts_of_words():
+    matcher = TagMatcher({"go": 1.0, "js": 1.0})
+    assert matcher.match("Google Cloud JSON expert") == {}
+    assert matcher.match("Go developer") == {"go": 1.0}
+
+
+def test_match_overlapping_patterns():
+    matcher = TagMatcher({"data": 1.0, "big data": 2.0, "data science": 4.0})
+    assert matcher.match("big data science") == {"data": 1.0, "big data": 2.0, "data science": 4.0}
+
+
+def test_match_without_tags():
+    assert TagMatcher({}).match("Python developer") == {}
+    assert TagMatcher({"python": 1.0}).match("") == {}
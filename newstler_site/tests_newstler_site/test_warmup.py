@@ -0,0 +1,32 @@
+from unittest.mock import patch
+import gc
+
+from newstler_site import config
+from newstler_site.django_facade import warmup
+from newstler_site.external_services.service_registry import ConfigDrivenServiceRegistry
+
+
+def test_options_are_read_once(monkeypatch):
+    reads = []
+    monkeypatch.setattr(config, "_options", None)
+    monkeypatch.setattr(config, "define_options", lambda: reads.append(1) or object())
+    assert config.get_options() is config.get_options()
+    assert len(reads) == 1
+
+
+def test_registry_reads_options_on_first_use(monkeypatch):
+    monkeypatch.setattr(config, "_options", None)
+    registry = ConfigDrivenServiceRegistry()
+    assert config._options is None
+    assert registry.options is config.get_options()
+
+
+def test_warm_up_loads_services_and_closes_connections(service_registry, db):
+    with patch.object(warmup, "connections") as connections:
+        steps = warmup.warm_up()
+    if hasattr(gc, "unfreeze"):
+        gc.unfreeze()
+    assert list(steps) == ["urls", "templates", "services", "connections", "gc"]
+    connections.close_all.assert_called_once_with()
+    service_registry.news_storage.assert_called_with()
+    service_registry.linkedin.assert_called_with()
@@ -11,6 +11,7 @@ requires = [
     "yarl==0.12.0",
     "cached-property==1.3.0",
     "requests==2.18.4",
+    "aiohttp==2.2.5",
 ]
 
 